@@ -0,0 +1,93 @@
+""" bytecode.py
+
+Benchmarks the cold start import time saved by shipping precompiled bytecode.  Installed packages are copied into
+three package dirs (sources only, sources + unchecked hash pycs, bytecode only) and imported by a fresh interpreter
+that can't write bytecode, like lambda's read only /var/task.
+
+    python -m benchmarks.bytecode --packages botocore dateutil jmespath urllib3 --output bytecode.json
+
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import subprocess as sp
+import sys
+import tempfile
+from pathlib import Path
+
+from blambda.utils import archive, bytecode, package_cache
+
+from .common import compare, measure, report
+
+
+def package_members(names):
+    """ (archive name, path) of every file of some installed top level packages / modules """
+    members = []
+    for name in names:
+        spec = importlib.util.find_spec(name)
+        if spec is None or not spec.origin:
+            raise SystemExit(f"{name} isn't installed")
+        if spec.submodule_search_locations:
+            members += [m for m in archive.walk(list(spec.submodule_search_locations)[0], name)
+                        if '__pycache__/' not in m[0] and not m[0].endswith('.pyc')]
+        else:
+            members.append((os.path.basename(spec.origin), Path(spec.origin)))
+    return members
+
+
+def run_benchmarks(root, names, repeat):
+    members = package_members(names)
+    compiled = bytecode.compile_modules(members, sys.executable)
+    tag = sys.implementation.cache_tag
+    layouts = {
+        'sources': members,
+        'sources + unchecked hash pycs': bytecode.with_bytecode(members, compiled, tag),
+        'bytecode only': bytecode.with_bytecode(members, compiled, tag, strip=True),
+    }
+
+    script = 'import sys; sys.path.insert(0, sys.argv[1]); ' + '; '.join(f'import {name}' for name in names)
+    results = [measure('interpreter startup', lambda: sp.check_call([sys.executable, '-B', '-c', 'pass']),
+                       repeat, memory=False)]
+    for layout, layout_members in layouts.items():
+        package_dir = Path(root) / layout.replace(' ', '_')
+        archive.extract(layout_members, package_dir)
+
+        def cold_import():
+            sp.check_call([sys.executable, '-B', '-c', script, str(package_dir)])
+
+        results.append(measure(f'import ({layout})', cold_import, repeat, memory=False))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark cold start imports with and without bytecode')
+    parser.add_argument('--packages', nargs='+', default=['botocore', 'dateutil', 'jmespath', 'urllib3'],
+                        help='installed top level packages to import (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('--output', help='write json results to this file instead of stdout')
+    parser.add_argument('--baseline', help='json results from a previous run to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=1.5,
+                        help='fail if anything is this many times slower than the baseline (default: %(default)s)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='blambda-bench-bytecode-')
+    package_cache.CACHE_ROOT = Path(root) / 'cache'
+    try:
+        results = run_benchmarks(root, args.packages, args.repeat)
+    finally:
+        shutil.rmtree(root)
+
+    params = {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+    report('bytecode', params, results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_slowdown)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
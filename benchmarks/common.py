@@ -0,0 +1,94 @@
+""" common.py
+
+Timing / memory measurement and machine readable reporting shared by the benchmark suites.
+"""
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+
+def blambda_version():
+    try:
+        from importlib.metadata import version
+        return version('blambda')
+    except Exception:
+        return 'unknown'
+
+
+def measure(name, func, repeat=3, memory=True):
+    """ Time a function (best of `repeat` runs) and, separately, record its peak traced memory
+
+    Args:
+        name (str): name of the benchmark
+        func (callable): the thing to measure, called with no arguments
+        repeat (int): number of timed runs; the fastest is reported
+        memory (bool): also do one run under tracemalloc to get peak memory
+
+    Returns:
+        dict: {'name', 'wall_seconds', 'peak_bytes', 'repeat'}
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {'name': name, 'wall_seconds': min(timings), 'peak_bytes': peak, 'repeat': repeat}
+
+
+def report(suite, params, results, output=None):
+    """ Write the results as json (to a file, or stdout) and a human readable summary to stderr """
+    data = {
+        'suite': suite,
+        'blambda_version': blambda_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'results': results,
+    }
+
+    for result in results:
+        peak = result.get('peak_bytes')
+        peak = f"{peak / 1024 / 1024:8.2f} MiB" if peak is not None else ''
+        print(f"{result['name']:<40} {result['wall_seconds'] * 1000:10.2f} ms {peak}", file=sys.stderr)
+
+    text = json.dumps(data, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return data
+
+
+def compare(results, baseline_file, max_slowdown):
+    """ Compare results against a previous run's json output
+
+    Returns:
+        list(str): descriptions of every benchmark that got more than `max_slowdown` times slower
+    """
+    with open(baseline_file) as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['name'])
+        if previous and previous['wall_seconds'] > 0:
+            ratio = result['wall_seconds'] / previous['wall_seconds']
+            if ratio > max_slowdown:
+                regressions.append(f"{result['name']}: {ratio:.2f}x slower than baseline")
+    return regressions
@@ -0,0 +1,112 @@
+""" discovery.py
+
+Benchmarks manifest discovery, name resolution and source file expansion against a synthetic monorepo.
+
+    python -m benchmarks.discovery --functions 2000 --output discovery.json
+    python -m benchmarks.discovery --functions 2000 --baseline discovery.json
+
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+from blambda.utils import daemon, findfunc
+from blambda.utils.discovery import walk
+
+from .common import compare, measure, report
+from .synthetic import generate_repo
+
+
+def run_benchmarks(root, names, repeat, use_git):
+    root = str(root)
+    results = []
+
+    def cold_discovery():
+        return findfunc.find_all_manifests(root, rebuild=True, use_git=use_git)
+
+    def warm_discovery():
+        return findfunc.find_all_manifests(root, use_git=use_git)
+
+    results.append(measure('walk', lambda: list(walk(root)), repeat))
+    results.append(measure('find_all_manifests (cold index)', cold_discovery, repeat))
+    results.append(measure('find_all_manifests (warm index)', warm_discovery, repeat))
+
+    manifests = warm_discovery()
+    sample = names[::max(len(names) // 50, 1)]
+
+    with mock.patch.object(findfunc, 'get_search_root', return_value=root):
+        def single_lookups():
+            findfunc._resolvers.clear()
+            return [findfunc.find_manifest(name) for name in sample]
+
+        def find_manifests():
+            findfunc._resolvers.clear()
+            return findfunc.find_manifests(names)
+
+        results.append(measure(f'find_manifest x{len(sample)}', single_lookups, repeat))
+        results.append(measure(f'find_manifests x{len(names)}', find_manifests, repeat))
+
+    resolver = findfunc.ManifestResolver(manifests)
+    results.append(measure('ManifestResolver build', lambda: findfunc.ManifestResolver(manifests), repeat))
+    results.append(measure(f'ManifestResolver.resolve x{len(names)}', lambda: resolver.resolve(names), repeat))
+
+    def expand_source_files():
+        for m in manifests:
+            m.drop_json()
+            list(m.source_files(dest_dir='.'))
+
+    results.append(measure('LambdaManifest.source_files (all)', expand_source_files, repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark manifest discovery and lookup')
+    parser.add_argument('--functions', type=int, default=500, help='number of functions (default: %(default)s)')
+    parser.add_argument('--per-group', type=int, default=10, help='functions per group (default: %(default)s)')
+    parser.add_argument('--depth', type=int, default=2, help='group directory depth (default: %(default)s)')
+    parser.add_argument('--vendored-files', type=int, default=40,
+                        help='files in each lib_* / node_modules_* dir (default: %(default)s)')
+    parser.add_argument('--shared-files', type=int, default=20, help='shared source files (default: %(default)s)')
+    parser.add_argument('--glob-ratio', type=float, default=0.5,
+                        help='fraction of functions using shared globs (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('--git', action='store_true', help="discover with 'git ls-files' (repo is git init'ed)")
+    parser.add_argument('--root', help='generate into (and keep) this directory instead of a temp dir')
+    parser.add_argument('--output', help='write json results to this file instead of stdout')
+    parser.add_argument('--baseline', help='json results from a previous run to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=1.5,
+                        help='fail if anything is this many times slower than the baseline (default: %(default)s)')
+    args = parser.parse_args()
+
+    # the benchmarks measure in-process discovery, not a running daemon
+    os.environ[daemon.DISABLE_ENV_VAR] = '1'
+
+    root = args.root or tempfile.mkdtemp(prefix='blambda-bench-')
+    try:
+        names = generate_repo(root, args.functions, args.per_group, args.depth, args.vendored_files,
+                              args.shared_files, args.glob_ratio)
+        if args.git:
+            from blambda.utils.base import spawn
+            spawn('git init -q && git add -A', working_directory=root, raise_on_fail=True)
+
+        results = run_benchmarks(root, names, args.repeat, args.git)
+    finally:
+        if not args.root:
+            shutil.rmtree(root)
+
+    params = {k: v for k, v in vars(args).items() if k not in ('root', 'output', 'baseline')}
+    report('discovery', params, results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_slowdown)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+""" packaging.py
+
+Benchmarks building a deployment archive from a large synthetic lib dir: shutil.make_archive (what deploy used to do)
+against archive.build with different numbers of compression threads.
+
+    python -m benchmarks.packaging --files 2000 --file-kb 32 --output packaging.json
+
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from blambda.utils import archive
+
+from .common import compare, measure, report
+
+
+def generate_lib_dir(root, files, file_kb, seed=0):
+    """ Fill a directory with a mix of compressible source-like files and already compressed ones """
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz_') for _ in range(rng.randint(2, 12))) for _ in range(500)]
+    for i in range(files):
+        package_dir = os.path.join(root, f'package{i % 50}')
+        os.makedirs(package_dir, exist_ok=True)
+        if i % 10 == 0:
+            with open(os.path.join(package_dir, f'data{i}.gz'), 'wb') as f:
+                # not rng.randbytes, which needs python 3.9
+                f.write(rng.getrandbits(file_kb * 1024 * 8).to_bytes(file_kb * 1024, 'little'))
+        else:
+            text = ' '.join(rng.choice(words) for _ in range(file_kb * 160))
+            with open(os.path.join(package_dir, f'module{i}.py'), 'w') as f:
+                f.write(text[:file_kb * 1024])
+
+
+def run_benchmarks(root, repeat, jobs):
+    scratch = tempfile.mkdtemp(prefix='blambda-bench-zip-')
+    results = []
+    try:
+        def make_archive():
+            return shutil.make_archive(os.path.join(scratch, 'package'), 'zip', root)
+
+        results.append(measure('shutil.make_archive', make_archive, repeat, memory=False))
+        for n in jobs:
+            results.append(measure(f'archive.build jobs={n}', lambda: archive.build(archive.walk(root), jobs=n),
+                                   repeat, memory=False))
+    finally:
+        shutil.rmtree(scratch)
+    return results
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='benchmark building deployment archives')
+    parser.add_argument('--files', type=int, default=1000, help='files in the lib dir (default: %(default)s)')
+    parser.add_argument('--file-kb', type=int, default=32, help='size of each file in KB (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, nargs='+', default=sorted({1, 2, 4, cpus}),
+                        help='compression thread counts to try (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('--output', help='write json results to this file instead of stdout')
+    parser.add_argument('--baseline', help='json results from a previous run to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=1.5,
+                        help='fail if anything is this many times slower than the baseline (default: %(default)s)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='blambda-bench-lib-')
+    try:
+        generate_lib_dir(root, args.files, args.file_kb)
+        results = run_benchmarks(root, args.repeat, args.jobs)
+    finally:
+        shutil.rmtree(root)
+
+    params = {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+    params['cpus'] = cpus
+    report('packaging', params, results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_slowdown)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+""" startup.py
+
+Cli cold start / import budget benchmarks.
+
+For every subcommand this times `python -m blambda <cmd> --help` in a fresh interpreter, and measures the
+cumulative import time of its module with `python -X importtime`.  Times are reported relative to a bare
+interpreter start, and compared against the per-command budgets in startup_budgets.json, so that a new heavy
+top-level import shows up as a failing benchmark:
+
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --budgets my_budgets.json --repeat 10
+
+"""
+import argparse
+import json
+import os
+import subprocess as sp
+import sys
+import time
+
+from blambda.__main__ import available_subparsers
+
+from .common import report
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budgets.json')
+
+
+def time_command(argv, repeat):
+    """ best wall time (seconds) of running a command `repeat` times """
+    env = dict(os.environ, BLAMBDA_NO_DAEMON='1')
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sp.run(argv, stdout=sp.DEVNULL, stderr=sp.DEVNULL, env=env, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def parse_importtime(stderr):
+    """ parse `-X importtime` output into {module: (self_us, cumulative_us)} """
+    out = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            out[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue  # the header line
+    return out
+
+
+def import_time(module, repeat):
+    """ best cumulative import time (seconds) of a module, and the heaviest top-level imports it triggered """
+    best = None
+    for _ in range(repeat):
+        result = sp.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                        stdout=sp.DEVNULL, stderr=sp.PIPE, universal_newlines=True, check=True)
+        times = parse_importtime(result.stderr)
+        if best is None or times[module][1] < best[module][1]:
+            best = times
+
+    heaviest = sorted(((name, cumulative) for name, (_, cumulative) in best.items()
+                       if '.' not in name and name != module.split('.')[0]),
+                      key=lambda item: item[1], reverse=True)[:5]
+    return best[module][1] / 1e6, [{'module': name, 'ms': us / 1000} for name, us in heaviest]
+
+
+def budget(budgets, section, name, default_key):
+    return budgets.get(section, {}).get(name, budgets['default'][default_key])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark cli startup and module import times')
+    parser.add_argument('commands', nargs='*', help='subcommands to check (default: all of them)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (default: %(default)s)')
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS, help='budget file (default: %(default)s)')
+    parser.add_argument('--output', help='write json results to this file instead of stdout')
+    args = parser.parse_args()
+
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+
+    commands = args.commands or list(available_subparsers)
+    interpreter = time_command([sys.executable, '-c', 'pass'], args.repeat)
+
+    results = [{'name': 'python -c pass', 'wall_seconds': interpreter, 'repeat': args.repeat}]
+    failures = []
+    for cmd in commands:
+        module = 'blambda.' + available_subparsers[cmd][0]
+
+        wall = time_command([sys.executable, '-m', 'blambda', cmd, '--help'], args.repeat)
+        overhead_ms = (wall - interpreter) * 1000
+        limit = budget(budgets, 'commands', cmd, 'command_ms')
+        results.append({'name': f'blambda {cmd} --help', 'wall_seconds': wall, 'overhead_ms': overhead_ms,
+                        'budget_ms': limit, 'repeat': args.repeat})
+        if overhead_ms > limit:
+            failures.append(f"'blambda {cmd} --help' took {overhead_ms:.0f}ms (budget {limit}ms)")
+
+        seconds, heaviest = import_time(module, args.repeat)
+        limit = budget(budgets, 'imports', module, 'import_ms')
+        results.append({'name': f'import {module}', 'wall_seconds': seconds, 'budget_ms': limit,
+                        'heaviest_imports': heaviest, 'repeat': args.repeat})
+        if seconds * 1000 > limit:
+            culprits = ', '.join(f"{h['module']} ({h['ms']:.0f}ms)" for h in heaviest)
+            failures.append(f"importing {module} took {seconds * 1000:.0f}ms (budget {limit}ms): {culprits}")
+
+    report('startup', {'commands': commands, 'repeat': args.repeat, 'budgets': budgets}, results, args.output)
+
+    for failure in failures:
+        print("OVER BUDGET: " + failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
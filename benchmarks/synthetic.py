@@ -0,0 +1,107 @@
+""" synthetic.py
+
+Generates synthetic monorepos for benchmarking manifest discovery / lookup.
+
+The layout mirrors a real lambda functions repo:
+
+    <root>/shared/                                  shared source files pulled in by explicit paths and globs
+    <root>/g0/g0_1/.../<function>.json              manifests, nested `depth` directories deep
+    <root>/g0/g0_1/.../<function>.py
+    <root>/g0/g0_1/.../lib_<function>/              vendored python dependencies (including .json files)
+    <root>/g0/g0_1/.../node_modules_<function>/     vendored node dependencies (lots of package.json files)
+
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+RUNTIMES = ('python3.8', 'nodejs12.x')
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def generate_repo(root, functions=100, per_group=10, depth=2, vendored_files=20, shared_files=10, glob_ratio=0.5):
+    """ Write a synthetic repo
+
+    Args:
+        root (str|Path): directory to generate into
+        functions (int): number of lambda functions
+        per_group (int): functions per (leaf) group directory
+        depth (int): how deeply nested the group directories are
+        vendored_files (int): files in each function's lib_<fn> / node_modules_<fn> dir (a quarter are .json)
+        shared_files (int): files in the shared directory, half .py and half .coffee
+        glob_ratio (float): fraction of functions that pull in shared files with a glob rather than explicitly
+
+    Returns:
+        list(str): the full names of the generated functions
+    """
+    root = Path(root)
+    shared = root / 'shared'
+    for i in range(shared_files):
+        ext = '.py' if i % 2 == 0 else '.coffee'
+        _write(shared / f'shared_{i}{ext}', f'# shared file {i}\n')
+
+    names = []
+    for i in range(functions):
+        group_index = i // per_group
+        group_dir = root
+        for level in range(max(depth, 1)):
+            group_dir = group_dir / f'g{group_index}_{level}'
+
+        fname = f'func_{i}'
+        runtime = RUNTIMES[i % len(RUNTIMES)]
+        python = runtime.startswith('python')
+        ext = '.py' if python else '.coffee'
+        shared_relpath = os.path.relpath(str(shared), str(group_dir))
+
+        source_files = [fname + ext]
+        if i < functions * glob_ratio:
+            source_files.append([f'{shared_relpath}/*{ext}', f'./*{ext}'])
+        elif shared_files:
+            shared_file = f'shared_{(i * 2 + (0 if python else 1)) % shared_files}'
+            source_files.append([f'{shared_relpath}/{shared_file}{ext}', f'{shared_file}{ext}'])
+
+        manifest = {
+            'blambda': 'manifest',
+            'dependencies': {'requests': '2.22.0'} if python else {'lodash': '4.17.15'},
+            'options': {'Description': fname, 'Runtime': runtime, 'Timeout': 300},
+            'permissions': [],
+            'source files': source_files,
+        }
+        _write(group_dir / (fname + '.json'), json.dumps(manifest, indent=4))
+        _write(group_dir / (fname + ext), 'def lambda_handler(event, context):\n    return event\n')
+
+        vendored = group_dir / (('lib_' if python else 'node_modules_') + fname)
+        for j in range(vendored_files):
+            package = vendored / f'package_{j // 4}'
+            if j % 4 == 0:
+                _write(package / 'package.json', json.dumps({'name': f'package_{j // 4}', 'version': '1.0.0'}))
+            else:
+                _write(package / f'module_{j}.py', f'value = {j}\n')
+
+        names.append(f'g{group_index}_{max(depth, 1) - 1}/{fname}')
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='generate a synthetic lambda functions repo')
+    parser.add_argument('root', help='directory to generate into')
+    parser.add_argument('--functions', type=int, default=100)
+    parser.add_argument('--per-group', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--vendored-files', type=int, default=20)
+    parser.add_argument('--shared-files', type=int, default=10)
+    parser.add_argument('--glob-ratio', type=float, default=0.5)
+    args = parser.parse_args()
+
+    names = generate_repo(args.root, args.functions, args.per_group, args.depth, args.vendored_files,
+                          args.shared_files, args.glob_ratio)
+    print(f"generated {len(names)} functions in {args.root}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,57 @@
 import argparse
+import importlib
+import sys
 
-# local imports
-from . import (
-    new,
-    show,
-    deploy,
-    execute,
-    setup_libs,
-    update_versions,
-    who_needs_update,
-    config,
-    cwlogs,
-    local_execute,
-    local_test,
-    ide_helper,
-    validate
-)
+# subcommand name -> (module, help).  Modules are only imported when their subcommand is selected, since some of
+# them pull in heavy dependencies (boto3, bs4, ...).  The help text is each module's docstring.
+available_subparsers = {
+    'new': ('new', "create a new lambda function"),
+    'deploy': ('deploy', "package and deploy lambda functions"),
+    'exec': ('execute', "Execute python lambda functions.  This executes the deployed function on AWS."),
+    'deps': ('setup_libs', "prepare development of python lambda functions"),
+    'update': ('update_versions', "update the versions for the specified lambda functions"),
+    'stale': ('who_needs_update', "list functions that need updating"),
+    'config': ('config', "configure blambda"),
+    'logs': ('cwlogs', "Get cloudwatch log events for a lambda function. "
+                       "Json output can be fed into tools like decider/dec_stats"),
+    'show': ('show', "List local functions"),
+    'local': ('local_execute', "Execute a command locally"),
+    'test': ('local_test', "Run unittests for a given set of functions"),
+    'ide': ('ide_helper', "Insert a function's base / lib dirs into intellij's indexing path. This works by "
+                          "rewriting the project's\n*.iml file, inserting the proper paths as source directories."),
+    'validate': ('validate', "Check for common errors"),
+    'daemon': ('daemon', "run a resident blambda process that keeps the manifest index warm between commands"),
+}
 
 
-def main():
-    available_subparsers = {
-        'new': new,
-        'deploy': deploy,
-        'exec': execute,
-        'deps': setup_libs,
-        'update': update_versions,
-        'stale': who_needs_update,
-        'config': config,
-        'logs': cwlogs,
-        'show': show,
-        'local': local_execute,
-        'test': local_test,
-        'ide': ide_helper,
-        'validate': validate,
-    }
+def load_subcommand(name):
+    """ import the module implementing a subcommand """
+    module_name, _ = available_subparsers[name]
+    return importlib.import_module(f'blambda.{module_name}')
+
+
+def selected_subcommand(argv):
+    """ the subcommand is the first positional argument (none of the top level options take a value) """
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg if arg in available_subparsers else None
+    return None
 
+
+def main():
     parser = argparse.ArgumentParser("Balihoo Command Line Tools for AWS Lambda function management")
     parser.add_argument('--version', action='store_true', help='echo version number and exit')
     parser.add_argument('-v', '--verbose', action='count', default=0, help='verbose output')
     subparsers = parser.add_subparsers(dest='cmd')
 
-    for subparser_name, submodule in available_subparsers.items():
-        subparser = subparsers.add_parser(subparser_name,
-                                          help=submodule.__doc__,
-                                          description=submodule.__doc__)
-        submodule.setup_parser(subparser)
+    for subparser_name, (_, help_text) in available_subparsers.items():
+        subparsers.add_parser(subparser_name, help=help_text, description=help_text)
+
+    # only the selected subcommand gets imported / has its arguments set up
+    cmd = selected_subcommand(sys.argv[1:])
+    if cmd:
+        submodule = load_subcommand(cmd)
+        submodule.setup_parser(subparsers.choices[cmd])
 
     args = parser.parse_args()
 
@@ -55,7 +62,7 @@ def main():
         if args.cmd is None:
             parser.print_help()
         else:
-            available_subparsers[args.cmd].run(args)
+            submodule.run(args)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 """
 configure blambda
 """
+import functools
 import json
 
 import os
@@ -23,6 +24,7 @@ def save(var, val, local):
         os.makedirs(cfgdir)
     with open(cfgfile, 'w') as f:
         f.write(json.dumps(cfg, sort_keys=True, indent=2))
+    load_cached.cache_clear()
 
 
 def load():
@@ -38,9 +40,17 @@ def load():
     return config
 
 
+@functools.lru_cache()
+def load_cached():
+    """ load() once per process.  Callers must not modify the returned dict. """
+    return load()
+
+
 def setup_parser(parser):
     parser.add_argument('action', choices=['set_local', 'set_global', 'get'])
-    parser.add_argument('variable', choices=['region', 'environment', 'role', 'application', 'account', 'template_fill', 'all'])
+    parser.add_argument('variable', choices=['region', 'environment', 'role', 'application', 'account', 'template_fill',
+                                              'discovery', 'lambda_endpoint', 'artifact_bucket',
+                                              'artifact_threshold', 's3_endpoint', 'package_cache_mb', 'all'])
     parser.add_argument('value', type=str, help='the value to give to the variable', nargs='?')
 
 
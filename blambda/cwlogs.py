@@ -10,18 +10,14 @@ from datetime import (
     datetime
 )
 
-import boto3
-from botocore.client import Config as BotoConfig
 from dateutil.parser import parse as dtparse
 from dateutil.tz import tzlocal
 
-client = boto3.client(
-    'logs',
-    region_name='us-east-1',
-    config=BotoConfig(
-        connect_timeout=10,
-        read_timeout=300)
-)
+from .utils import aws
+
+
+def logs_client(region_name=None):
+    return aws.client('logs', region_name, connect_timeout=10, read_timeout=300)
 
 
 def merge_lists(lists):
@@ -55,7 +51,8 @@ def msts2str(ts):
     return datetime.fromtimestamp(int(ts) / 1000.0).strftime('%Y-%m-%d %H:%M:%S.%f %z')
 
 
-def get_events(log_group, from_ms, to_ms, max_events=None, regex=None, verbose=False):
+def get_events(log_group, from_ms, to_ms, max_events=None, regex=None, verbose=False, client=None):
+    client = client or logs_client()
     kwargs = {
         'logGroupName': log_group,
         'startTime': from_ms,
@@ -0,0 +1,61 @@
+"""
+run a resident blambda process that keeps the manifest index warm between commands
+"""
+import os
+import subprocess as sp
+import sys
+import time
+
+from termcolor import cprint
+
+from .utils import daemon
+
+
+def setup_parser(parser):
+    parser.add_argument('action', choices=['start', 'stop', 'status', 'run'],
+                        help="'run' stays in the foreground, 'start' runs it in the background")
+    parser.add_argument('--poll', type=float, default=daemon.DEFAULT_POLL_INTERVAL,
+                        help='seconds between checks of the tree for changes (default: %(default)s)')
+
+
+def start(poll):
+    if daemon.is_running():
+        cprint("blambda daemon is already running", 'yellow')
+        return
+
+    os.makedirs(os.path.dirname(daemon.LOG_PATH), exist_ok=True)
+    with open(daemon.LOG_PATH, 'a') as log:
+        sp.Popen([sys.executable, '-m', 'blambda', 'daemon', 'run', '--poll', str(poll)],
+                 stdin=sp.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+
+    for _ in range(50):
+        if daemon.is_running():
+            cprint(f"blambda daemon listening on {daemon.SOCKET_PATH}", 'blue')
+            return
+        time.sleep(0.1)
+    cprint(f"blambda daemon failed to start, see {daemon.LOG_PATH}", 'red')
+    sys.exit(1)
+
+
+def run(args):
+    if args.action == 'run':
+        cprint(f"blambda daemon listening on {daemon.SOCKET_PATH}", 'blue')
+        daemon.BlambdaDaemon(poll_interval=args.poll).serve()
+    elif args.action == 'start':
+        start(args.poll)
+    elif args.action == 'stop':
+        try:
+            daemon.request('stop')
+            cprint("blambda daemon stopped", 'blue')
+        except daemon.DaemonUnavailable:
+            cprint("blambda daemon is not running", 'yellow')
+    else:
+        try:
+            status = daemon.request('ping')
+        except daemon.DaemonUnavailable:
+            cprint("blambda daemon is not running", 'yellow')
+        else:
+            print(f"pid: {status['pid']}")
+            print(f"uptime: {int(status['uptime'])}s")
+            for root in status['roots']:
+                print(f"indexing: {root}")
@@ -1,91 +1,109 @@
 """
 package and deploy lambda functions
 """
+import collections
+import copy
 import json
 import os
 import shutil
 import subprocess as sp
 import sys
 import tempfile
+import time
+import traceback
 from pathlib import Path, PurePath
 
-import boto3
 from botocore.exceptions import ClientError
 from termcolor import cprint
 
 from . import config
-from .utils.base import spawn, timed, die
+from .utils import (
+    archive, artifacts, aws, bytecode, coffee, layers, node_prune, package_cache, pipeline, slim, treeshake
+)
+from .utils.base import collect_timings, die, output_prefix, prefixed_output, spawn, timed
 from .utils.findfunc import (
     find_all_manifests,
-    find_manifest
+    get_resolver
 )
 from .utils.iam import role_policy_upsert
 from .utils.lambda_manifest import LambdaManifest
 from .utils.vpc import VpcInfo
 
 
+DeployResult = collections.namedtuple('DeployResult', 'name status timings total')
+
+
 def split_path(path):
     (basedir, jsonfile) = os.path.split(path)
     (name, ext) = os.path.splitext(jsonfile)
     return basedir, name, ext
 
 
-clients = None
-
-
-class Clients(object):
-    def __init__(self):
-        self.cfg = config.load()
-        self.region = self.cfg.get('region', 'us-east-1')
-        self.events_client = boto3.client('events', region_name=self.region)
-        self.lambda_client = boto3.client('lambda', region_name=self.region)
-
-
-def js_name(coffee_file):
-    """ return the name of the provided file with the extension replaced by 'js'
-    Args:
-        coffee_file (str): name of a file to replace the extension of
-    """
-    return "{}.js".format(os.path.splitext(coffee_file)[0])
-
-
-def coffee_compile(coffee_file, target_dir, npm_bin_dir):
-    """ compile a coffee file and return the compiled file's name
-    Args:
-        coffee_file (PurePath|str): name of a coffeescript file to compile
-        target_dir (PurePath|str): directory for the compiled .js file
-        npm_bin_dir (PurePath|str): node_modules/.bin dir which should contain the coffee binary
-    """
-    command = f"{npm_bin_dir}/coffee -o {target_dir} -bc {coffee_file}"
-    spawn(command, show=True, raise_on_fail=True)
+def package_options(manifest):
+    """ The AWS Lambda configuration options for a function: defaults, then runtime specifics, then the manifest's """
+    fname = manifest.short_name
+    options = {
+        "Timeout": 30,
+        "MemorySize": 128,
+        "Description": "Fulfillment Function",
+        "Runtime": "python2.7",
+        "Handler": "{}.lambda_handler".format(fname),
+    }
+    if 'nodejs' in manifest.runtime:
+        options.update({
+            "Handler": f"{fname}/{fname}.handler",
+            "Runtime": "nodejs"
+        })
+    options.update(copy.deepcopy(manifest.json.get('options', {})))
+    return options
 
 
-def copy_dependencies(manifest, tmpdir, options):
-    """ Copy dependencies to the temporary directory for packaging """
+def dependency_members(manifest):
+    """ (archive name, path) of every installed dependency file """
     data = manifest.json
-    fname = manifest.short_name
 
     if 'python' in manifest.runtime:
         if data.get('dependencies') and not manifest.lib_dir.is_dir():
             die("Dependencies defined but no dependency directory found.  Please run 'blambda deps'")
 
-        sp.call(f"cp -r {manifest.lib_dir / '*'} {tmpdir}", shell=True)
+        # the contents of the lib dir go in the root of the archive, leaving out dot files like `cp -r lib_dir/*`
+        return [(arcname, path) for arcname, path in archive.walk(manifest.lib_dir, follow_links=True)
+                if not arcname.startswith('.')]
 
     elif 'nodejs' in manifest.runtime:
         if data.get('dependencies') and not manifest.node_dir.exists():
             die("Dependencies defined but no dependency directory found.  Please run 'blambda deps'")
 
-        shutil.copytree(manifest.node_dir, tmpdir / "node_modules")
-        (tmpdir / fname).mkdir()
-        options.update({
-            "Handler": f"{fname}/{fname}.handler",
-            "Runtime": "nodejs"
-        })
+        return list(archive.walk(manifest.node_dir, 'node_modules', follow_links=True))
 
-    else:
-        die("Unknown runtime " + manifest.runtime)
+    die("Unknown runtime " + manifest.runtime)
 
-    return options
+
+def dependency_archive(manifest, members, use_cache=True):
+    """ The installed dependencies, compressed.  This is built once per unique set of dependencies and cached, so
+    functions with the same dependencies share it instead of each compressing their own copy.
+
+    Args:
+        manifest (LambdaManifest): the function
+        members (list((str, Path))): from dependency_members
+        use_cache (bool): reuse / store the archive in the dependency cache
+
+    Returns:
+        bytes: the zip archive, or None if there are no dependencies
+    """
+    if not members:
+        return None
+
+    key = package_cache.dependency_key(members, manifest.json.get('dependencies', {})) if use_cache else None
+    zip_bytes = package_cache.get(key, package_cache.DEPENDENCY_CACHE_DIR) if key else None
+    if zip_bytes is not None:
+        cprint(f"Using cached dependencies for {manifest.short_name} ({key[:12]})", 'blue')
+        return zip_bytes
+
+    zip_bytes = archive.build(members)
+    if key:
+        package_cache.put(key, zip_bytes, package_cache.DEPENDENCY_CACHE_DIR)
+    return zip_bytes
 
 
 def exec_deploy_hook(data, tmpdir, basedir, before_or_after):
@@ -95,62 +113,143 @@ def exec_deploy_hook(data, tmpdir, basedir, before_or_after):
         print('\n'.join(out + err))
 
 
-def copy_source_files(manifest, tmpdir: Path):
-    """Copy the specified source files to the packaging temporary directory"""
+def coffee_sources(manifest):
+    """ (coffee file, node_modules/.bin dir with its compiler) of every coffeescript source file """
     npm_bin_dir = manifest.node_dir / '.bin'
+    return [(src, npm_bin_dir) for src, _ in manifest.source_files(dest_dir=Path('.')) if src.suffix == ".coffee"]
 
-    for src, dst in manifest.source_files(dest_dir=tmpdir):
-        dst.parent.mkdir(parents=True, exist_ok=True)
 
+def source_members(manifest):
+    """ (archive name, path) of every source file.  Coffeescript is compiled (or taken from the compile cache). """
+    compiled = coffee.compile_all(coffee_sources(manifest))
+
+    for src, dst in manifest.source_files(dest_dir=Path('.')):
         if src.suffix == ".coffee":
-            coffee_compile(coffee_file=src, target_dir=dst.parent, npm_bin_dir=npm_bin_dir)
-        else:
-            shutil.copyfile(str(src), str(dst))
+            dst = Path(coffee.js_name(dst))
+            src = compiled[src]
+        yield dst.as_posix(), src
 
 
-def package(manifest, dryrun=False):
-    """ create an archive containing source files and deps for lambda
-    Args:
-        manifest (LambdaManifest): the manifest object to package
-        dryrun (bool): indicates that you're testing, and leaves the tmp dir for inspection
+def make_stage_dir(manifest):
+    """ Create a staging directory for packaging a function with deploy hooks.  Files can only be reflinked / hard
+    linked within a filesystem, so if the system temp dir is on a different one than the function, this is under the
+    function's .blambda dir instead.
     """
+    stage_dir = Path(tempfile.mkdtemp())
+    if os.stat(str(stage_dir)).st_dev != os.stat(str(manifest.basedir)).st_dev:
+        try:
+            local_dir = manifest.basedir / '.blambda'
+            local_dir.mkdir(exist_ok=True)
+            local_stage_dir = Path(tempfile.mkdtemp(prefix='stage-', dir=str(local_dir)))
+        except OSError:
+            return stage_dir
+        stage_dir.rmdir()
+        stage_dir = local_stage_dir
+    return stage_dir
+
+
+def remove_stage_dir(stage_dir):
+    shutil.rmtree(str(stage_dir))
+    if stage_dir.parent.name == '.blambda':
+        try:
+            stage_dir.parent.rmdir()  # only if it's empty, i.e. we created it
+        except OSError:
+            pass
 
-    basedir = manifest.basedir
-    fname = manifest.short_name
-    data = manifest.json
 
-    # default options
-    options = {
-        "Timeout": 30,
-        "MemorySize": 128,
-        "Description": "Fulfillment Function",
-        "Runtime": "python2.7",
-        "Handler": "{}.lambda_handler".format(fname),
-    }
+def package(manifest, dryrun=False, use_cache=True, layer_set=None):
+    """ create an archive containing source files and deps for lambda (see build_package)
+
+    Returns:
+        bytes: the zip archive
+    """
+    return build_package(manifest, dryrun, use_cache, layer_set)[0]
 
-    tmpdir = Path(tempfile.mkdtemp())
 
-    if dryrun:
-        cprint(f"DRYRUN!! -- TEMPDIR: {tmpdir}", 'red')
+def build_package(manifest, dryrun=False, use_cache=True, layer_set=None):
+    """ create an archive containing source files and deps for lambda, and the function's configuration options
 
-    exec_deploy_hook(data, tmpdir, basedir, 'before')
+    Files are zipped straight from where they are.  They're only copied into a staging directory when the manifest
+    has deploy hooks, since those work on a directory.
 
-    options = copy_dependencies(manifest, tmpdir, options)
-    copy_source_files(manifest, tmpdir)
+    Args:
+        manifest (LambdaManifest): the manifest object to package
+        dryrun (bool): indicates that you're testing; the archive is written to <function>.zip, and the staging
+                       dir (if any) is left for inspection
+        use_cache (bool): reuse a previously built archive if nothing that goes into it has changed
+        layer_set (layers.LayerSet): put the dependencies in a shared layer (added to the function's options),
+                                     and only the source files in the archive
 
-    if 'options' in data:
-        options.update(data['options'])
+    Returns:
+        (bytes, dict): the zip archive, and the AWS Lambda configuration options (the manifest isn't modified)
+    """
 
-    data['options'] = options
+    basedir = manifest.basedir
+    fname = manifest.short_name
+    data = manifest.json
 
-    exec_deploy_hook(data, tmpdir, basedir, 'after')
+    key = package_cache.cache_key(manifest) if use_cache and not dryrun and layer_set is None else None
+    options = package_options(manifest)
+
+    cached = package_cache.get(key) if key else None
+    if cached is not None:
+        cprint(f"Using cached package for {fname} ({key[:12]})", 'blue')
+        return cached, options
+
+    hooks = data.get('before deploy') or data.get('after deploy')
+    stage_dir = make_stage_dir(manifest) if hooks else None
+    if hooks and layer_set is not None:
+        cprint(f"Deploy hooks work on the whole package, so {fname}'s dependencies won't be in a layer", 'yellow')
+
+    if stage_dir:
+        if dryrun:
+            cprint(f"DRYRUN!! -- TEMPDIR: {stage_dir}", 'red')
+        exec_deploy_hook(data, stage_dir, basedir, 'before')
+
+    dependencies = dependency_members(manifest)
+    sources = dict(source_members(manifest))
+
+    prune_config = node_prune.prune_config(manifest)
+    if prune_config is not None:
+        dependencies = node_prune.prune(manifest, dependencies, prune_config)
+    slim_config = slim.slim_config(manifest)
+    if slim_config is not None:
+        before = slim.sizes(dependencies)
+        dependencies = slim.slim(dependencies, slim_config, manifest.runtime)
+        slim.print_size_report(before, slim.sizes(dependencies))
+    shake_config = treeshake.shake_config(manifest)
+    if shake_config is not None:
+        dependencies = treeshake.shake(manifest, dependencies, sources, shake_config)
+    bytecode_config = bytecode.bytecode_config(manifest)
+    if bytecode_config is not None:
+        dependencies, sources = bytecode.compile_package(manifest, dependencies, sources, bytecode_config)
+
+    if stage_dir:
+        # the before deploy hooks have already run, so hard links are safe unless after deploy hooks will run
+        archive.extract(dependencies + list(sources.items()), stage_dir, hardlink=not data.get('after deploy'))
+        if 'nodejs' in manifest.runtime:
+            (stage_dir / fname).mkdir(exist_ok=True)
+        exec_deploy_hook(data, stage_dir, basedir, 'after')
+        zip_bytes = archive.build(archive.walk(stage_dir))
+    elif layer_set is not None and dependencies:
+        options['Layers'] = options.get('Layers', []) + [layer_set.arn(manifest, dependencies)]
+        zip_bytes = archive.build(sources.items())
+    else:
+        zip_bytes = archive.build(sources.items(), base=dependency_archive(manifest, dependencies, use_cache))
 
-    archive = shutil.make_archive(fname, "zip", tmpdir)
+    if stage_dir and not dryrun:
+        remove_stage_dir(stage_dir)
 
-    if not dryrun:
-        shutil.rmtree(str(tmpdir))
+    if dryrun:
+        # named after the whole function name, so functions with the same short name don't overwrite each other
+        with open(f"{manifest.full_name.replace('/', '_')}.zip", 'wb') as f:
+            f.write(zip_bytes)
+        cprint(f"DRYRUN!! -- ARCHIVE: {os.path.abspath(f.name)}", 'red')
+
+    if key:
+        package_cache.put(key, zip_bytes)
 
-    return archive
+    return zip_bytes, options
 
 
 def git_sha():
@@ -177,8 +276,8 @@ def git_local_mods():
 
 
 def setup_schedule(fname, farn, role, schedule, dryrun):
-    events_client = clients.events_client
-    lambda_client = clients.lambda_client
+    events_client = aws.client('events')
+    lambda_client = aws.client('lambda')
 
     # cleanup
     rules = events_client.list_rule_names_by_target(TargetArn=farn)['RuleNames']
@@ -244,8 +343,8 @@ def get_vpc_config(vpcid=None):
     that can be provided to Lambda.
     """
     vpc_info = VpcInfo(
-        clients.region,
-        clients.cfg.get('environment', 'dev'),
+        aws.region(),
+        config.load_cached().get('environment', 'dev'),
         vpcid
     )
     return {
@@ -254,19 +353,20 @@ def get_vpc_config(vpcid=None):
     }
 
 
-def publish(name, role, zipfile, options, dryrun):
+def publish(name, role, file_bytes, options, dryrun):
     """ publish a AWS Lambda function
     Args:
         name (str): name of the lambda function
         role (str): arn of the role to use
-        zipfile (str): the archive containing function code
-        options (dict): AWS Lambda configuration options
+        file_bytes (bytes): the zip archive containing function code
+        options (dict): AWS Lambda configuration options (not modified)
         dryrun: (bool): Only publish if False
 
     Returns:
          str: the arn of the new or updated function
     """
-    client = clients.lambda_client
+    client = aws.client('lambda')
+    options = copy.deepcopy(options)
     options.pop('name', None)
     sha = git_sha()
     mods = "!" * git_local_mods()
@@ -275,128 +375,260 @@ def publish(name, role, zipfile, options, dryrun):
     if 'Role' not in options:
         options['Role'] = role
 
-    with open(zipfile, 'rb') as f:
-        file_bytes = f.read()
-        print("Function Package: {} bytes".format(len(file_bytes)))
+    print("Function Package: {} bytes".format(len(file_bytes)))
     if not dryrun:
         try:
-            cprint("Updating lambda function code", 'yellow')
-            response = client.update_function_code(
+            current = client.get_function_configuration(FunctionName=name)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise e
+            current = None
+
+        if current is not None and 'Layers' not in options:
+            # a function that was deployed with --layers no longer uses its dependency layer
+            current_layers = [layer['Arn'] for layer in current.get('Layers', [])]
+            if any(layers.is_dependency_layer(arn) for arn in current_layers):
+                options['Layers'] = [arn for arn in current_layers if not layers.is_dependency_layer(arn)]
+
+        if current is None:
+            response = client.create_function(
                 FunctionName=name,
-                ZipFile=file_bytes
+                Code=artifacts.code_location(file_bytes),
+                **options
             )
+        else:
+            # archives are reproducible, so identical code means an identical hash
+            if current.get('CodeSha256') == archive.code_sha256(file_bytes):
+                cprint("Lambda function code is unchanged, skipping upload", 'blue')
+            else:
+                cprint("Updating lambda function code", 'yellow')
+                client.update_function_code(
+                    FunctionName=name,
+                    **artifacts.code_location(file_bytes)
+                )
             cprint("Updating lambda function configuration", 'yellow')
             response = client.update_function_configuration(
                 FunctionName=name,
                 **options
             )
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                response = client.create_function(
-                    FunctionName=name,
-                    Code={'ZipFile': file_bytes},
-                    **options
-                )
-            else:
-                raise e
         return response['FunctionName'], response['FunctionArn']
     return name, "DRYRUN"
 
 
-def deploy(function_names, env, prefix, override_role_arn, account, dryrun=False):
+def publish_function(manifest, zip_bytes, options, env, prefix, override_role_arn, account, dryrun=False):
+    """ sets up a packaged function in lambda, with its VPC config, role and schedule (see deploy)
+
+    Args:
+        options (dict): the function's configuration options, from build_package (not modified)
+
+    Returns:
+        bool: whether it was deployed
+    """
+    manifest_data = manifest.json
+    options = copy.deepcopy(options)
+    manifest_func_name = options.get('name', '')
+    if manifest_func_name != '':
+        function_name = f"{manifest_func_name.lower()}_{env.lower()}"
+    else:
+        function_name = f"{prefix.lower()}_{manifest.deployed_name}_{env.lower()}"
+    cprint(f'Lambda name: {function_name}', 'yellow')
+
+    # VPC setup
+    vpcid = options.get('VpcConfig', {}).get('VpcId')
+    vpc = manifest_data.get('vpc', False)
+    if vpcid:
+        # this is not a valid option for boto, but it should be
+        del options['VpcConfig']['VpcId']
+        with timed("get vpc by id"):
+            options['VpcConfig'] = get_vpc_config(vpcid)
+    elif vpc:
+        with timed("get vpc without id"):
+            options['VpcConfig'] = get_vpc_config()
+
+    # Role setup
+    role_arn = override_role_arn
+    if not role_arn:
+        if 'permissions' in manifest_data:
+            with timed("setup role"):
+                role_arn = role_policy_upsert(
+                    function_name,
+                    manifest_data['permissions'],
+                    account,
+                    bool(vpc or vpcid),
+                    'schedule' in manifest_data,
+                    dryrun
+                )
+            if not role_arn:
+                role_arn = config.load_cached().get('role')
+                cprint("Setting permissions failed. Defaulting to " + role_arn, 'red')
+            else:
+                cprint("Specific permissions set with role: " + role_arn, 'blue')
+        else:
+            role_arn = config.load_cached().get('role')
+            cprint("no explicit role arn found, defaulting to " + role_arn, 'blue')
+    else:
+        cprint("Explicit role arn found: " + role_arn, 'blue')
+
+    if role_arn:
+        # Publishing
+        with timed("publish"):
+            (fullname, arn) = publish(function_name, role_arn, zip_bytes, options, dryrun)
+
+        # Schedule setup
+        if 'schedule' in manifest_data:
+            with timed("schedule setup"):
+                setup_schedule(fullname, arn, role_arn, manifest_data['schedule'], dryrun)
+
+        print("Success!\n")
+        return True
+
+    cprint("No role to default to, deploy cancelled. "
+           "Use blambda config role <some role> to set a default",
+           'red')
+    return False
+
+
+def deploy(function_names, env, prefix, override_role_arn, account, dryrun=False, use_cache=True,
+           use_layers=False, jobs=1, package_jobs=None, max_pending=2, cleanup_layers=False):
     """ deploys one or more functions to lambda
+
+    Deploys are pipelined: functions are packaged by one pool of threads, and handed through a bounded queue to
+    another that sets them up in AWS, so the next function is packaged while the last one is uploading.
+
     Args:
         function_names (list(str)): list of function names
         env (str): the environment to deploy to
         prefix (srt): string to prefix the function name with
         override_role_arn (str): the role to use for the function
         account (str): the account to use for resource permissions
-        dryrun (bool): prevents AWS publish and retains tmpdir / zipfile
-    """
-    deployed = []
-
-    for fname in function_names:
-        with timed("find manifest"):
-            manifest = find_manifest(fname)
-        if manifest:
-            print("Deploying function '{}'...".format(fname))
-
-            zipfile = package(manifest, dryrun)
-            manifest_data = manifest.json
-            manifest_func_name = manifest_data.get('options', {}).get('name', '')
-            if manifest_func_name != '':
-                function_name = f"{manifest_func_name.lower()}_{env.lower()}"
-            else:
-                function_name = f"{prefix.lower()}_{manifest.deployed_name}_{env.lower()}"
-            cprint(f'Lambda name: {function_name}', 'yellow')
-
-            # VPC setup
-            vpcid = manifest_data.get('options', {}).get('VpcConfig', {}).get('VpcId')
-            vpc = manifest_data.get('vpc', False)
-            if vpcid:
-                # this is not a valid option for boto, but it should be
-                del manifest_data['options']['VpcConfig']['VpcId']
-                with timed("get vpc by id"):
-                    manifest_data['options']['VpcConfig'] = get_vpc_config(vpcid)
-            elif vpc:
-                with timed("get vpc without id"):
-                    manifest_data['options']['VpcConfig'] = get_vpc_config()
-
-            # Role setup
-            role_arn = override_role_arn
-            if not role_arn:
-                if 'permissions' in manifest_data:
-                    with timed("setup role"):
-                        role_arn = role_policy_upsert(
-                            function_name,
-                            manifest_data['permissions'],
-                            account,
-                            bool(vpc or vpcid),
-                            'schedule' in manifest_data,
-                            dryrun
-                        )
-                    if not role_arn:
-                        role_arn = clients.cfg.get('role')
-                        cprint("Setting permissions failed. Defaulting to " + role_arn, 'red')
-                    else:
-                        cprint("Specific permissions set with role: " + role_arn, 'blue')
-                else:
-                    role_arn = clients.cfg.get('role')
-                    cprint("no explicit role arn found, defaulting to " + role_arn, 'blue')
-            else:
-                cprint("Explicit role arn found: " + role_arn, 'blue')
+        dryrun (bool): prevents AWS publish and retains the staging dir / zipfile
+        use_cache (bool): reuse previously built archives for unchanged functions
+        use_layers (bool): publish dependencies as shared layers instead of in each function's package
+        jobs (int): how many functions to publish to AWS at once
+        package_jobs (int): how many functions to package at once (default: jobs, up to the number of cpus)
+        max_pending (int): how many packaged functions can wait to be published; packaging waits when there are more
+        cleanup_layers (bool): afterwards, delete versions of blambda's dependency layers that no function uses
 
-            if role_arn:
-                # Publishing
-                with timed("publish"):
-                    (fullname, arn) = publish(function_name, role_arn, zipfile, manifest_data['options'], dryrun)
-                os.remove(zipfile)
-
-                # Schedule setup
-                if 'schedule' in manifest_data:
-                    with timed("schedule setup"):
-                        setup_schedule(fullname, arn, role_arn, manifest_data['schedule'], dryrun)
-
-                deployed.append(fname)
-                print("Success!\n")
-            else:
-                cprint("No role to default to, deploy cancelled. "
-                       "Use blambda config role <some role> to set a default",
-                       'red')
-        else:
+    Returns:
+        set(str): the names of the functions that were deployed
+    """
+    layer_set = layers.LayerSet(dryrun, use_cache) if use_layers else None
+    package_jobs = package_jobs or min(jobs, os.cpu_count() or 1)
+
+    with timed("find manifests"):
+        manifests = get_resolver().resolve(function_names)
+
+    # compile the coffeescript of every function up front, in as few compiler runs as possible
+    all_coffee = [source for m in manifests.values() if m for source in coffee_sources(m)]
+    if all_coffee:
+        with timed("compile coffeescript"):
+            try:
+                coffee.compile_all(all_coffee)
+            except Exception as e:
+                cprint(f"Compiling coffeescript failed, it'll be retried per function: {e}", 'yellow')
+
+    fnames = sorted(function_names)
+    status = {fname: 'FAILED' if manifests[fname] else 'not found' for fname in fnames}
+    timings = {fname: {} for fname in fnames}
+    (started, finished) = ({}, {})
+
+    def stage(function):
+        """ run a stage for a function, with its output labelled and its time recorded """
+        def run_stage(work):
+            fname = work[0]
+            started.setdefault(fname, time.time())
+            with output_prefix(f"[{fname}] "), collect_timings(timings[fname]):
+                try:
+                    return function(*work)
+                except (Exception, SystemExit) as e:
+                    # one broken function doesn't stop the others from being deployed
+                    if not isinstance(e, SystemExit):
+                        traceback.print_exc()
+                    cprint(f"Deploying {fname} failed", 'red')
+                    return None
+                finally:
+                    finished[fname] = time.time()
+        return run_stage
+
+    def package_stage(fname):
+        print("Deploying function '{}'...".format(fname))
+        with timed("package"):
+            return (fname,) + build_package(manifests[fname], dryrun, use_cache, layer_set)
+
+    def publish_stage(fname, zip_bytes, options):
+        if publish_function(manifests[fname], zip_bytes, options, env, prefix, override_role_arn, account, dryrun):
+            status[fname] = 'deployed'
+        return fname,
+
+    # names that resolve to the same function (short name, full name, deployed name) are deployed once, as the first
+    aliases = collections.OrderedDict()  # the name a function is deployed as -> every name it was asked for by
+    for fname in fnames:
+        if not manifests[fname]:
             cprint("*** WARNING: unable to find {} ***\n".format(fname), 'yellow')
-    return set(deployed)
+            continue
+        job = next((name for name in aliases if manifests[name] is manifests[fname]), fname)
+        aliases.setdefault(job, []).append(fname)
+
+    deploys = pipeline.Pipeline([
+        pipeline.Stage('package', stage(package_stage), package_jobs),
+        pipeline.Stage('publish', stage(publish_stage), jobs),
+    ], queue_size=max_pending)
+    work = [(fname,) for fname in aliases]
+    if len(work) > 1:
+        with prefixed_output():
+            deploys.run(work)
+    else:
+        deploys.run(work)
+    for (fname,), error in deploys.errors.items():
+        cprint(f"Deploying {fname} failed: {error!r}", 'red')
+    for job, names in aliases.items():
+        for fname in names[1:]:
+            (status[fname], timings[fname]) = (status[job], timings[job])
+            if job in started:
+                (started[fname], finished[fname]) = (started[job], finished[job])
+
+    if cleanup_layers and not dryrun:
+        with timed("clean up layers"):
+            try:
+                (layer_set or layers.LayerSet(dryrun, use_cache)).cleanup()
+            except ClientError as e:
+                cprint(f"Couldn't clean up unused layers: {e}", 'yellow')
+
+    results = [DeployResult(fname, status[fname], timings[fname], finished.get(fname, 0) - started.get(fname, 0))
+               for fname in fnames]
+    if len(results) > 1:
+        print_summary(results)
+    return {result.name for result in results if result.status == 'deployed'}
+
+
+def print_summary(results):
+    """ Print a table of how each function's deploy went, and how long each of its phases took """
+    phases = []
+    for result in results:
+        phases.extend(phase for phase in result.timings if phase not in phases)
+
+    width = max([len('function')] + [len(result.name) for result in results])
+    print(f"\n{'function':<{width}}  {'result':<9}" + ''.join(f"  {phase:>{max(len(phase), 7)}}" for phase in phases)
+          + f"  {'total':>7}")
+    for result in results:
+        color = 'blue' if result.status == 'deployed' else 'red'
+        cprint(f"{result.name:<{width}}  {result.status:<9}"
+               + ''.join(f"  {_seconds(result.timings.get(phase)):>{max(len(phase), 7)}}" for phase in phases)
+               + f"  {_seconds(result.total):>7}", color)
+
+
+def _seconds(seconds):
+    return '-' if seconds is None else f"{seconds:.1f}s"
 
 
 def setup_parser(parser):
     """ main function for the deployment script.
         Parses args, calls deploy, outputs success or failure
     """
-    global clients
-    clients = Clients()
-    env = clients.cfg.get('environment', '')
-    account = clients.cfg.get('account')
-    app = clients.cfg.get('application', '')
+    cfg = config.load_cached()
+    env = cfg.get('environment', '')
+    account = cfg.get('account')
+    app = cfg.get('application', '')
 
     parser.add_argument('function_names', nargs='*', type=str, help='the base name of the function')
     parser.add_argument('--prefix', type=str, help='the prefix for the function', default=app)
@@ -404,7 +636,22 @@ def setup_parser(parser):
     parser.add_argument('--env', type=str, help='the environment this function will run in', default=env)
     parser.add_argument('--role', type=str, help='the arn of the IAM role to apply', default=None)
     parser.add_argument('--file', type=str, help='filename containing function names')
+    parser.add_argument('--uses', nargs='+', metavar='FILE', default=[],
+                        help='also deploy every function that includes any of these source files')
     parser.add_argument('--dryrun', '--dry-run', help='do not actually send anything to lambda', action='store_true')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='always rebuild packages instead of reusing unchanged ones from the package cache')
+    parser.add_argument('--layers', dest='use_layers', action='store_true',
+                        help='publish dependencies as lambda layers shared by functions with the same dependencies')
+    parser.add_argument('--cleanup-layers', action='store_true',
+                        help="delete versions of blambda's dependency layers that no function (version) uses and "
+                             "that are more than a day old")
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='publish up to N functions to AWS at once (default: 1)')
+    parser.add_argument('--package-jobs', type=int, default=None, metavar='N',
+                        help='package up to N functions at once (default: --jobs, up to the number of cpus)')
+    parser.add_argument('--max-pending', type=int, default=2, metavar='N',
+                        help='packaged functions that can wait to be published before packaging pauses (default: 2)')
 
 
 def run(args):
@@ -413,6 +660,10 @@ def run(args):
         with open(args.file) as f:
             fnames += [l.strip() for l in f.readlines()]
         print("read {} from {}".format(fnames, args.file))
+    if args.uses:
+        users = [m.full_name for m in get_resolver().using(args.uses)]
+        print("{} use {}".format(', '.join(users) or 'no functions', ', '.join(args.uses)))
+        fnames += users
 
     fnames = set(fnames)
     if len(fnames) < 1:
@@ -422,7 +673,8 @@ def run(args):
             print("  " + m.full_name)
         sys.exit(-1)
 
-    deployed = deploy(fnames, args.env, args.prefix, args.role, args.account, args.dryrun)
+    deployed = deploy(fnames, args.env, args.prefix, args.role, args.account, args.dryrun, args.use_cache,
+                      args.use_layers, args.jobs, args.package_jobs, args.max_pending, args.cleanup_layers)
     if deployed != fnames:
         not_deployed = fnames - deployed
         if len(deployed) > 0:
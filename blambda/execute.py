@@ -4,15 +4,12 @@ Execute python lambda functions.  This executes the deployed function on AWS.
 import json
 import sys
 
-import boto3
-from botocore.client import Config as BotoConfig
-
 from . import config
-
-cfg = config.load()
+from .utils import aws
 
 
 def setup_parser(parser):
+    cfg = config.load_cached()
     app = cfg.get('application')
     env = cfg.get('environment')
     parser.add_argument('function_name', type=str, help='the base name of the function')
@@ -33,13 +30,7 @@ def run(args):
     if args.env:
         function_name = "{}_{}".format(function_name, args.env)
 
-    client = boto3.client(
-        'lambda',
-        region_name='us-east-1',
-        config=BotoConfig(
-            connect_timeout=10,
-            read_timeout=300)
-    )
+    client = aws.client('lambda', connect_timeout=10, read_timeout=300)
 
     response = client.invoke(
         FunctionName=function_name,
@@ -8,7 +8,7 @@ import sys
 from termcolor import cprint
 
 from .utils import env_manager
-from .utils.findfunc import find_manifest
+from .utils.findfunc import get_resolver
 
 
 def fancy_print(header, msg):
@@ -18,12 +18,19 @@ def fancy_print(header, msg):
 
 def setup_parser(parser):
     parser.add_argument('function_names', nargs='*', type=str, help='the base(s) name of the function')
+    parser.add_argument('--uses', nargs='+', metavar='FILE', default=[],
+                        help='also test every function that includes any of these source files')
 
 
 def run(args):
     original_path = list(sys.path)
-    for func in args.function_names:
-        manifest = find_manifest(func, fail_if_missing=True)
+    function_names = list(args.function_names)
+    if args.uses:
+        function_names += [m.full_name for m in get_resolver().using(args.uses) if m.full_name not in function_names]
+
+    manifests = get_resolver().resolve(function_names, fail_if_missing=True)
+    for func in function_names:
+        manifest = manifests[func]
         env = env_manager.EnvManager(manifest.runtime)
 
         if args.verbose:
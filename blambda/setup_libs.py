@@ -8,7 +8,7 @@ import os
 from termcolor import cprint
 
 from .utils.base import spawn
-from .utils.findfunc import find_manifest
+from .utils.findfunc import get_resolver
 from .utils import env_manager
 from .config import load as load_config
 
@@ -35,9 +35,10 @@ def run(args):
         cprint("read {} from {}".format(func_names, args.file), 'blue')
 
     config = load_config()
+    manifests = get_resolver().resolve(func_names)
 
     for func_name in func_names:
-        manifest = find_manifest(func_name)
+        manifest = manifests[func_name]
         if not manifest:
             cprint("unable to find " + func_name, 'red')
             exit(1)
@@ -2,17 +2,22 @@
 List local functions
 """
 
-from .utils.findfunc import find_all_manifests
+from .utils.findfunc import find_all_manifests, get_resolver
 from termcolor import colored
 
 
-# don't delete, this is necessary for the argparsing logic
 def setup_parser(parser):
-    pass
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='rebuild the manifest index from scratch instead of updating it')
+    parser.add_argument('--uses', nargs='+', metavar='FILE',
+                        help='only show functions that include any of these source files')
 
 
 def run(args):
-    manifests = find_all_manifests(".", verbose=(args.verbose > 1))
+    if args.uses:
+        manifests = get_resolver(rebuild=args.rebuild_index).using(args.uses)
+    else:
+        manifests = find_all_manifests(".", verbose=(args.verbose > 1), rebuild=args.rebuild_index)
 
     for m in manifests:
         if args.verbose >= 1:
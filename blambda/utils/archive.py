@@ -0,0 +1,294 @@
+""" archive.py
+
+Build deployment archives in memory, reading each member straight from where it lives (lib dir, source tree,
+compiled output) instead of copying everything into a staging directory and zipping that.
+
+Members are (archive name, path) pairs.  Archive names always use '/' separators.
+
+zipfile can only compress members one at a time, so the archive is written by ZipWriter instead: members are
+deflated on a thread pool (zlib releases the GIL) and the results are written out in order.  Files that are already
+compressed are stored as they are.  Members of an existing archive (e.g. a cached dependency archive) can be
+copied into a new one without being recompressed.
+
+Archives are reproducible: members are sorted, and every member gets the same timestamp and normalized permissions,
+so the same files always produce the same bytes (and the same CodeSha256 in lambda).
+"""
+import base64
+import collections
+import hashlib
+import io
+import os
+import shutil
+import struct
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+DEFAULT_LEVEL = 6
+
+# members with these suffixes are already compressed; deflating them again costs time and saves nothing
+STORED_SUFFIXES = frozenset((
+    '.zip', '.whl', '.egg', '.jar', '.gz', '.tgz', '.bz2', '.xz', '.lzma', '.zst', '.7z',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.mp3', '.mp4', '.woff', '.woff2',
+))
+
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+_ZIP64_END_RECORD = struct.Struct('<4sQ2H2L4Q')
+_ZIP64_LOCATOR = struct.Struct('<4sLQL')
+
+_VERSION = 20
+_ZIP64_VERSION = 45
+_UNIX = 3
+_UTF8_FLAG = 0x800
+
+# linux ioctl to clone a file copy-on-write
+FICLONE = 0x40049409
+
+# every member gets this timestamp (1980-01-01 00:00:00, the earliest a zip can hold) as a dos (time, date)
+FIXED_DATETIME = (0, (1 << 5) | 1)
+FILE_MODE = 0o100644
+EXECUTABLE_MODE = 0o100755
+
+Entry = collections.namedtuple('Entry', 'arcname method crc size data mode')
+
+
+def walk(root, prefix='', follow_links=False):
+    """ Yield (archive name, path) for every file below a directory
+
+    Args:
+        root (Path|str): the directory; nothing is yielded if it doesn't exist
+        prefix (str): directory inside the archive to put the files in
+        follow_links (bool): include the contents of symlinked dirs (npm link, pnpm...), skipping links back to a dir
+                             they're in
+
+    Yields:
+        (str, Path): archive name, path
+    """
+    root = str(root)
+    ancestors = {root: frozenset()}  # dir -> (st_dev, st_ino) of the dirs it's in, to break symlink cycles
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=follow_links):
+        if follow_links:
+            stat = os.stat(dirpath)
+            inside = ancestors.pop(dirpath) | {(stat.st_dev, stat.st_ino)}
+            for dirname in list(dirnames):
+                stat = os.stat(os.path.join(dirpath, dirname))
+                if (stat.st_dev, stat.st_ino) in inside:
+                    dirnames.remove(dirname)
+                else:
+                    ancestors[os.path.join(dirpath, dirname)] = inside
+
+        reldir = os.path.relpath(dirpath, root)
+        for filename in filenames:
+            relpath = filename if reldir == '.' else os.path.join(reldir, filename)
+            arcname = os.path.join(prefix, relpath) if prefix else relpath
+            yield arcname.replace(os.sep, '/'), Path(dirpath) / filename
+
+
+def compress(arcname, path, level=DEFAULT_LEVEL):
+    """ Read and compress a single member
+
+    Args:
+        arcname (str): name in the archive
+        path (Path|str): the file
+        level (int): zlib compression level
+
+    Returns:
+        Entry: the member, ready to be written by ZipWriter
+    """
+    stat = os.stat(str(path))
+    with open(str(path), 'rb') as f:
+        raw = f.read()
+
+    method, data = ZIP_STORED, raw
+    if raw and os.path.splitext(arcname)[1].lower() not in STORED_SUFFIXES:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        deflated = compressor.compress(raw) + compressor.flush()
+        if len(deflated) < len(raw):
+            method, data = ZIP_DEFLATED, deflated
+
+    mode = EXECUTABLE_MODE if stat.st_mode & 0o111 else FILE_MODE
+    return Entry(arcname, method, zlib.crc32(raw), len(raw), data, mode)
+
+
+class ZipWriter:
+    """ Writes already compressed Entries to a zip file """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.central_directory = []
+        self.count = 0
+
+    def _tell(self):
+        offset = self.fileobj.tell()
+        if offset > 0xFFFFFFFF:
+            raise ValueError("archive is too large (over 4GB)")
+        return offset
+
+    def add(self, entry):
+        name = entry.arcname.encode('utf-8')
+        flags = 0 if name.isascii() else _UTF8_FLAG
+        (dos_time, dos_date) = FIXED_DATETIME
+        if entry.size > 0xFFFFFFFF:
+            raise ValueError(f"{entry.arcname} is too large (over 4GB)")
+
+        offset = self._tell()
+        self.fileobj.write(_LOCAL_HEADER.pack(
+            b'PK\x03\x04', _VERSION, 0, flags, entry.method, dos_time, dos_date,
+            entry.crc, len(entry.data), entry.size, len(name), 0))
+        self.fileobj.write(name)
+        self.fileobj.write(entry.data)
+
+        self.central_directory.append(_CENTRAL_HEADER.pack(
+            b'PK\x01\x02', _VERSION, _UNIX, _VERSION, 0, flags, entry.method, dos_time, dos_date,
+            entry.crc, len(entry.data), entry.size, len(name), 0, 0, 0, 0, (entry.mode & 0xFFFF) << 16, offset))
+        self.central_directory.append(name)
+        self.count += 1
+
+    def close(self):
+        """ Write the central directory and end records """
+        start = self._tell()
+        for record in self.central_directory:
+            self.fileobj.write(record)
+        size = self._tell() - start
+
+        count = self.count
+        if count > 0xFFFF:
+            # node_modules can easily hold more files than a plain zip can count
+            zip64_offset = self._tell()
+            self.fileobj.write(_ZIP64_END_RECORD.pack(
+                b'PK\x06\x06', _ZIP64_END_RECORD.size - 12, _ZIP64_VERSION, _ZIP64_VERSION, 0, 0,
+                count, count, size, start))
+            self.fileobj.write(_ZIP64_LOCATOR.pack(b'PK\x06\x07', 0, zip64_offset, 1))
+            count = 0xFFFF
+        self.fileobj.write(_END_RECORD.pack(b'PK\x05\x06', 0, 0, count, count, size, start, 0))
+
+
+def read_entries(zip_bytes):
+    """ Read the (still compressed) Entries back out of an archive written by ZipWriter
+
+    Args:
+        zip_bytes (bytes): the archive
+
+    Returns:
+        list(Entry): the members, in archive order
+    """
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+        for info in zf.infolist():
+            header = _LOCAL_HEADER.unpack_from(zip_bytes, info.header_offset)
+            start = info.header_offset + _LOCAL_HEADER.size + header[-2] + header[-1]
+            data = zip_bytes[start:start + info.compress_size]
+            entries.append(Entry(info.filename, info.compress_type, info.CRC, info.file_size, data,
+                                 info.external_attr >> 16))
+    return entries
+
+
+def build(members, jobs=None, level=DEFAULT_LEVEL, base=None):
+    """ Zip up files, compressing them in parallel.  Members are written in archive name order.
+
+    Args:
+        members (iterable((str, Path))): (archive name, path) of each file to add
+        jobs (int): number of compression threads, defaults to the number of cpus
+        level (int): zlib compression level
+        base (bytes): an archive (from build) whose members are copied in as they are, without being recompressed.
+                      A file in members replaces a base member with the same name.
+
+    Returns:
+        bytes: the zip archive
+    """
+    jobs = jobs or os.cpu_count() or 1
+    members = dict(members)
+    base_entries = {e.arcname: e for e in read_entries(base) if e.arcname not in members} if base else {}
+
+    buffer = io.BytesIO()
+    writer = ZipWriter(buffer)
+
+    # keep a bounded number of members in flight so a huge lib dir isn't all held in memory uncompressed
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for arcname in sorted(members.keys() | base_entries.keys()):
+            if arcname in base_entries:
+                pending.append(base_entries[arcname])
+            else:
+                pending.append(executor.submit(compress, arcname, members[arcname], level))
+            if len(pending) >= jobs * 4:
+                writer.add(_result(pending.popleft()))
+        while pending:
+            writer.add(_result(pending.popleft()))
+
+    writer.close()
+    return buffer.getvalue()
+
+
+def _result(entry_or_future):
+    return entry_or_future if isinstance(entry_or_future, Entry) else entry_or_future.result()
+
+
+def code_sha256(zip_bytes):
+    """ The base64 encoded sha256 of an archive, as lambda reports it in CodeSha256 """
+    return base64.b64encode(hashlib.sha256(zip_bytes).digest()).decode('ascii')
+
+
+def reflink(src, dst):
+    """ Make dst a copy-on-write clone of src.  Only some filesystems can (btrfs, xfs, ...); raises OSError otherwise.
+
+    Args:
+        src (Path|str): the file to clone
+        dst (Path|str): the clone, replaced if it exists
+    """
+    import fcntl
+    try:
+        with open(str(src), 'rb') as s, open(str(dst), 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        try:
+            os.unlink(str(dst))
+        except OSError:
+            pass
+        raise
+    shutil.copymode(str(src), str(dst))
+
+
+def extract(members, target_dir, hardlink=False):
+    """ Stage members in a directory, laid out the way they would be in the archive
+
+    Files are cloned (reflinked) where the filesystem supports it, so staging a large lib dir takes no time or space,
+    and writing to a staged file can never change the original.  Otherwise they're hard linked if `hardlink` is set
+    (only safe when nothing is going to write to the staged files), or copied.
+
+    Args:
+        members (iterable((str, Path))): (archive name, path) of each file
+        target_dir (Path|str): the staging directory
+        hardlink (bool): allow hard links
+    """
+    target_dir = Path(target_dir)
+    unsupported = set()  # (method, device) pairs that have failed, so they aren't tried for every file
+
+    for arcname, path in members:
+        dst = target_dir / arcname
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        device = os.stat(str(path)).st_dev
+
+        if ('reflink', device) not in unsupported:
+            try:
+                reflink(path, dst)
+                continue
+            except OSError:
+                unsupported.add(('reflink', device))
+
+        if hardlink and ('hardlink', device) not in unsupported:
+            try:
+                if os.path.lexists(str(dst)):
+                    os.unlink(str(dst))
+                os.link(str(path), str(dst))
+                continue
+            except OSError:
+                unsupported.add(('hardlink', device))
+
+        shutil.copy(str(path), str(dst))
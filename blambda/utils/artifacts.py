@@ -0,0 +1,157 @@
+""" artifacts.py
+
+Upload large archives (function code and layers) through an S3 artifact bucket instead of inline.  Lambda only
+accepts archives up to 50MB inline, and one big request can't be retried in pieces on a poor connection.
+
+It's configured with:
+
+    blambda config set_global artifact_bucket my-artifacts      # in the same region as the functions
+    blambda config set_global artifact_threshold 10             # MB; archives bigger than this go through S3
+                                                                # (0: always; the default is 10)
+
+Artifacts are keyed by the sha256 of the archive, so identical code (e.g. the same function deployed to several
+environments) is only uploaded once.  Archives are uploaded in parts, in parallel, and an upload that is interrupted
+is resumed by the next deploy of the same archive: the parts already in S3 (checked by their md5) aren't sent again.
+"""
+import concurrent.futures
+import hashlib
+
+from botocore.exceptions import ClientError
+from termcolor import cprint
+
+from . import aws
+from .base import die
+from .. import config
+
+KEY_PREFIX = 'blambda/artifacts/'
+
+DEFAULT_THRESHOLD_MB = 10
+
+# S3's minimum part size is 5MB
+PART_SIZE = 8 * 1024 * 1024
+
+UPLOAD_JOBS = 8
+
+
+def artifact_bucket():
+    """ The configured artifact bucket, or None """
+    return config.load_cached().get('artifact_bucket') or None
+
+
+def threshold():
+    """ The size (in bytes) above which archives are uploaded through the artifact bucket """
+    try:
+        return float(config.load_cached().get('artifact_threshold', DEFAULT_THRESHOLD_MB)) * 1024 * 1024
+    except ValueError:
+        die("artifact_threshold must be a number of MB")
+
+
+def code_location(zip_bytes):
+    """ Where lambda gets an archive from: inline, or from the artifact bucket (after uploading it there)
+
+    Args:
+        zip_bytes (bytes): the archive
+
+    Returns:
+        dict: {'ZipFile': bytes} or {'S3Bucket': bucket, 'S3Key': key}, for the Code of create_function, the
+              arguments of update_function_code or the Content of publish_layer_version
+    """
+    bucket = artifact_bucket()
+    if not bucket or len(zip_bytes) <= threshold():
+        return {'ZipFile': zip_bytes}
+    return {'S3Bucket': bucket, 'S3Key': upload(bucket, zip_bytes)}
+
+
+def artifact_key(zip_bytes):
+    return f"{KEY_PREFIX}{hashlib.sha256(zip_bytes).hexdigest()}.zip"
+
+
+def upload(bucket, zip_bytes, part_size=None, jobs=UPLOAD_JOBS):
+    """ Upload an archive to the artifact bucket, unless it's already there
+
+    Args:
+        bucket (str): the bucket
+        zip_bytes (bytes): the archive
+        part_size (int): the size of each part of a multipart upload (default: PART_SIZE)
+        jobs (int): how many parts to upload at once
+
+    Returns:
+        str: the key of the archive in the bucket
+    """
+    client = aws.client('s3')
+    part_size = part_size or PART_SIZE
+    key = artifact_key(zip_bytes)
+
+    if exists(client, bucket, key):
+        cprint(f"s3://{bucket}/{key} was already uploaded", 'blue')
+    elif len(zip_bytes) <= part_size:
+        cprint(f"Uploading s3://{bucket}/{key}", 'yellow')
+        client.put_object(Bucket=bucket, Key=key, Body=zip_bytes)
+    else:
+        _multipart_upload(client, bucket, key, zip_bytes, part_size, jobs)
+    return key
+
+
+def exists(client, bucket, key):
+    try:
+        client.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def _etag(data):
+    return '"{}"'.format(hashlib.md5(data).hexdigest())
+
+
+def _multipart_upload(client, bucket, key, zip_bytes, part_size, jobs):
+    parts = {number: zip_bytes[offset:offset + part_size]
+             for number, offset in enumerate(range(0, len(zip_bytes), part_size), 1)}
+    (upload_id, uploaded) = _resume(client, bucket, key)
+    etags = {number: _etag(data) for number, data in parts.items()}
+    todo = [number for number in parts if uploaded.get(number) != etags[number]]
+
+    if len(todo) < len(parts):
+        cprint(f"Resuming upload of s3://{bucket}/{key}: {len(parts) - len(todo)} of {len(parts)} parts are "
+               f"already uploaded", 'yellow')
+    else:
+        cprint(f"Uploading s3://{bucket}/{key} in {len(parts)} parts", 'yellow')
+
+    with concurrent.futures.ThreadPoolExecutor(max(1, min(jobs, len(todo)))) as pool:
+        futures = {pool.submit(client.upload_part, Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number,
+                               Body=parts[number]): number for number in todo}
+        # every part that can be uploaded is, so there's as little as possible left for resuming
+        errors = [future.exception() for future in concurrent.futures.as_completed(futures) if future.exception()]
+    if errors:
+        cprint(f"Uploading {len(errors)} parts of s3://{bucket}/{key} failed, deploy again to resume it", 'red')
+        raise errors[0]
+
+    client.complete_multipart_upload(
+        Bucket=bucket, Key=key, UploadId=upload_id,
+        MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etags[number]} for number in sorted(parts)]}
+    )
+
+
+def _resume(client, bucket, key):
+    """ The unfinished upload of a key (started if there isn't one), and the etags of the parts it already has
+
+    Returns:
+        (str, dict): upload id, {part number: etag}
+    """
+    uploads = [u for u in client.list_multipart_uploads(Bucket=bucket, Prefix=key).get('Uploads', [])
+               if u['Key'] == key]
+    if not uploads:
+        return client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId'], {}
+
+    # the key is the archive's hash, so any upload of it is an upload of the same bytes
+    upload_id = max(uploads, key=lambda u: u['Initiated'])['UploadId']
+    uploaded = {}
+    kwargs = {}
+    while True:
+        response = client.list_parts(Bucket=bucket, Key=key, UploadId=upload_id, **kwargs)
+        uploaded.update((part['PartNumber'], part['ETag']) for part in response.get('Parts', []))
+        if not response.get('IsTruncated'):
+            return upload_id, uploaded
+        kwargs['PartNumberMarker'] = response['NextPartNumberMarker']
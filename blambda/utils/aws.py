@@ -0,0 +1,93 @@
+""" aws.py
+
+One lazily created boto3 session, and the clients made from it, shared by every blambda command.
+
+Nothing here imports boto3 until a client is actually asked for, clients are created once per
+(service, region, config) and reused, and the connection pool is sized for the thread pools we run.
+boto3 clients are thread safe, resources are not, so resources are cached per thread.
+
+A service can be pointed at a local stand-in (e.g. localstack or moto's server) by setting <service>_endpoint in the
+config, e.g. `blambda config set_local lambda_endpoint http://localhost:4566`.
+"""
+import threading
+
+from .. import config
+
+DEFAULT_REGION = 'us-east-1'
+
+# enough connections for the biggest thread pools we run against a single client (e.g. log streams)
+MAX_POOL_CONNECTIONS = 50
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_thread_local = threading.local()
+
+
+def region():
+    """ The configured region """
+    return config.load_cached().get('region', DEFAULT_REGION)
+
+
+def endpoint(service):
+    """ The configured endpoint url for a service, or None for the real one """
+    return config.load_cached().get(f'{service}_endpoint') or None
+
+
+def session():
+    global _session
+    with _lock:
+        if _session is None:
+            import boto3
+            _session = boto3.session.Session()
+        return _session
+
+
+def _boto_config(**options):
+    from botocore.client import Config as BotoConfig
+    options.setdefault('max_pool_connections', MAX_POOL_CONNECTIONS)
+    options.setdefault('retries', {'max_attempts': 10, 'mode': 'standard'})
+    return BotoConfig(**options)
+
+
+def client(service, region_name=None, **options):
+    """ Get a shared boto3 client
+
+    Args:
+        service (str): e.g. 'lambda'
+        region_name (str): defaults to the configured region
+        **options: botocore Config options, e.g. read_timeout=300
+
+    Returns:
+        botocore.client.BaseClient: the client
+    """
+    region_name = region_name or region()
+    key = (service, region_name, repr(sorted(options.items())))
+    with _lock:
+        if key not in _clients:
+            _clients[key] = session().client(service, region_name=region_name, endpoint_url=endpoint(service),
+                                             config=_boto_config(**options))
+        return _clients[key]
+
+
+def resource(service, region_name=None, **options):
+    """ Get a boto3 resource, shared with anything else running on the same thread """
+    region_name = region_name or region()
+    key = (service, region_name, repr(sorted(options.items())))
+    resources = getattr(_thread_local, 'resources', None)
+    if resources is None:
+        resources = _thread_local.resources = {}
+    if key not in resources:
+        with _lock:
+            resources[key] = session().resource(service, region_name=region_name, endpoint_url=endpoint(service),
+                                                config=_boto_config(**options))
+    return resources[key]
+
+
+def reset():
+    """ Forget all clients / resources / the session (e.g. after the configuration has changed) """
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _thread_local.resources = {}
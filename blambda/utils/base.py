@@ -1,6 +1,8 @@
 from __future__ import print_function
 
 import json
+import sys
+import threading
 import time
 from contextlib import contextmanager
 from pathlib import PurePath
@@ -51,11 +53,99 @@ def humanize_time(secs):
     return ts
 
 
+_thread_state = threading.local()
+
+
 @contextmanager
 def timed(tag):
     t = time.time()
-    yield
-    cprint("{}: {}".format(tag, time.time() - t), 'red')
+    try:
+        yield
+    finally:
+        elapsed = time.time() - t
+        timings = getattr(_thread_state, 'timings', None)
+        if timings is not None:
+            timings[tag] = timings.get(tag, 0) + elapsed
+    cprint("{}: {}".format(tag, elapsed), 'red')
+
+
+@contextmanager
+def collect_timings(timings=None):
+    """ Collect the time spent in each timed() block run by this thread
+
+    Args:
+        timings (dict): add to these timings (e.g. collected by another thread) instead of starting afresh
+
+    Yields:
+        dict: {tag: seconds}, filled in as the blocks finish
+    """
+    previous = getattr(_thread_state, 'timings', None)
+    _thread_state.timings = timings = {} if timings is None else timings
+    try:
+        yield timings
+    finally:
+        _thread_state.timings = previous
+
+
+class _PrefixedStream:
+    """ Writes whole lines, prefixed with the output_prefix of the thread that wrote them """
+
+    def __init__(self, stream, lock):
+        self.stream = stream
+        self.lock = lock
+        self.buffers = threading.local()
+
+    def write(self, text):
+        prefix = getattr(_thread_state, 'prefix', None)
+        if prefix is None:
+            with self.lock:
+                return self.stream.write(text)
+
+        (*lines, rest) = (getattr(self.buffers, 'partial', '') + text).split('\n')
+        self.buffers.partial = rest
+        if lines:
+            with self.lock:
+                self.stream.write(''.join(f"{prefix}{line}\n" for line in lines))
+        return len(text)
+
+    def end_line(self):
+        """ write out this thread's unfinished line, if any """
+        if getattr(self.buffers, 'partial', ''):
+            self.write('\n')
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def prefixed_output():
+    """ While this is active, every line written to stdout / stderr by a thread in an output_prefix block is
+    written whole, with the prefix, so the output of threads working on different things can be told apart.
+    """
+    lock = threading.Lock()
+    (stdout, stderr) = (sys.stdout, sys.stderr)
+    (sys.stdout, sys.stderr) = (_PrefixedStream(stdout, lock), _PrefixedStream(stderr, lock))
+    try:
+        yield
+    finally:
+        (sys.stdout, sys.stderr) = (stdout, stderr)
+
+
+@contextmanager
+def output_prefix(prefix):
+    """ Prefix the lines this thread writes (see prefixed_output) """
+    _thread_state.prefix = prefix
+    try:
+        yield
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            if isinstance(stream, _PrefixedStream):
+                stream.end_line()
+        _thread_state.prefix = None
 
 
 def json_filedump(name, obj):
@@ -0,0 +1,190 @@
+""" bytecode.py
+
+Ship precompiled bytecode, so lambda doesn't compile every module of a python function on each cold start (the
+package is read only there, so nothing it compiles is ever kept).  It's turned on in the manifest:
+
+    "bytecode": true
+
+or, to ship only the bytecode for dependencies and source files alike:
+
+    "bytecode": {"strip sources": true}
+
+Modules are compiled by the interpreter of the function's runtime (the blambda-3.x pyenv virtualenv, see
+env_manager), since bytecode is specific to a python version.  For python 3.7+ the .pyc files are unchecked hash
+based pycs in __pycache__, which are used without comparing them to the source's mtime (the archive's timestamps are
+all the same, see archive.py).  Older runtimes can only validate pycs by timestamp, so they only get bytecode when
+sources are stripped, which uses the legacy sourceless layout (mod.pyc in place of mod.py).
+
+Compiled files are cached in ~/.cache/blambda/bytecode by interpreter and source content, so unchanged modules are
+never recompiled.
+"""
+import hashlib
+import json
+import os
+import subprocess as sp
+import sys
+from pathlib import Path
+
+from termcolor import cprint
+
+from . import env_manager, package_cache
+
+# runs under the runtime's interpreter, which may be python 2.7
+_INFO_SCRIPT = '''
+import json, sys
+tag = getattr(getattr(sys, 'implementation', None), 'cache_tag', None)
+print(json.dumps({'version': list(sys.version_info[:2]), 'tag': tag}))
+'''
+
+_COMPILE_SCRIPT = '''
+import json, py_compile, sys
+kwargs = {}
+if sys.version_info >= (3, 7):
+    kwargs['invalidation_mode'] = py_compile.PycInvalidationMode.UNCHECKED_HASH
+failed = []
+for source, target, display_name in json.load(sys.stdin):
+    try:
+        py_compile.compile(source, target, display_name, True, **kwargs)
+    except Exception:
+        failed.append(source)
+print(json.dumps(failed))
+'''
+
+_interpreters = {}
+
+
+def bytecode_config(manifest):
+    """ The manifest's bytecode settings, or None if it's off """
+    config = manifest.json.get('bytecode')
+    if not config or 'python' not in manifest.runtime:
+        return None
+    return config if isinstance(config, dict) else {}
+
+
+def runtime_python(runtime):
+    """ The interpreter for a lambda runtime: its blambda virtualenv, or this interpreter if it's the same version
+
+    Returns:
+        str: path to python, or None if there isn't one
+    """
+    env = env_manager.EnvManager(runtime)
+    if env.runtime.name == runtime.lower() and os.path.isfile(env.python):
+        return env.python
+    if runtime.lower() == f'python{sys.version_info[0]}.{sys.version_info[1]}':
+        return sys.executable
+    return None
+
+
+def interpreter_info(python):
+    """ {'version': [major, minor], 'tag': cache tag (None for python 2)} of an interpreter """
+    if python not in _interpreters:
+        out = sp.check_output([python, '-c', _INFO_SCRIPT])
+        _interpreters[python] = json.loads(out.decode('utf-8'))
+    return _interpreters[python]
+
+
+def compile_package(manifest, dependencies, sources, config):
+    """ Replace / supplement the python modules in a package with their bytecode
+
+    Args:
+        manifest (LambdaManifest): the function
+        dependencies (list((str, Path))): (archive name, path) of the installed dependencies
+        sources (dict): {archive name: path} of the function's source files
+        config (dict): from bytecode_config
+
+    Returns:
+        (list((str, Path)), dict): the dependencies and sources to package
+    """
+    python = runtime_python(manifest.runtime)
+    if python is None:
+        cprint(f"No {manifest.runtime} interpreter found (run 'blambda deps {manifest.full_name}'), "
+               f"packaging {manifest.full_name} without bytecode", 'yellow')
+        return dependencies, sources
+
+    info = interpreter_info(python)
+    strip = bool(config.get('strip sources'))
+    if not strip and tuple(info['version']) < (3, 7):
+        cprint(f"{manifest.runtime} can only use bytecode if sources are stripped "
+               f"(\"bytecode\": {{\"strip sources\": true}}), packaging {manifest.full_name} without it", 'yellow')
+        return dependencies, sources
+
+    # any bytecode already in the lib dir was compiled against different mtimes; it's replaced by ours
+    dependencies = [(arcname, path) for arcname, path in dependencies
+                    if '__pycache__/' not in arcname and not arcname.endswith('.pyc')]
+
+    compiled = compile_modules(dependencies + sorted(sources.items()), python)
+    return (with_bytecode(dependencies, compiled, info['tag'], strip),
+            dict(with_bytecode(sources.items(), compiled, info['tag'], strip)))
+
+
+def with_bytecode(members, compiled, tag, strip=False):
+    """ Add the compiled bytecode of members to them
+
+    Args:
+        members (iterable((str, Path))): (archive name, path) of files
+        compiled (dict): {archive name: compiled file}, from compile_modules
+        tag (str): the interpreter's cache tag, e.g. cpython-38
+        strip (bool): replace the sources with bytecode (in the legacy sourceless layout)
+
+    Returns:
+        list((str, Path)): the members with their bytecode
+    """
+    result = []
+    for arcname, path in members:
+        pyc = compiled.get(arcname)
+        if pyc is None:
+            result.append((arcname, path))
+        elif strip:
+            result.append((arcname + 'c', pyc))
+        else:
+            result.append((arcname, path))
+            result.append((_cache_path(arcname, tag), pyc))
+    return result
+
+
+def _cache_path(arcname, tag):
+    (directory, _, filename) = arcname.rpartition('/')
+    pyc = f'__pycache__/{filename[:-3]}.{tag}.pyc'
+    return f'{directory}/{pyc}' if directory else pyc
+
+
+def compile_modules(members, python):
+    """ Compile the python modules in members that aren't already in the cache, in a single run of the interpreter
+
+    Args:
+        members (iterable((str, Path))): (archive name, path) of files; anything that isn't a .py file is ignored
+        python (str): the interpreter to compile with
+
+    Returns:
+        dict: {archive name: compiled file} of every module that compiled
+    """
+    cache_dir = package_cache.CACHE_ROOT / 'bytecode' / '{}.{}'.format(*interpreter_info(python)['version'])
+    compiled = {}
+    jobs = []
+    for arcname, path in members:
+        if not arcname.endswith('.py'):
+            continue
+        # the archive name is compiled in as the module's filename (for tracebacks)
+        digest = hashlib.sha256(f'{arcname}\0'.encode('utf-8'))
+        digest.update(package_cache.file_digest(path).encode('utf-8'))
+        target = cache_dir / (digest.hexdigest() + '.pyc')
+        if target.is_file():
+            compiled[arcname] = target
+        elif not target.with_suffix('.failed').exists():
+            jobs.append((str(path), str(target), arcname))
+
+    if jobs:
+        cprint(f"Compiling {len(jobs)} modules to bytecode", 'blue')
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        result = sp.run([python, '-c', _COMPILE_SCRIPT], input=json.dumps(jobs).encode('utf-8'), stdout=sp.PIPE)
+        failed = set(json.loads(result.stdout.decode('utf-8') or '[]')) if result.returncode == 0 else None
+        if failed is None:
+            cprint(f"Compiling bytecode with {python} failed", 'red')
+            return compiled
+        for source, target, arcname in jobs:
+            if source in failed:
+                # e.g. python 2 only code in a python 3 package; the source is shipped, and it isn't tried again
+                Path(target).with_suffix('.failed').touch()
+            else:
+                compiled[arcname] = Path(target)
+    return compiled
@@ -0,0 +1,103 @@
+""" coffee.py
+
+Compile coffeescript source files for packaging.  Compiled files are cached in ~/.cache/blambda/coffee by compiler
+and source content, so unchanged files are never recompiled, and everything that does need compiling (for one
+function, or every function in a bulk deploy) is compiled in as few runs of the compiler as possible.
+"""
+import collections
+import hashlib
+import os
+import shutil
+import subprocess as sp
+import tempfile
+from pathlib import Path
+
+from termcolor import cprint
+
+from . import package_cache
+from .base import spawn
+
+# files per compiler run, to stay well under the command line length limit
+CHUNK_SIZE = 200
+
+
+def js_name(coffee_file):
+    """ return the name of the provided file with the extension replaced by 'js'
+    Args:
+        coffee_file (str): name of a file to replace the extension of
+    """
+    return "{}.js".format(os.path.splitext(coffee_file)[0])
+
+
+def compiler_key(coffee):
+    """ identify a coffee compiler (node_modules/.bin/coffee is a symlink into the coffee-script package) """
+    real = os.path.realpath(str(coffee))
+    try:
+        stat = os.stat(real)
+        fingerprint = f'{real}\0{stat.st_size}\0{stat.st_mtime_ns}'
+    except OSError:
+        fingerprint = real
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+
+def cache_path(coffee_file, coffee):
+    return package_cache.CACHE_ROOT / 'coffee' / compiler_key(coffee) / (package_cache.file_digest(coffee_file) + '.js')
+
+
+def compile_all(sources):
+    """ Compile coffeescript files, unless they're already in the cache
+
+    Args:
+        sources (iterable((Path, Path))): (coffee file, node_modules/.bin dir with the coffee compiler to use)
+
+    Returns:
+        dict: {coffee file: compiled .js file}
+    """
+    compiled = {}
+    batches = collections.defaultdict(dict)  # compiler -> {cache path: coffee file}
+    for coffee_file, npm_bin_dir in sources:
+        coffee = Path(npm_bin_dir) / 'coffee'
+        target = cache_path(coffee_file, coffee)
+        compiled[coffee_file] = target
+        if not target.is_file():
+            batches[coffee][target] = coffee_file
+
+    for coffee, batch in batches.items():
+        _compile_batch(coffee, batch)
+    return compiled
+
+
+def _compile_batch(coffee, batch):
+    cache_dir = next(iter(batch)).parent
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cprint(f"Compiling {len(batch)} coffeescript files", 'blue')
+
+    items = sorted(batch.items())
+    with tempfile.TemporaryDirectory(dir=str(cache_dir)) as scratch:
+        (in_dir, out_dir) = (Path(scratch) / 'in', Path(scratch) / 'out')
+        in_dir.mkdir()
+
+        for start in range(0, len(items), CHUNK_SIZE):
+            chunk = items[start:start + CHUNK_SIZE]
+            # the inputs are named by their cache key, so files with the same name don't collide in the output dir
+            inputs = []
+            for target, coffee_file in chunk:
+                staged = in_dir / (target.stem + '.coffee')
+                shutil.copyfile(str(coffee_file), str(staged))
+                inputs.append(str(staged))
+
+            result = sp.run([str(coffee), '-o', str(out_dir), '-bc'] + inputs, stdout=sp.PIPE, stderr=sp.PIPE)
+            for target, coffee_file in chunk:
+                output = out_dir / (target.stem + '.js')
+                if result.returncode == 0 and output.is_file():
+                    os.replace(str(output), str(target))
+                else:
+                    # compile it on its own, under its real name, so any error points at the right file
+                    _compile_one(coffee, coffee_file, target, Path(scratch))
+
+
+def _compile_one(coffee, coffee_file, target, scratch):
+    out_dir = scratch / 'single'
+    command = f"{coffee} -o {out_dir} -bc {coffee_file}"
+    spawn(command, show=True, raise_on_fail=True)
+    os.replace(str(out_dir / js_name(Path(coffee_file).name)), str(target))
@@ -2,17 +2,13 @@ import itertools
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import boto3
-from botocore.client import Config as BotoConfig
 import time
 
-client = boto3.client(
-    'logs',
-    region_name='us-east-1',
-    config=BotoConfig(
-        connect_timeout=10,
-        read_timeout=300)
-)
+from . import aws
+
+
+def logs_client():
+    return aws.client('logs', connect_timeout=10, read_timeout=300)
 
 
 def merge_lists(lists):
@@ -33,7 +29,7 @@ def get_streams(log_group, from_ms, to_ms, quiet=False):
     common = "".join([fds[i] for i in range(minlen) if fds[i] == tds[i]])
     if not quiet:
         print("getting streams with prefix {}".format(common))
-    response = client.describe_log_streams(
+    response = logs_client().describe_log_streams(
         logGroupName=log_group,
         logStreamNamePrefix=common
     )
@@ -41,7 +37,7 @@ def get_streams(log_group, from_ms, to_ms, quiet=False):
 
 
 def get_events(log_group, stream, from_ms, to_ms, quiet=False):
-    events = client.get_log_events(
+    events = logs_client().get_log_events(
         logGroupName=log_group,
         logStreamName=stream,
         startTime=from_ms,
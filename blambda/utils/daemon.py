@@ -0,0 +1,176 @@
+""" daemon.py
+
+An optional, resident blambda process that keeps manifest indexes warm between cli invocations, kept up to date by
+a background watcher.
+
+AWS calls are never made by the daemon: it would use the credentials and environment (AWS_PROFILE, ...) it was
+started with, not the ones of the command asking, and silently query the wrong account once they change.
+
+The cli talks to it over a unix socket with newline delimited json.  Everything that uses the daemon must fall back
+to doing the work in-process when it isn't running, so it is purely a speed-up:
+
+    try:
+        result = daemon.request('manifests', root=root)
+    except daemon.DaemonUnavailable:
+        result = do_it_the_slow_way()
+
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+SOCKET_PATH = os.path.join(os.path.expanduser('~'), '.config', 'blambda', 'daemon.sock')
+LOG_PATH = os.path.join(os.path.expanduser('~'), '.config', 'blambda', 'daemon.log')
+
+# set in the daemon's own environment (and usable by anyone else) to stop blambda from talking to a daemon
+DISABLE_ENV_VAR = 'BLAMBDA_NO_DAEMON'
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_TIMEOUT = 30
+
+
+class DaemonUnavailable(Exception):
+    """ The daemon isn't running, or couldn't answer -- do the work in-process instead """
+
+
+def request(command, timeout=DEFAULT_TIMEOUT, **params):
+    """ Send a single request to the daemon and return its result
+
+    Args:
+        command (str): name of the command to run
+        timeout (float): seconds to wait for an answer (None waits forever)
+        **params: json serializable arguments for the command
+
+    Raises:
+        DaemonUnavailable: if the daemon isn't running or the request failed for any reason
+    """
+    if os.environ.get(DISABLE_ENV_VAR) or not os.path.exists(SOCKET_PATH):
+        raise DaemonUnavailable("daemon is not running")
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(SOCKET_PATH)
+            sock.sendall(json.dumps({'command': command, 'params': params}).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as f:
+                response = json.loads(f.readline().decode('utf-8'))
+    except (OSError, ValueError) as e:
+        raise DaemonUnavailable(str(e))
+
+    if 'error' in response:
+        raise DaemonUnavailable(response['error'])
+    return response.get('result')
+
+
+def is_running():
+    try:
+        request('ping', timeout=1)
+        return True
+    except DaemonUnavailable:
+        return False
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            message = json.loads(line.decode('utf-8'))
+            result = self.server.dispatch(message['command'], message.get('params', {}))
+            response = {'result': result}
+        except Exception as e:
+            response = {'error': f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+        # only once the answer is sent: the process exits when serving stops, taking this (daemon) thread with it
+        if self.server.stopping:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+class BlambdaDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ The resident process.  Each request is handled on its own thread. """
+    daemon_threads = True
+
+    def __init__(self, socket_path=SOCKET_PATH, poll_interval=DEFAULT_POLL_INTERVAL):
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super(BlambdaDaemon, self).__init__(socket_path, _RequestHandler)
+        os.chmod(socket_path, 0o600)
+
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.started = time.time()
+        self.stopping = False
+        self.indexes = {}
+        self.index_modes = {}
+        self.index_lock = threading.Lock()
+        self.commands = {
+            'ping': self.ping,
+            'stop': self.stop,
+            'manifests': self.manifests,
+        }
+
+    def serve(self):
+        os.environ[DISABLE_ENV_VAR] = '1'  # the daemon must never try to talk to itself
+        watcher = threading.Thread(target=self.watch, daemon=True)
+        watcher.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def dispatch(self, command, params):
+        if command not in self.commands:
+            raise ValueError(f"unknown command: {command}")
+        return self.commands[command](**params)
+
+    def watch(self):
+        """ Keep every index we've been asked about up to date (and saved) as the filesystem changes
+
+        Requests still do a (cheap, stat-only) refresh of their own, so they never see stale results; the watcher
+        means that any changed manifests have already been parsed by the time somebody asks.
+        """
+        while True:
+            time.sleep(self.poll_interval)
+            with self.index_lock:
+                for root, index in self.indexes.items():
+                    index.refresh(use_git=self.index_modes[root])
+                    index.save()
+
+    # commands
+
+    def ping(self):
+        return {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started,
+            'roots': sorted(self.indexes),
+        }
+
+    def stop(self):
+        self.stopping = True
+        return 'stopping'
+
+    def manifests(self, root, rebuild=False, use_git=False, verbose=False):
+        from .manifest_index import load_index
+
+        with self.index_lock:
+            index = self.indexes.get(root)
+            if rebuild or index is None or self.index_modes[root] != use_git:
+                index = self.indexes[root] = load_index(root, rebuild=rebuild, use_git=use_git)
+                self.index_modes[root] = use_git
+            else:
+                index.refresh(use_git=use_git)
+                index.save()
+            files = index.files
+
+        if verbose:
+            return files
+        return {relpath: entry for relpath, entry in files.items() if 'manifest' in entry}
@@ -0,0 +1,123 @@
+""" discovery.py
+
+Finds candidate manifest files as cheaply as possible.
+
+    * directories that can't contain manifests (VCS metadata, installed dependencies in lib_<fn> /
+      node_modules_<fn>, node_modules, __pycache__) are never walked into
+    * .json files are checked for the "blambda": "manifest" marker before anybody bothers to parse them
+    * optionally, candidates are listed with 'git ls-files' rather than walking the filesystem at all
+
+"""
+import os
+import re
+import subprocess as sp
+
+from .lambda_manifest import LambdaManifest
+
+MAX_MANIFEST_SIZE = LambdaManifest.MAX_FILESIZE
+
+SKIP_DIRS = frozenset(('.git', '.hg', '.svn', '.blambda', '.idea', '__pycache__', 'node_modules'))
+DEPENDENCY_DIR_PREFIXES = ('lib_', 'node_modules_')
+
+MANIFEST_MARKER = re.compile(rb'"blambda"\s*:\s*"manifest"')
+
+
+def is_dependency_dir(dirname, json_files):
+    """ lib_<fn> / node_modules_<fn> are the installed dependencies of the function described by <fn>.json """
+    for prefix in DEPENDENCY_DIR_PREFIXES:
+        if dirname.startswith(prefix) and dirname[len(prefix):] + '.json' in json_files:
+            return True
+    return False
+
+
+def list_dir(path):
+    """ List the subdirectories worth searching and the .json files in a directory
+
+    Args:
+        path (str): directory to list
+
+    Returns:
+        tuple(list, list): sorted (subdirectory names, json file names)
+    """
+    dirs = []
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS:
+                    dirs.append(entry.name)
+            elif entry.name.endswith('.json') and entry.is_file():
+                files.append(entry.name)
+
+    json_files = set(files)
+    dirs = [d for d in dirs if not is_dependency_dir(d, json_files)]
+    return sorted(dirs), sorted(files)
+
+
+def walk(root):
+    """ Yield the path of every candidate .json file below root, skipping directories that can't hold manifests """
+    try:
+        dirs, files = list_dir(root)
+    except OSError:
+        return
+
+    for filename in files:
+        yield os.path.join(root, filename)
+    for dirname in dirs:
+        yield from walk(os.path.join(root, dirname))
+
+
+def git_json_files(root):
+    """ List the .json files below root that git knows about (tracked, or untracked but not ignored)
+
+    Returns:
+        list(str): paths relative to root, or None if root isn't in a git work tree
+    """
+    # -z: without it git quotes paths with non-ascii or special characters, which then don't exist
+    try:
+        result = sp.run(['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard', '--', '*.json'],
+                        cwd=str(root), stdout=sp.PIPE, stderr=sp.DEVNULL)
+    except OSError:
+        return None  # no git
+    if result.returncode != 0:
+        return None
+
+    out = set()
+    for relpath in os.fsdecode(result.stdout).split('\0'):
+        if not relpath:
+            continue
+        parts = relpath.split('/')
+        if any(part in SKIP_DIRS for part in parts[:-1]):
+            continue
+        out.add(os.path.normpath(relpath))
+
+    # prune dependency dirs the same way the directory walk does
+    return sorted(p for p in out if not _in_dependency_dir(p, out))
+
+
+def _in_dependency_dir(relpath, json_files):
+    parent, dirname = os.path.split(os.path.dirname(relpath))
+    while dirname:
+        for prefix in DEPENDENCY_DIR_PREFIXES:
+            if dirname.startswith(prefix) and os.path.join(parent, dirname[len(prefix):] + '.json') in json_files:
+                return True
+        parent, dirname = os.path.split(parent)
+    return False
+
+
+def looks_like_manifest(path, size=None):
+    """ Cheap check for whether a .json file could be a manifest, without parsing it
+
+    Args:
+        path (str): path to the .json file
+        size (int): size of the file, if it's already known
+    """
+    try:
+        if size is None:
+            size = os.path.getsize(path)
+        if size > MAX_MANIFEST_SIZE:
+            return False
+        with open(path, 'rb') as f:
+            return MANIFEST_MARKER.search(f.read(MAX_MANIFEST_SIZE)) is not None
+    except OSError:
+        return False
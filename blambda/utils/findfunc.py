@@ -1,48 +1,142 @@
 import os
+import threading
 
 from termcolor import cprint
 
+from .. import config
+from . import aws, daemon
 from .base import spawn, json_fileload, die
-from .lambda_manifest import LambdaManifest
+from .manifest_index import SourceIndex, build_manifests, load_index
+
+
+class ManifestResolver(object):
+    """ Resolves function names to manifests with hash lookups
+
+    A function can be referred to by its short name, full name, group/short_name or deployed name.  The resolver
+    is built once from the manifest index, mapping each of those names to the manifests that answer to it, so that
+    resolving any number of names costs a single discovery pass.
+    """
+
+    def __init__(self, manifests, sources=None):
+        super(ManifestResolver, self).__init__()
+        self.manifests = list(manifests)
+        self.sources = sources
+        self.by_path = {str(m.path): m for m in self.manifests}
+        self.by_name = {}
+        for manifest in self.manifests:
+            for name in manifest_names(manifest):
+                matches = self.by_name.setdefault(name, [])
+                if manifest not in matches:
+                    matches.append(manifest)
+
+    def find(self, function_name):
+        """ Find a single manifest by name, preferring the one in pwd if the name is ambiguous """
+        matching = self.by_name.get(function_name)
+        if not matching:
+            return None
+
+        # prefer the manifest in pwd, if possible
+        if len(matching) > 1:
+            for match in matching:
+                if match.basedir.samefile('.'):
+                    return match
+
+        # otherwise just return the first available match
+        return matching[0]
+
+    def resolve(self, function_names, fail_if_missing=False):
+        """ Find the manifest for each of a list of names
+
+        Args:
+            function_names (iterable(str)): function names to look up
+            fail_if_missing (bool): exit if any of the names can't be found
+
+        Returns:
+            dict: function name -> LambdaManifest, or None if the name couldn't be found
+        """
+        resolved = {name: self.find(name) for name in function_names}
+        missing = [name for name, manifest in resolved.items() if manifest is None]
+        if missing and fail_if_missing:
+            die(f"Couldn't find {', '.join(missing)}")
+        return resolved
+
+    def matching(self, function_names):
+        """ Get every manifest that answers to any of the given names, in index order """
+        matched = {m for name in set(function_names) for m in self.by_name.get(name, ())}
+        return [m for m in self.manifests if m in matched]
+
+    def using(self, filenames):
+        """ Get every manifest that includes any of the given source files (or is one of them), in index order """
+        matched = set()
+        for filename in filenames:
+            manifest = self.by_path.get(os.path.abspath(filename))
+            if manifest:
+                matched.add(manifest)
+            if self.sources:
+                matched.update(self.by_path[p] for p in self.sources.users(filename) if p in self.by_path)
+        return [m for m in self.manifests if m in matched]
+
+
+def manifest_names(manifest):
+    """ All of the names a manifest can be referred to by """
+    return (manifest.short_name, manifest.full_name, f'{manifest.group}/{manifest.short_name}', manifest.deployed_name)
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(root=None, rebuild=False):
+    """ Get the (per-process) ManifestResolver for a search root, building it the first time it's needed
+
+    Args:
+        root (str): directory to search, defaults to the git root
+        rebuild (bool): rebuild the resolver (and the manifest index) from scratch
+    """
+    root = os.path.abspath(root or get_search_root())
+    with _resolvers_lock:
+        if rebuild or root not in _resolvers:
+            files = _index_files(root, rebuild=rebuild)
+            _resolvers[root] = ManifestResolver(build_manifests(root, files), SourceIndex(root, files))
+        return _resolvers[root]
 
 
 def find_manifest(function_name, fail_if_missing=False):
     """Find an individual manifest given a function name"""
-    manifests = find_all_manifests(get_search_root())
-    matching = [m for m in manifests if function_name in (m.short_name, m.full_name, f'{m.group}/{m.short_name}')]
-    if not matching:
-        if fail_if_missing:
-            die(f"Couldn't find {function_name}")
-        return None
-
-    # prefer the manifest in pwd, if possible
-    if len(matching) > 1:
-        for match in matching:
-            if match.basedir.samefile('.'):
-                return match
-
-    # otherwise just return the first available match
-    return matching[0]
+    manifest = get_resolver().find(function_name)
+    if manifest is None and fail_if_missing:
+        die(f"Couldn't find {function_name}")
+    return manifest
 
 
 def find_manifests(function_names):
     """Find a set of manifests given a set of function name"""
-    manifests = find_all_manifests(get_search_root())
+    return get_resolver().matching(function_names)
+
 
-    # get manifests where either short_name or full_name is in the function_names list
-    return [m for m in manifests
-            if any(name in function_names for name in (m.short_name, m.full_name, f'{m.group}/{m.short_name}'))]
+def find_all_manifests(root, verbose=False, rebuild=False, use_git=None):
+    """Find all manifests in a given directory/root
 
+    Args:
+        root (str|Path): directory to search
+        verbose (bool): print out any json files that aren't valid manifests
+        rebuild (bool): rebuild the on-disk manifest index from scratch instead of updating it incrementally
+        use_git (bool): list candidates with 'git ls-files' rather than walking the tree.  Defaults to the
+                        'discovery' config variable being set to 'git'
+    """
+    root = os.path.abspath(root)
+    return build_manifests(root, _index_files(root, verbose, rebuild, use_git), verbose)
 
-def find_all_manifests(root, verbose=False):
-    """Find all manifests in a given directory/root"""
-    json_files = _all_json_files(root)
-    manifests = (_load_manifest(json_file, verbose) for json_file in json_files)
-    return [m for m in manifests if m]
 
+def _index_files(root, verbose=False, rebuild=False, use_git=None):
+    """ Get the (refreshed) manifest index entries for a root, from the daemon if it's running """
+    if use_git is None:
+        use_git = config.load_cached().get('discovery') == 'git'
 
-def _all_json_files(root):
-    return [os.path.join(r, f) for r, _, fs in os.walk(root) for f in fs if f.endswith('.json')]
+    try:
+        return daemon.request('manifests', root=root, rebuild=rebuild, use_git=use_git, verbose=verbose)
+    except daemon.DaemonUnavailable:
+        return load_index(root, rebuild=rebuild, use_git=use_git).files
 
 
 def get_search_root():
@@ -61,17 +155,12 @@ def get_runtime(manifest_path):
         cprint("{} is not valid json: {}".format(manifest_path, e), 'red')
 
 
-def _load_manifest(filename, verbose=True):
-    try:
-        return LambdaManifest(filename, parse_json=True)
-    except ValueError as e:
-        if verbose:
-            cprint(e, 'red')
+def all_remote_functions(region=None):
+    return list_remote_functions(aws.client('lambda', region or aws.region()))
 
 
-def all_remote_functions(region="us-east-1"):
-    import boto3
-    lmb = boto3.client('lambda', region_name=region)
+def list_remote_functions(lmb):
+    """ Get the name and description of every deployed lambda function """
     functions = {}
 
     def getfs(marker=None):
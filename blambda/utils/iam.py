@@ -4,10 +4,11 @@ from copy import deepcopy
 from difflib import unified_diff
 from pprint import pprint
 
-import boto3
 from botocore.exceptions import ClientError
 from termcolor import cprint
 
+from . import aws
+
 
 def make_assume_role_policy(services):
     policy = {
@@ -143,7 +144,7 @@ def role_policy_upsert(fname, policy_statement, account, vpc, events, dryrun):
     print("applying {} permission(s) to {} as {}:".format(len(policy_statement), role_name, policy_name))
     pprint(desired_policy)
 
-    iam = boto3.resource('iam', region_name='us-east-1')
+    iam = aws.resource('iam', 'us-east-1')
 
     def get_role():
         for r in iam.roles.all():
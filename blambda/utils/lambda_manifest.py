@@ -2,6 +2,7 @@ import json
 import os
 import re
 import shutil
+import sys
 import tempfile
 from pathlib import Path
 
@@ -11,35 +12,30 @@ from . import env_manager
 from .base import spawn, is_string
 
 
-def lazy_property(func):
-    """ Properties decorated with this will be lazy evaluated and stored.
-
-    This is used so that we don't end up recalculating a bunch of path logic unnecessarily.
-
-    """
-    attr = '__lazy_property' + func.__name__
-
-    @property
-    def _lazy_property(self):
-        if not hasattr(self, attr):
-            setattr(self, attr, func(self))
-        return getattr(self, attr)
-
-    return _lazy_property
-
-
 class LambdaManifest(object):
     """ LambdaManifest reads the manifest.json / directory structure to handle lambda function metadata
 
     Figures out the lambda function name / group based on the directory structure
     Validates / parses the manifest .json file to get dependencies / runtime / source files / etc...
 
+    There can be thousands of these alive at once, so they're kept small: the names are computed up front (and
+    interned, since groups are shared by many functions), everything else is derived on demand, and the parsed
+    json is only loaded when something asks for it (and can be dropped again with drop_json()).
+
     """
     MAX_FILESIZE = 10000
 
+    __slots__ = ('_path', 'short_name', 'group', 'full_name', '_json', '_runtime')
+
     def __init__(self, manifest_filename, parse_json=False):
         super(LambdaManifest, self).__init__()
-        self.path = Path(manifest_filename).absolute()
+        path = Path(manifest_filename).absolute()
+        self._path = str(path)
+        self.short_name = sys.intern(path.stem)
+        self.group = sys.intern(path.parent.stem)
+        self.full_name = sys.intern(self._full_name(self.short_name, self.group))
+        self._json = None
+        self._runtime = None
         if parse_json:
             # noinspection PyStatementEffect
             self.json  # todo: this loads/validates as a side effect, eew
@@ -48,11 +44,28 @@ class LambdaManifest(object):
         return f"<LambdaManifest({self.full_name})>"
 
     def __hash__(self):
-        return self.full_name
+        return hash(self._path)
+
+    def __eq__(self, other):
+        if not isinstance(other, LambdaManifest):
+            return NotImplemented
+        return self._path == other._path
 
-    @lazy_property
+    def prime(self, **values):
+        """ Pre-populate lazily computed values that are already known (e.g. the runtime, from the manifest index) """
+        for name, value in values.items():
+            setattr(self, '_' + name, value)
+        return self
+
+    @property
     def json(self):
-        return self.load_and_validate(self.path)
+        if self._json is None:
+            self._json = self.load_and_validate(self._path)
+        return self._json
+
+    def drop_json(self):
+        """ Release the parsed manifest; it will be reloaded from disk if it's needed again """
+        self._json = None
 
     def load_and_validate(self, manifest_filename):
         if os.path.getsize(manifest_filename) > self.MAX_FILESIZE:
@@ -66,20 +79,16 @@ class LambdaManifest(object):
 
         return manifest
 
-    @lazy_property
-    def basedir(self):
-        return self.path.parent
-
-    @lazy_property
-    def group(self):
-        return self.path.parent.stem
+    @property
+    def path(self):
+        return Path(self._path)
 
-    @lazy_property
-    def short_name(self):
-        return self.path.stem
+    @property
+    def basedir(self):
+        return Path(os.path.dirname(self._path))
 
-    @lazy_property
-    def full_name(self):
+    @staticmethod
+    def _full_name(func, group):
         """ Function name (e.g. 'timezone' or 'adwords/textad')
 
         If the function name doesn't match it's parent folder, let's include the folder name
@@ -88,27 +97,27 @@ class LambdaManifest(object):
         Returns:
             str: collapsed function/group name
         """
-        func = self.path.stem
-        group = self.group
         if func.startswith(group):
             return func
         return group + '/' + func
 
-    @lazy_property
+    @property
     def lib_dir(self):
         return self.basedir / ('lib_' + self.short_name)
 
-    @lazy_property
+    @property
     def node_dir(self):
         return self.basedir / ('node_modules_' + self.short_name)
 
-    @lazy_property
+    @property
     def deployed_name(self):
         return self.full_name.replace('/', '_')
 
-    @lazy_property
+    @property
     def runtime(self):
-        return self.json.get('options', {}).get('Runtime', 'python2.7').lower()
+        if self._runtime is None:
+            self._runtime = self.json.get('options', {}).get('Runtime', 'python2.7').lower()
+        return self._runtime
 
     def source_files(self, dest_dir: Path = None):
         """ Return a generator yielding tuples of (source_file, destination_target), unraveling any globs along the way
@@ -157,6 +166,18 @@ class LambdaManifest(object):
                     else:
                         yield src, dest_dir / source_spec
 
+    def source_globs(self):
+        """ Return the absolute glob patterns from the 'source files' section, e.g. '/repo/shared/*.coffee'
+
+        Symlinks in the non-wildcard part of the pattern are resolved, to match the paths yielded by source_files()
+        """
+        for source_spec in self.json.get('source files', []):
+            if type(source_spec) in (tuple, list) and '*' in str(source_spec[0]):
+                pattern_dir, pattern = os.path.split(os.path.normpath(os.path.join(str(self.basedir), source_spec[0])))
+                if '*' not in pattern_dir:
+                    pattern_dir = os.path.realpath(pattern_dir)
+                yield os.path.join(pattern_dir, pattern)
+
     def process_manifest(self, clean=False, prod=False):
         """ loads a manifest file, executes pre and post hooks and installs dependencies
 
@@ -0,0 +1,178 @@
+""" layers.py
+
+Publish functions' installed dependencies as shared lambda layers (`blambda deploy --layers`), so each function's
+code is just its own source files.
+
+Layers are content addressed: each unique set of dependency files (after slimming, pruning, tree shaking and
+bytecode compilation) for a runtime gets one layer, named after the hash of its contents, so functions with the same
+dependencies share it and a layer is only ever published once.  With `--cleanup-layers`, versions of blambda's
+layers that no function version uses any more, and that are older than a grace period (so a layer another deploy has
+just published, but not attached yet, is left alone), are deleted after the deploy.
+
+Lambda puts layers in /opt, so python dependencies go in the layer's python/ dir and node dependencies in
+nodejs/node_modules, which are on the runtimes' import paths.
+"""
+import collections
+import datetime
+import re
+import threading
+
+from botocore.exceptions import ClientError
+from dateutil.parser import parse as dtparse
+from termcolor import cprint
+
+from . import archive, artifacts, aws, package_cache
+
+LAYER_PREFIX = 'blambda_deps_'
+
+# unused layer versions younger than this aren't cleaned up, they may belong to a deploy that's still running
+CLEANUP_MIN_AGE = datetime.timedelta(hours=24)
+
+
+def layer_members(members, runtime):
+    """ The dependency files at their place in a layer
+
+    Args:
+        members (list((str, Path))): (archive name, path) of the dependency files, as packaged with a function
+        runtime (str): the function's runtime
+
+    Returns:
+        list((str, Path)): (archive name in the layer, path)
+    """
+    prefix = 'nodejs/' if 'nodejs' in runtime else 'python/'
+    return [(prefix + arcname, path) for arcname, path in members]
+
+
+def layer_name(key, runtime):
+    """ The name of the layer holding a dependency set (at most 140 letters, digits, - and _) """
+    return f"{LAYER_PREFIX}{re.sub(r'[^A-Za-z0-9]', '_', runtime)}_{key[:32]}"
+
+
+def is_dependency_layer(arn):
+    """ is a layer version arn one of blambda's dependency layers """
+    return f':layer:{LAYER_PREFIX}' in arn
+
+
+def _pages(method, key, **kwargs):
+    """ every item of a paginated lambda listing """
+    while True:
+        response = method(**kwargs)
+        yield from response.get(key, [])
+        if not response.get('NextMarker'):
+            return
+        kwargs['Marker'] = response['NextMarker']
+
+
+class LayerSet:
+    """ The dependency layers used by a deploy, each published (or looked up) once """
+
+    def __init__(self, dryrun=False, use_cache=True):
+        """
+        Args:
+            dryrun (bool): don't publish or delete anything
+            use_cache (bool): reuse / store the layer archives in the dependency cache
+        """
+        self.dryrun = dryrun
+        self.use_cache = use_cache
+        self.arns = {}  # layer name -> layer version arn
+        # functions deployed at the same time that share a layer wait for one of them to publish it
+        self._locks = collections.defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def arn(self, manifest, members):
+        """ The layer version holding a function's dependencies, publishing it if it doesn't exist yet
+
+        Args:
+            manifest (LambdaManifest): the function
+            members (list((str, Path))): (archive name, path) of the dependency files
+
+        Returns:
+            str: the layer version arn
+        """
+        members = layer_members(members, manifest.runtime)
+        name = layer_name(package_cache.dependency_key(members, {}), manifest.runtime)
+        with self._lock:
+            layer_lock = self._locks[name]
+        with layer_lock:
+            return self._arn(manifest, name, members)
+
+    def _arn(self, manifest, name, members):
+        if name in self.arns:
+            cprint(f"Using layer {name}", 'blue')
+            return self.arns[name]
+
+        existing = self.latest_version(name)
+        if existing:
+            cprint(f"Using existing layer {name}", 'blue')
+            self.arns[name] = existing
+            return existing
+
+        zip_bytes = self._archive(name, members)
+        print(f"Layer Package: {len(zip_bytes)} bytes")
+        if self.dryrun:
+            with open(f"{name}.zip", 'wb') as f:
+                f.write(zip_bytes)
+            cprint(f"DRYRUN!! -- LAYER: {name}.zip", 'red')
+            arn = f"DRYRUN:{name}"
+        else:
+            cprint(f"Publishing layer {name}", 'yellow')
+            arn = aws.client('lambda').publish_layer_version(
+                LayerName=name,
+                Description=f"dependencies of {manifest.full_name} (and any function with the same ones)",
+                Content=artifacts.code_location(zip_bytes),
+                CompatibleRuntimes=[manifest.runtime],
+            )['LayerVersionArn']
+        self.arns[name] = arn
+        return arn
+
+    def latest_version(self, name):
+        """ The arn of the newest version of a layer, or None if it doesn't exist """
+        try:
+            versions = list(_pages(aws.client('lambda').list_layer_versions, 'LayerVersions', LayerName=name))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            return None
+        if not versions:
+            return None
+        return max(versions, key=lambda version: version['Version'])['LayerVersionArn']
+
+    def _archive(self, name, members):
+        zip_bytes = package_cache.get(name, package_cache.DEPENDENCY_CACHE_DIR) if self.use_cache else None
+        if zip_bytes is None:
+            zip_bytes = archive.build(members)
+            if self.use_cache:
+                package_cache.put(name, zip_bytes, package_cache.DEPENDENCY_CACHE_DIR)
+        return zip_bytes
+
+    def cleanup(self, min_age=CLEANUP_MIN_AGE):
+        """ Delete the versions of blambda's dependency layers that no function version uses (nothing, in a dryrun)
+
+        Args:
+            min_age (datetime.timedelta): only delete layer versions created at least this long ago
+
+        Returns:
+            list(str): the arns of the deleted layer versions
+        """
+        if self.dryrun:
+            return []
+
+        client = aws.client('lambda')
+        used = set(self.arns.values())
+        # published versions (and the aliases pointing at them) keep their layers, so they can still be rolled back to
+        for function in _pages(client.list_functions, 'Functions', FunctionVersion='ALL'):
+            used.update(layer['Arn'] for layer in function.get('Layers', []))
+
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - min_age
+        deleted = []
+        for layer in _pages(client.list_layers, 'Layers'):
+            name = layer['LayerName']
+            if not name.startswith(LAYER_PREFIX):
+                continue
+            for version in _pages(client.list_layer_versions, 'LayerVersions', LayerName=name):
+                if version['LayerVersionArn'] in used or dtparse(version['CreatedDate']) > cutoff:
+                    continue
+                cprint(f"Deleting unused layer version {version['LayerVersionArn']}", 'yellow')
+                client.delete_layer_version(LayerName=name, VersionNumber=version['Version'])
+                deleted.append(version['LayerVersionArn'])
+        return deleted
@@ -0,0 +1,241 @@
+""" manifest_index.py
+
+Persistent on-disk index of the lambda function manifests below a search root.
+
+Finding manifests used to mean walking the whole tree and json-loading every .json file on every lookup.  The index
+remembers what was found last time (stored in <root>/.blambda/manifest_index.json) and is refreshed incrementally:
+
+    * a directory whose mtime hasn't changed has the same entries as before, so it isn't listed again
+    * a .json file whose mtime / size haven't changed is the same manifest (or non-manifest) as before,
+      so it isn't parsed again
+
+Candidate files are found with the pruned walk (or 'git ls-files') in discovery.py.
+
+"""
+import json
+import os
+import tempfile
+from pathlib import Path, PurePath
+
+from termcolor import cprint
+
+from . import discovery
+from .lambda_manifest import LambdaManifest
+
+INDEX_VERSION = 3
+INDEX_DIR = '.blambda'
+INDEX_FILENAME = 'manifest_index.json'
+
+
+class ManifestIndex(object):
+    """ Index of all of the manifests found below a root directory
+
+    Paths in the index file are stored relative to the root, so the index survives the tree being moved around.
+    """
+
+    def __init__(self, root):
+        super(ManifestIndex, self).__init__()
+        self.root = Path(root).absolute()
+        self.path = self.root / INDEX_DIR / INDEX_FILENAME
+        self.dirs = {}
+        self.files = {}
+        self.git = False
+        self.dirty = False
+
+    def load(self):
+        """ Read the index file, if there is one.  A missing / corrupt / outdated index is treated as empty. """
+        try:
+            with self.path.open() as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+
+        if type(data) == dict and data.get('version') == INDEX_VERSION:
+            self.dirs = data.get('dirs', {})
+            self.files = data.get('files', {})
+            self.git = data.get('git', False)
+        return self
+
+    def save(self):
+        """ Write the index file atomically.  Failing to write it (read-only checkout, etc) is not an error. """
+        if not self.dirty:
+            return
+
+        data = {'version': INDEX_VERSION, 'dirs': self.dirs, 'files': self.files, 'git': self.git}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            (fd, tmpname) = tempfile.mkstemp(dir=str(self.path.parent), prefix='.manifest_index')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, sort_keys=True)
+            os.replace(tmpname, str(self.path))
+            self.dirty = False
+        except OSError:
+            pass
+
+    def refresh(self, rebuild=False, use_git=False):
+        """ Bring the index up to date with the filesystem
+
+        Args:
+            rebuild (bool): ignore everything that is currently in the index and start from scratch
+            use_git (bool): list candidate files with 'git ls-files' instead of walking the directory tree
+        """
+        old_dirs, old_files = ({}, {}) if rebuild else (self.dirs, self.files)
+        old_git = self.git
+        self.dirs = {}
+        self.files = {}
+
+        candidates = discovery.git_json_files(self.root) if use_git else None
+        self.git = candidates is not None
+        if candidates is None:
+            candidates = self._walk('.', old_dirs)
+
+        for relpath in candidates:
+            self.files[relpath] = self._file_entry(relpath, old_files.get(relpath))
+
+        if rebuild or self.git != old_git or self.dirs != old_dirs or self.files != old_files:
+            self.dirty = True
+        return self
+
+    def _walk(self, reldir, old_dirs):
+        """ yield the relative path of every .json file below reldir, reusing cached listings of unchanged dirs """
+        absdir = self.root / reldir
+        try:
+            mtime = os.stat(str(absdir)).st_mtime_ns
+        except OSError:
+            return
+
+        listing = old_dirs.get(reldir)
+        if not listing or listing['mtime'] != mtime:
+            try:
+                (dirs, files) = discovery.list_dir(str(absdir))
+            except OSError:
+                return
+            listing = {'mtime': mtime, 'dirs': dirs, 'files': files}
+
+        self.dirs[reldir] = listing
+        for filename in listing['files']:
+            yield os.path.normpath(os.path.join(reldir, filename))
+        for dirname in listing['dirs']:
+            yield from self._walk(os.path.normpath(os.path.join(reldir, dirname)), old_dirs)
+
+    def _file_entry(self, relpath, cached):
+        """ Get the index entry for a single .json file, only parsing it if it has changed """
+        path = self.root / relpath
+        try:
+            stat = os.stat(str(path))
+        except OSError as e:
+            return {'mtime': 0, 'size': 0, 'error': str(e)}
+
+        if cached and cached['mtime'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            return cached
+
+        entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+        if not discovery.looks_like_manifest(str(path), stat.st_size):
+            entry['error'] = f'Manifest not valid: "{path}"'
+            return entry
+
+        try:
+            manifest = LambdaManifest(path, parse_json=True)
+            entry['manifest'] = {
+                'full_name': manifest.full_name,
+                'short_name': manifest.short_name,
+                'group': manifest.group,
+                'runtime': manifest.runtime,
+                'source_files': [[str(src), str(dst)] for src, dst in manifest.source_files(dest_dir=Path('.'))],
+                'source_globs': list(manifest.source_globs()),
+            }
+        except ValueError as e:
+            entry['error'] = str(e)
+        return entry
+
+    def manifests(self, verbose=False):
+        """ Get a LambdaManifest for every manifest in the index, in directory order """
+        return build_manifests(self.root, self.files, verbose)
+
+
+def build_manifests(root, files, verbose=False):
+    """ Turn index file entries into LambdaManifests, in directory order
+
+    Args:
+        root (str|Path): the root the index entries are relative to
+        files (dict): relative path -> index entry
+        verbose (bool): print out any json files that aren't valid manifests
+    """
+    root = Path(root)
+    out = []
+    for relpath, entry in sorted(files.items(), key=lambda item: _sort_key(item[0])):
+        data = entry.get('manifest')
+        if data:
+            manifest = LambdaManifest(root / relpath)
+            manifest.prime(runtime=data['runtime'])
+            out.append(manifest)
+        elif verbose and 'error' in entry:
+            cprint(entry['error'], 'red')
+    return out
+
+
+class SourceIndex(object):
+    """ Reverse index from source files to the manifests that include them
+
+    Built from the source files recorded in the manifest index; glob patterns are also matched at query time, so
+    files added to a shared directory after a manifest was indexed are still found.
+    """
+
+    def __init__(self, root, files):
+        super(SourceIndex, self).__init__()
+        root = Path(root)
+        self.by_source = {}
+        self.globs = []
+        for relpath, entry in sorted(files.items(), key=lambda item: _sort_key(item[0])):
+            data = entry.get('manifest')
+            if not data:
+                continue
+            manifest_path = str(root / relpath)
+            for src, _ in data.get('source_files', []):
+                users = self.by_source.setdefault(src, [])
+                if manifest_path not in users:
+                    users.append(manifest_path)
+            for pattern in data.get('source_globs', []):
+                self.globs.append((PurePath(pattern), manifest_path))
+
+    def users(self, filename):
+        """ Get the paths of the manifests that include a file
+
+        Args:
+            filename (str|Path): the (possibly relative, possibly symlinked) source file
+
+        Returns:
+            list(str): absolute paths to the manifests
+        """
+        filename = os.path.realpath(str(filename))
+        users = list(self.by_source.get(filename, []))
+        path = PurePath(filename)
+        for pattern, manifest_path in self.globs:
+            if manifest_path not in users and path.match(str(pattern)):
+                users.append(manifest_path)
+        return users
+
+
+def _sort_key(relpath):
+    """ sort paths so that files come before the contents of sibling directories (just like a directory walk) """
+    parts = relpath.split(os.sep)
+    return [(0, p) for p in parts[:-1]] + [(-1, parts[-1])]
+
+
+def load_index(root, rebuild=False, use_git=False):
+    """ Load, refresh and save the manifest index for a given root
+
+    Args:
+        root (str|Path): directory to search for manifests
+        rebuild (bool): throw away the existing index and rebuild it from scratch
+        use_git (bool): list candidate files with 'git ls-files' instead of walking the directory tree
+
+    Returns:
+        ManifestIndex: the up-to-date index
+    """
+    index = ManifestIndex(root)
+    if not rebuild:
+        index.load()
+    index.refresh(rebuild=rebuild, use_git=use_git)
+    index.save()
+    return index
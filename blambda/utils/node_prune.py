@@ -0,0 +1,316 @@
+""" node_prune.py
+
+Prune the installed dependencies of a node function before they're packaged.  It's turned on in the manifest:
+
+    "node prune": true
+
+or, to tune it:
+
+    "node prune": {
+        "dedupe": true,                       # drop / hoist duplicate copies of a package (default: true)
+        "drop unused": true,                  # drop packages the manifest's dependencies don't need (default: true)
+        "keep": ["aws-xray-sdk-core"],        # packages the function requires without declaring them
+        "exclude": ["moment/locale/*"],       # file rules, as for "slim" (see slim.py)
+        "include": [],
+        "default excludes": true
+    }
+
+node resolves require('x') from a package by looking for node_modules/x in the package's directory, then in each
+directory above it.  Two copies of a package are interchangeable when they have the same version, and everything
+they depend on resolves to interchangeable copies too (their "signature").  So:
+
+    * dedupe: a nested copy is dropped when the copy that would be found without it is interchangeable, and a
+      package that is only installed nested is hoisted to the top level node_modules when it still resolves
+      everything the same from there (that's what lets its other copies be dropped)
+    * drop unused: only the packages reachable from the manifest's dependencies (and "keep"), following the
+      dependencies, optionalDependencies and peerDependencies in each package.json, are packaged, which drops
+      dev dependencies and anything left over from earlier installs
+
+Then files lambda doesn't need (READMEs, tests, source maps, typescript...) are dropped with slim's rules.
+"""
+import collections
+import json
+
+from termcolor import cprint
+
+from . import slim
+
+DEPENDENCY_FIELDS = ('dependencies', 'optionalDependencies', 'peerDependencies')
+
+Package = collections.namedtuple('Package', 'name version dependencies')
+
+
+def prune_config(manifest):
+    """ The manifest's node pruning settings, or None if it's off """
+    config = manifest.json.get('node prune')
+    if not config:
+        return None
+    return config if isinstance(config, dict) else {}
+
+
+def package_locations(arcname):
+    """ The package directories a file is in, outermost first
+
+    Args:
+        arcname (str): path inside the archive, e.g. node_modules/a/node_modules/@s/b/index.js
+
+    Returns:
+        list(str): e.g. ['node_modules/a', 'node_modules/a/node_modules/@s/b']
+    """
+    parts = arcname.split('/')
+    locations = []
+    for i, part in enumerate(parts[:-1]):
+        if part != 'node_modules' or i + 1 >= len(parts) - 1 or parts[i + 1].startswith('.'):
+            continue
+        end = i + 3 if parts[i + 1].startswith('@') else i + 2
+        if end < len(parts):
+            locations.append('/'.join(parts[:end]))
+    return locations
+
+
+def _parent(location):
+    """ the directory whose node_modules a package is installed in ('' for the top level node_modules) """
+    return location.rpartition('/node_modules/')[0]
+
+
+def _name(location):
+    return location.rpartition('node_modules/')[2]
+
+
+class NodeModules:
+    """ The packages in an installed node_modules tree, and how requires between them resolve """
+
+    def __init__(self, members):
+        """
+        Args:
+            members (list((str, Path))): (archive name, path) of every file below node_modules
+        """
+        self.members = members
+        self.packages = {}  # location -> Package, or None if it has no package.json
+        self.hoisted = {}  # new top level location -> the nested location it was copied from
+        self.dropped = set()
+        self._signatures = {}
+        self._cycles = 0
+
+        for arcname, path in members:
+            for location in package_locations(arcname):
+                self.packages.setdefault(location, None)
+            if arcname.endswith('/package.json') and arcname[:-len('/package.json')] in self.packages:
+                self.packages[arcname[:-len('/package.json')]] = _read_package(path)
+
+    def exists(self, location):
+        return location in self.packages and location not in self.dropped
+
+    def resolve(self, context, name, skip=None):
+        """ The location require(name) finds from a package
+
+        Args:
+            context (str): the requiring package's location, or '' for the top level
+            name (str): the package required
+            skip (str): a location to pretend isn't there
+
+        Returns:
+            str: location, or None if it isn't installed
+        """
+        parts = context.split('/') if context else []
+        for end in range(len(parts), -1, -1):
+            if end and parts[end - 1] == 'node_modules':
+                continue
+            candidate = '/'.join(parts[:end] + ['node_modules', name])
+            if candidate != skip and self.exists(candidate):
+                return candidate
+        return None
+
+    def signature(self, location, _active=None):
+        """ What a copy of a package is: its name, version and the signatures of what its dependencies resolve to.
+        Copies with the same signature are interchangeable.
+        """
+        if location in self._signatures:
+            return self._signatures[location]
+        package = self.packages[location]
+        if package is None:
+            return ('?', location)  # nothing is known about it, so it's like nothing else
+
+        active = _active if _active is not None else set()
+        if location in active:
+            self._cycles += 1
+            return (package.name, package.version)  # a dependency cycle
+        cycles = self._cycles
+        active.add(location)
+        resolved = []
+        for dependency in package.dependencies:
+            target = self.resolve(location, dependency)
+            resolved.append((dependency, self.signature(target, active) if target else None))
+        active.discard(location)
+
+        signature = (package.name, package.version, tuple(resolved))
+        if self._cycles == cycles:
+            self._signatures[location] = signature  # signatures cut short by a cycle depend on where it started
+        return signature
+
+    def subtree(self, location):
+        """ a package and every package nested below it """
+        prefix = location + '/'
+        return [loc for loc in self.packages if loc == location or loc.startswith(prefix)]
+
+    def hoist(self):
+        """ Copy packages that are only installed nested to the top level, where all their copies can use them
+
+        Returns:
+            int: how many packages were hoisted
+        """
+        nested = collections.defaultdict(list)  # name -> nested locations
+        for location in sorted(self.packages, key=lambda loc: (loc.count('/'), loc)):
+            if self.exists(location) and _parent(location):
+                nested[_name(location)].append(location)
+
+        hoisted = 0
+        for name, locations in sorted(nested.items()):
+            top = 'node_modules/' + name
+            if top in self.packages:
+                continue
+            groups = collections.defaultdict(list)
+            for location in locations:
+                groups[self.signature(location)].append(location)
+            # the most common copy (then the shallowest) is the one worth hoisting
+            for group in sorted(groups.values(), key=lambda group: (-len(group), group[0].count('/'), group[0])):
+                source = next((location for location in group if self._can_hoist(location, top)), None)
+                if source:
+                    for location in self.subtree(source):
+                        target = top + location[len(source):]
+                        self.packages[target] = self.packages[location]
+                        self.hoisted[target] = location
+                        self._signatures[target] = self.signature(location)
+                    hoisted += 1
+                    break
+        return hoisted
+
+    def _can_hoist(self, source, top):
+        """ would everything in a package's subtree resolve to interchangeable copies from the top level """
+        expected = self.signature(source)
+        for location in self.subtree(source):
+            package = self.packages[location]
+            if package is None:
+                return False
+            for dependency in package.dependencies:
+                old = self.resolve(location, dependency)
+                if old is None or old == source or old.startswith(source + '/'):
+                    continue  # resolves inside the subtree, which moves along with it
+                if dependency == _name(top):
+                    signature = expected
+                else:
+                    new = self.resolve('', dependency)
+                    signature = self.signature(new) if new else None
+                if signature != self.signature(old):
+                    return False
+        return True
+
+    def dedupe(self):
+        """ Drop nested copies that would be replaced by an interchangeable copy further up
+
+        Returns:
+            int: how many copies were dropped
+        """
+        dropped = 0
+        for location in sorted(self.packages, key=lambda loc: (loc.count('/'), loc)):
+            parent = _parent(location)
+            if not parent or not self.exists(location):
+                continue
+            fallback = self.resolve(parent, _name(location), skip=location)
+            if fallback and self.signature(fallback) == self.signature(location):
+                self.dropped.update(self.subtree(location))
+                dropped += 1
+        return dropped
+
+    def reachable(self, roots):
+        """ The packages needed by the root dependencies, or None if that can't be worked out
+
+        Args:
+            roots (iterable(str)): names of the packages the function requires
+
+        Returns:
+            set(str): locations
+        """
+        reached = set()
+        queue = collections.deque(self.resolve('', name) for name in roots)
+        while queue:
+            location = queue.popleft()
+            if location is None or location in reached:
+                continue
+            reached.add(location)
+            package = self.packages[location]
+            if package is None:
+                cprint(f"{location} has no package.json, so its dependencies aren't known", 'yellow')
+                return None
+            queue.extend(self.resolve(location, dependency) for dependency in package.dependencies)
+        return reached
+
+    def kept_members(self, reached=None):
+        """ The members of the remaining packages (with hoisted packages at their new location)
+
+        Args:
+            reached (set(str)): only keep these packages, if given
+        """
+        members = list(self.members)
+        for target, source in sorted(self.hoisted.items()):
+            prefix = source + '/'
+            members.extend((target + arcname[len(source):], path) for arcname, path in self.members
+                           if arcname.startswith(prefix))
+
+        kept = []
+        for arcname, path in members:
+            locations = package_locations(arcname)
+            if locations:
+                if not self.exists(locations[-1]) or (reached is not None and locations[-1] not in reached):
+                    continue
+            kept.append((arcname, path))  # files that aren't in a package (e.g. node_modules/.bin) are kept here
+        return sorted(kept)
+
+
+def _read_package(path):
+    try:
+        with open(str(path), encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    dependencies = set()
+    for field in DEPENDENCY_FIELDS:
+        if isinstance(data.get(field), dict):
+            dependencies.update(data[field])
+    return Package(data.get('name'), data.get('version'), tuple(sorted(dependencies)))
+
+
+def prune(manifest, members, config):
+    """ Dedupe the installed node dependencies, drop unused packages and non-runtime files, and report the savings
+
+    Args:
+        manifest (LambdaManifest): the function
+        members (list((str, Path))): (archive name, path) of every installed dependency file
+        config (dict): from prune_config
+
+    Returns:
+        list((str, Path)): the members to package
+    """
+    if 'nodejs' not in manifest.runtime:
+        cprint(f"Node pruning is only supported for nodejs functions, packaging all of {manifest.full_name}",
+               'yellow')
+        return members
+
+    tree = NodeModules(members)
+    (hoisted, deduped, reached) = (0, 0, None)
+    if config.get('dedupe', True):
+        hoisted = tree.hoist()
+        deduped = tree.dedupe()
+
+    roots = list(manifest.json.get('dependencies', {})) + list(config.get('keep', []))
+    if config.get('drop unused', True) and roots:
+        reached = tree.reachable(roots)
+
+    kept = slim.slim(tree.kept_members(reached), config, manifest.runtime)
+
+    unused = len({loc for loc in tree.packages if tree.exists(loc)} - reached) if reached is not None else 0
+    cprint(f"Hoisted {hoisted}, deduplicated {deduped} and dropped {unused} unused node packages", 'blue')
+    slim.print_size_report(slim.sizes(members), slim.sizes(kept), title='Pruned node dependencies')
+    return kept
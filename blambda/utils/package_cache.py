@@ -0,0 +1,238 @@
+""" package_cache.py
+
+Content addressed cache of built deployment archives, so that a function that hasn't changed isn't packaged again.
+
+An archive is keyed by a hash of everything that goes into it:
+
+    * the manifest (which includes the dependency versions, options and deploy hook commands)
+    * the contents of the resolved source files
+    * the contents of any local scripts the deploy hooks run
+    * the installed dependency directory (lib_<fn> / node_modules_<fn>).  This can be hundreds of MB, so it's
+      fingerprinted by each file's path, size and mtime rather than by content
+    * with "bytecode" on, the version and cache tag of the runtime's interpreter that compiles it
+
+Archives live in ~/.cache/blambda/packages (or $XDG_CACHE_HOME/blambda/packages).  The least recently used are
+removed once there are more than MAX_ENTRIES, or they take up more than `package_cache_mb` MB of disk:
+
+    blambda config set_global package_cache_mb 2048     # per cache dir (packages, dependencies); the default is 1024
+
+Dependency archives (just the installed dependencies, compressed) are cached separately in
+~/.cache/blambda/dependencies, keyed by the declared dependencies and the contents of the installed tree, so functions
+with the same dependency set share one.  Hashing a whole dependency tree is slow, so the content key found for a
+tree is remembered against its path / size / mtime fingerprint and only recomputed when that changes.
+"""
+import hashlib
+import json
+import os
+import shlex
+import tempfile
+from pathlib import Path
+
+from .base import die
+from .. import config
+
+# bump this whenever the way archives are built changes, so old cache entries are never used
+FORMAT_VERSION = 3
+
+MAX_ENTRIES = 200
+
+DEFAULT_MAX_MB = 1024
+
+MAX_FINGERPRINTS = 1000
+
+CACHE_ROOT = Path(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))) / 'blambda'
+CACHE_DIR = CACHE_ROOT / 'packages'
+DEPENDENCY_CACHE_DIR = CACHE_ROOT / 'dependencies'
+
+
+def file_digest(path, algorithm='sha256', chunk_size=1024 * 1024):
+    """ hex digest of a file's contents """
+    digest = hashlib.new(algorithm)
+    with open(str(path), 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_fingerprint(digest, root):
+    """ feed the path / size / mtime of every file below root into a hash """
+    root = str(root)
+    if not os.path.isdir(root):
+        digest.update(b'<no dependency dir>')
+        return
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # dangling symlink
+            relpath = os.path.relpath(path, root)
+            digest.update(f'{relpath}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode('utf-8'))
+
+
+def hook_scripts(manifest):
+    """ local files referenced by the before / after deploy hook commands (they run from the manifest's directory) """
+    for when in ('before', 'after'):
+        for command in manifest.json.get(f'{when} deploy', []):
+            try:
+                words = shlex.split(command)
+            except ValueError:
+                continue
+            for word in words:
+                path = manifest.basedir / word
+                if path.is_file():
+                    yield path
+
+
+def cache_key(manifest):
+    """ Hash everything that affects the contents of a function's deployment archive
+
+    Args:
+        manifest (LambdaManifest): the function
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(f'blambda package v{FORMAT_VERSION}\n'.encode('utf-8'))
+    digest.update(json.dumps(manifest.json, sort_keys=True).encode('utf-8'))
+
+    for src, dst in manifest.source_files(dest_dir=Path('.')):
+        digest.update(f'{dst}\0{file_digest(src)}\n'.encode('utf-8'))
+
+    for script in hook_scripts(manifest):
+        digest.update(f'hook\0{script}\0{file_digest(script)}\n'.encode('utf-8'))
+
+    from . import bytecode  # bytecode uses this module's cache dir
+    if bytecode.bytecode_config(manifest) is not None:
+        python = bytecode.runtime_python(manifest.runtime)
+        info = bytecode.interpreter_info(python) if python else None
+        digest.update(f'bytecode\0{json.dumps(info, sort_keys=True)}\n'.encode('utf-8'))
+
+    dependency_dir = manifest.node_dir if 'nodejs' in manifest.runtime else manifest.lib_dir
+    tree_fingerprint(digest, dependency_dir)
+    return digest.hexdigest()
+
+
+def dependency_key(members, dependencies):
+    """ Hash a set of installed dependencies by content, so identical trees in different lib dirs share a key
+
+    Args:
+        members (list((str, Path))): (archive name, path) of every installed dependency file
+        dependencies (dict): the dependencies declared in the manifest
+
+    Returns:
+        str: hex digest
+    """
+    stat_digest = hashlib.sha256()
+    for arcname, path in members:
+        stat = os.stat(str(path))
+        stat_digest.update(f'{arcname}\0{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0{stat.st_mode}\n'.encode('utf-8'))
+    fingerprint = stat_digest.hexdigest()
+
+    fingerprints_file = DEPENDENCY_CACHE_DIR / 'fingerprints.json'
+    try:
+        with fingerprints_file.open() as f:
+            fingerprints = json.load(f)
+    except (OSError, ValueError):
+        fingerprints = {}
+
+    key = fingerprints.get(fingerprint)
+    if key is None:
+        digest = hashlib.sha256()
+        digest.update(f'blambda dependencies v{FORMAT_VERSION}\n'.encode('utf-8'))
+        digest.update(json.dumps(dependencies, sort_keys=True).encode('utf-8'))
+        for arcname, path in members:
+            executable = bool(os.stat(str(path)).st_mode & 0o111)
+            digest.update(f'{arcname}\0{executable}\0{file_digest(path)}\n'.encode('utf-8'))
+        key = digest.hexdigest()
+
+        fingerprints[fingerprint] = key
+        for stale in list(fingerprints)[:-MAX_FINGERPRINTS]:
+            del fingerprints[stale]
+        _write(fingerprints_file, json.dumps(fingerprints).encode('utf-8'))
+    return key
+
+
+def get(key, cache_dir=None):
+    """ Get a cached archive
+
+    Args:
+        key (str): the cache key
+        cache_dir (Path): CACHE_DIR (the default) or DEPENDENCY_CACHE_DIR
+
+    Returns:
+        bytes: the archive, or None if it isn't cached
+    """
+    path = (cache_dir or CACHE_DIR) / f'{key}.zip'
+    try:
+        with path.open('rb') as f:
+            zip_bytes = f.read()
+        os.utime(str(path))  # mark as recently used
+    except OSError:
+        return None
+    return zip_bytes
+
+
+def put(key, zip_bytes, cache_dir=None):
+    """ Add an archive to the cache
+
+    Args:
+        key (str): the cache key
+        zip_bytes (bytes): the archive
+        cache_dir (Path): CACHE_DIR (the default) or DEPENDENCY_CACHE_DIR
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    _write(cache_dir / f'{key}.zip', zip_bytes)
+    prune(cache_dir=cache_dir)
+
+
+def _write(path, data):
+    """ atomically write a file, so concurrent deploys can't see half written entries """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        (fd, tmpname) = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmpname, str(path))
+    except OSError:
+        pass
+
+
+def max_size():
+    """ The most disk space (in bytes) each cache dir can use """
+    try:
+        return float(config.load_cached().get('package_cache_mb', DEFAULT_MAX_MB)) * 1024 * 1024
+    except ValueError:
+        die("package_cache_mb must be a number of MB")
+
+
+def prune(max_entries=MAX_ENTRIES, cache_dir=None, max_bytes=None):
+    """ Remove the least recently used archives beyond max_entries, or max_bytes (default: max_size()) in total
+
+    Other deploys may be adding, using and pruning the same entries at the same time, so entries that disappear
+    along the way are ignored.
+    """
+    max_bytes = max_size() if max_bytes is None else max_bytes
+    entries = []
+    for path in (cache_dir or CACHE_DIR).glob('*.zip'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort(reverse=True)
+
+    total = 0
+    for index, (_, size, path) in enumerate(entries):
+        total += size
+        # the most recent entry is always kept, even if it's bigger than the limit
+        if index == 0 or (index < max_entries and total <= max_bytes):
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,78 @@
+""" pipeline.py
+
+Run items through a sequence of stages, each with its own number of worker threads, connected by bounded queues.
+While one item is in a later stage (e.g. uploading), the next can be in an earlier one (e.g. packaging), and when a
+later stage falls behind, the queue in front of it fills up and the earlier stage waits, so no more than a few items'
+worth of intermediate results (e.g. archives) are ever held at once.
+"""
+import collections
+import queue
+import threading
+
+Stage = collections.namedtuple('Stage', 'name function workers')
+
+_DONE = object()
+
+
+class Pipeline:
+    def __init__(self, stages, queue_size=2):
+        """
+        Args:
+            stages (list(Stage)): each stage's function is called with the previous stage's result (the item itself
+                                  for the first stage).  An item that a stage returns None for, or raises on, goes no
+                                  further.
+            queue_size (int): how many results can wait for each stage after the first
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.errors = {}  # item -> the exception that stopped it
+
+    def run(self, items):
+        """ Run items through the stages
+
+        Args:
+            items (iterable): the items
+
+        Returns:
+            dict: {item: the last stage's result} for the items that made it through every stage
+        """
+        items = list(items)
+        queues = [queue.Queue()] + [queue.Queue(self.queue_size) for _ in self.stages[1:]] + [queue.Queue()]
+        for item in items:
+            queues[0].put((item, item))
+
+        stage_threads = []
+        for index, stage in enumerate(self.stages):
+            threads = [threading.Thread(target=self._work, args=(stage, queues[index], queues[index + 1]),
+                                        name=f'{stage.name}-{n}', daemon=True)
+                       for n in range(max(1, stage.workers))]
+            for thread in threads:
+                thread.start()
+            stage_threads.append(threads)
+
+        # each stage is finished once everything before it is and it has worked through its queue
+        for index, threads in enumerate(stage_threads):
+            for _ in threads:
+                queues[index].put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        results = {}
+        while not queues[-1].empty():
+            (item, result) = queues[-1].get()
+            results[item] = result
+        return results
+
+    def _work(self, stage, inbox, outbox):
+        while True:
+            work = inbox.get()
+            if work is _DONE:
+                return
+            (item, value) = work
+            try:
+                result = stage.function(value)
+            except BaseException as e:
+                self.errors[item] = e
+                continue
+            if result is not None:
+                outbox.put((item, result))
@@ -0,0 +1,195 @@
+""" slim.py
+
+Optional slimming of a function's installed dependencies before they're packaged.  It's turned on in the manifest:
+
+    "slim": true
+
+or, to tune it:
+
+    "slim": {
+        "exclude": ["botocore/data/*"],       # dropped, on top of the default excludes
+        "include": ["*.dist-info"],           # kept even if an exclude matches
+        "default excludes": true,             # use DEFAULT_EXCLUDES (default: true)
+        "strip": true                         # strip symbols from shared objects (default: false)
+    }
+
+A pattern without a '/' matches any file or directory name in a member's path (e.g. "__pycache__", "*.pyi"), so
+excluding a directory drops everything in it.  A pattern with a '/' is matched against the whole path inside the
+archive (e.g. "numpy/doc/*"), leaving out the leading "node_modules/" for node functions.
+"""
+import collections
+import fnmatch
+import os
+import shutil
+import subprocess as sp
+import tempfile
+
+from termcolor import cprint
+
+from . import package_cache
+
+DEFAULT_EXCLUDES = {
+    'python': (
+        '__pycache__', '*.pyc', '*.pyo', '*.dist-info', '*.egg-info', 'tests', 'test', 'docs', 'doc', 'examples',
+        '*.pyi', 'py.typed', '*.pyx', '*.pxd', '*.c', '*.h', '*.cpp', '*.md', '*.rst',
+    ),
+    'nodejs': (
+        'test', 'tests', '__tests__', 'docs', 'doc', 'example', 'examples', '.github', '*.md', '*.markdown',
+        '*.ts', '*.map', '*.coffee', 'LICENSE*', 'CHANGELOG*', '.npmignore', '.travis.yml', '.eslintrc*',
+        '.bin', '.package-lock.json',
+    ),
+}
+
+SHARED_OBJECT_SUFFIXES = ('.so', '.node')
+
+STRIP_COMMAND = 'strip'
+
+
+def slim_config(manifest):
+    """ The manifest's slimming settings, or None if slimming is off """
+    config = manifest.json.get('slim')
+    if not config:
+        return None
+    return config if isinstance(config, dict) else {}
+
+
+def runtime_family(runtime):
+    return 'nodejs' if 'nodejs' in runtime else 'python'
+
+
+def matches(arcname, patterns):
+    """ does a pattern match the archive path, or any file / directory name in it """
+    parts = arcname.split('/')
+    for pattern in patterns:
+        if '/' in pattern:
+            if fnmatch.fnmatchcase(arcname, pattern):
+                return True
+        elif any(fnmatch.fnmatchcase(part, pattern) for part in parts):
+            return True
+    return False
+
+
+def slim(members, config, runtime):
+    """ Drop excluded members, and strip shared objects if asked to
+
+    Args:
+        members (list((str, Path))): (archive name, path) of every installed dependency file
+        config (dict): from slim_config
+        runtime (str): the function's runtime
+
+    Returns:
+        list((str, Path)): the members to package
+    """
+    excludes = list(config.get('exclude', []))
+    if config.get('default excludes', True):
+        excludes += DEFAULT_EXCLUDES[runtime_family(runtime)]
+    includes = config.get('include', [])
+
+    kept = []
+    for arcname, path in members:
+        package_path = _package_path(arcname)
+        if matches(package_path, includes) or not matches(package_path, excludes):
+            kept.append((arcname, path))
+
+    if config.get('strip'):
+        kept = strip_shared_objects(kept)
+    return kept
+
+
+def _package_path(arcname):
+    """ the part of the path below the outermost node_modules dir (node) / the whole path (python) """
+    return arcname[len('node_modules/'):] if arcname.startswith('node_modules/') else arcname
+
+
+def strip_shared_objects(members):
+    """ Replace shared objects with stripped copies.  Stripped copies are cached by the original's content, so each
+    one is only stripped once.
+    """
+    strip_dir = package_cache.CACHE_ROOT / 'stripped'
+    stripped = []
+    for arcname, path in members:
+        if is_shared_object(arcname):
+            path = _stripped(path, strip_dir)
+        stripped.append((arcname, path))
+    return stripped
+
+
+def is_shared_object(arcname):
+    name = arcname.rsplit('/', 1)[-1]
+    return name.endswith(SHARED_OBJECT_SUFFIXES) or '.so.' in name  # e.g. numpy.libs/libgfortran.so.5
+
+
+def _stripped(path, strip_dir):
+    target = strip_dir / (package_cache.file_digest(path) + os.path.splitext(str(path))[1])
+    if target.is_file():
+        return target
+
+    try:
+        strip_dir.mkdir(parents=True, exist_ok=True)
+        (fd, tmpname) = tempfile.mkstemp(dir=str(strip_dir), prefix='.tmp')
+        os.close(fd)
+        result = sp.run([STRIP_COMMAND, '--strip-unneeded', '-o', tmpname, str(path)],
+                        stdout=sp.PIPE, stderr=sp.PIPE)
+    except OSError as e:
+        cprint(f"Couldn't strip {path}: {e}", 'yellow')
+        return path
+
+    if result.returncode != 0 or os.path.getsize(tmpname) >= os.path.getsize(str(path)):
+        os.unlink(tmpname)  # e.g. not an ELF file, or already stripped
+        return path
+    shutil.copymode(str(path), tmpname)
+    os.replace(tmpname, str(target))
+    return target
+
+
+def package_name(arcname):
+    """ the top level package a member belongs to (a scoped package for node, e.g. @aws-sdk/client-s3) """
+    parts = _package_path(arcname).split('/')
+    if len(parts) == 1:
+        return parts[0]
+    if parts[0].startswith('@') and len(parts) > 2:
+        return '/'.join(parts[:2])
+    return parts[0]
+
+
+def sizes(members):
+    """ {archive name: size in bytes} """
+    return {arcname: os.path.getsize(str(path)) for arcname, path in members}
+
+
+def print_size_report(before, after, top=10, title='Slimmed dependencies'):
+    """ Print the largest packages and files before and after slimming
+
+    Args:
+        before (dict): {archive name: size} before slimming
+        after (dict): {archive name: size} after slimming
+        top (int): how many packages / files to list
+        title (str): what was done to them
+    """
+    packages_before = collections.Counter()
+    packages_after = collections.Counter()
+    for arcname, size in before.items():
+        packages_before[package_name(arcname)] += size
+    for arcname, size in after.items():
+        packages_after[package_name(arcname)] += size
+
+    total_before, total_after = sum(before.values()), sum(after.values())
+    cprint(f"{title} from {_mb(total_before)} ({len(before)} files) "
+           f"to {_mb(total_after)} ({len(after)} files)", 'blue')
+
+    print(f"  {'largest packages':<48} {'before':>10} {'after':>10}")
+    for name, size in packages_before.most_common(top):
+        print(f"  {name:<48} {_mb(size):>10} {_mb(packages_after.get(name, 0)):>10}")
+
+    print(f"  {'largest files':<48} {'before':>10} {'after':>10}")
+    for arcname, size in collections.Counter(before).most_common(top):
+        kept = _mb(after[arcname]) if arcname in after else 'dropped'
+        print(f"  {_shorten(arcname, 48):<48} {_mb(size):>10} {kept:>10}")
+
+
+def _mb(size):
+    return f"{size / (1024 * 1024):.2f}MB"
+
+
+def _shorten(text, width):
+    return text if len(text) <= width else '...' + text[-(width - 3):]
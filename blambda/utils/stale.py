@@ -8,7 +8,7 @@ from .base import (
     timed,
     json_filedump
 )
-from .findfunc import find_manifests, all_remote_functions, get_search_root
+from .findfunc import get_resolver, all_remote_functions, get_search_root
 
 
 def who_needs_update(env="", show_diffs=False, verbose=True):
@@ -30,7 +30,8 @@ def who_needs_update(env="", show_diffs=False, verbose=True):
     json_filedump(f"{env}_shaless.json", missing_shas)
     json_filedump(f"{env}_shas.json", deployed_shas)
 
-    manifests = find_manifests(potentials)
+    resolver = get_resolver()
+    manifests = resolver.matching(potentials)
 
     if verbose:
         info['debug'] = {
@@ -40,17 +41,17 @@ def who_needs_update(env="", show_diffs=False, verbose=True):
             'remote_functions': len(remote_functions)
         }
 
-    outdated = [
-        status for status in (
-            check_update_status(m, deployed_shas[m.deployed_name], show_diffs)
-            for m in manifests
-        ) if status
-    ]
+    outdated = []
+    for m in manifests:
+        status = check_update_status(m, deployed_shas[m.deployed_name], show_diffs)
+        m.drop_json()  # only the names are needed from here on
+        if status:
+            outdated.append(status)
 
     no_sha_found = [
         {'function': m.full_name,
          'reason': 'no sha found on deployed function'}
-        for m in find_manifests(missing_shas)
+        for m in resolver.matching(missing_shas)
     ]
 
     info['functions_needing_update'] = outdated + no_sha_found
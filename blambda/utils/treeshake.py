@@ -0,0 +1,340 @@
+""" treeshake.py
+
+Package only the vendored python modules a function can actually import.  It's turned on in the manifest:
+
+    "tree shake": true
+
+or, with modules that are imported dynamically (by name, from C code, via plugins...) and so can't be found by
+looking at import statements:
+
+    "tree shake": {
+        "keep": ["sqlalchemy.dialects", "jinja2.ext"],    # these modules / packages and everything below them
+        "import handler": true                            # also import the handler and keep every module it loads
+    }
+
+The handler is imported in a separate process, by the interpreter of the function's runtime (see bytecode.py), with
+just the function's dir and lib dir added to its path; only the modules that weren't already loaded by that
+interpreter on its own count.
+
+Starting from the function's source files (the handler and anything else in "source files"), the import statements
+(and importlib.import_module / __import__ calls with literal names) of every reachable module in the lib dir are
+followed.  A data file is kept if the package it lives in is kept, and a dist-info dir if its distribution is.
+Files that don't belong to any package are always kept.
+
+Compiled extensions import python modules from C, which can't be seen, so a top level package that contains any
+extension modules (numpy, pandas, lxml...) is kept whole once it's reachable.  Modules that can't be parsed (e.g.
+python 2 only code) also keep their top level package whole.
+"""
+import ast
+import collections
+import json
+import os
+import re
+import subprocess as sp
+import sys
+
+from termcolor import cprint
+
+from . import bytecode
+
+EXTENSION_SUFFIX = re.compile(r'^([A-Za-z_]\w*)(\..*)?\.(so|pyd)$')
+IDENTIFIER = re.compile(r'^[A-Za-z_]\w*$')
+DIST_INFO = re.compile(r'^([^/]+?)-[^/-]+\.(dist-info|egg-info)$')
+
+IMPORT_TIMEOUT = 60
+
+# runs under the runtime's interpreter, which may be python 2.7: argv is the handler module then the dirs to import
+# it from.  The result is the last line of output, after anything importing the handler prints.
+_IMPORT_SCRIPT = '''
+import importlib, json, sys
+baseline = set(sys.modules)
+sys.path[:0] = sys.argv[2:]
+importlib.import_module(sys.argv[1])
+print('')
+print(json.dumps(sorted(set(sys.modules) - baseline)))
+'''
+
+
+def shake_config(manifest):
+    """ The manifest's tree shaking settings, or None if it's off """
+    config = manifest.json.get('tree shake')
+    if not config:
+        return None
+    return config if isinstance(config, dict) else {}
+
+
+def module_name(arcname):
+    """ The module a file in the archive provides
+
+    Args:
+        arcname (str): path inside the archive
+
+    Returns:
+        (str, bool, bool): (module name, is a package __init__, is an extension), or None if it isn't a module
+    """
+    parts = arcname.split('/')
+    (dirs, filename) = (parts[:-1], parts[-1])
+
+    if filename.endswith('.py'):
+        stem, extension = filename[:-3], False
+    else:
+        match = EXTENSION_SUFFIX.match(filename)
+        if not match:
+            return None
+        stem, extension = match.group(1), True
+
+    is_package = stem == '__init__'
+    names = dirs if is_package else dirs + [stem]
+    if not names or not all(IDENTIFIER.match(name) for name in names):
+        return None
+    return '.'.join(names), is_package, extension
+
+
+def imported_names(source, module, is_package):
+    """ Every module name an import statement in the source could refer to
+
+    Args:
+        source (bytes): python source
+        module (str): the module's name, for resolving relative imports
+        is_package (bool): the source is a package's __init__
+
+    Returns:
+        set(str): names, or None if the source can't be parsed
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    package = module if is_package else module.rpartition('.')[0]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base_parts = package.split('.') if package else []
+                base_parts = base_parts[:len(base_parts) - (node.level - 1)] if node.level > 1 else base_parts
+                base = '.'.join(base_parts + ([node.module] if node.module else []))
+            else:
+                base = node.module or ''
+            if not base:
+                continue
+            names.add(base)
+            for alias in node.names:
+                # 'from package import *' can pull in submodules (via __all__), so it's marked for all of them
+                names.add(f'{base}.*' if alias.name == '*' else f'{base}.{alias.name}')
+
+        elif isinstance(node, ast.Call) and node.args and _string_literal(node.args[0]) is not None:
+            func = node.func
+            func_name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+            if func_name in ('import_module', '__import__'):
+                names.add(_string_literal(node.args[0]))
+    return names
+
+
+def handler_imports(manifest, timeout=IMPORT_TIMEOUT):
+    """ The modules that importing a function's handler loads, beyond those its runtime's interpreter starts with
+
+    Raises:
+        RuntimeError: if there's no interpreter for the runtime, or the handler can't be imported
+    """
+    python = bytecode.runtime_python(manifest.runtime)
+    if python is None:
+        raise RuntimeError(f"no {manifest.runtime} interpreter found")
+    try:
+        result = sp.run([python, '-c', _IMPORT_SCRIPT, manifest.short_name, str(manifest.basedir),
+                         str(manifest.lib_dir)], cwd=str(manifest.basedir), stdin=sp.DEVNULL, stdout=sp.PIPE,
+                        stderr=sp.PIPE, timeout=timeout)
+    except sp.TimeoutExpired:
+        raise RuntimeError(f"importing it took more than {timeout}s")
+    if result.returncode:
+        lines = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit status {result.returncode}")
+    return set(json.loads(result.stdout.decode('utf-8').strip().splitlines()[-1]))
+
+
+def _string_literal(node):
+    """ the value of a string literal node, or None (python before 3.8 parses them as ast.Str) """
+    if isinstance(node, ast.Constant):
+        value = node.value
+    elif sys.version_info < (3, 8) and isinstance(node, ast.Str):
+        value = node.s
+    else:
+        return None
+    return value if isinstance(value, str) else None
+
+
+def _prefixes(name):
+    parts = name.split('.')
+    return ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+class ImportGraph:
+    """ The python modules in a set of archive members, and which of them can be reached from some roots """
+
+    def __init__(self, members):
+        """
+        Args:
+            members (list((str, Path))): (archive name, path) of the installed dependencies
+        """
+        self.members = members
+        self.modules = {}  # module name -> (arcname, path, is_package)
+        self.submodules = collections.defaultdict(list)
+        self.extension_packages = set()
+
+        for arcname, path in members:
+            info = module_name(arcname)
+            if info:
+                (name, is_package, extension) = info
+                self.modules[name] = (arcname, path, is_package)
+                self.submodules[name.rpartition('.')[0]].append(name)
+                if extension:
+                    self.extension_packages.add(name.split('.')[0])
+
+        self.reached = set()
+        self.whole_packages = set()
+        self._queue = collections.deque()
+
+    def _descendants(self, name):
+        return [m for m in self.modules if m == name or m.startswith(name + '.')]
+
+    def add(self, names):
+        """ Mark module names (and their parent packages) as reachable, and follow their imports """
+        self._queue.extend(names)
+        while self._queue:
+            name = self._queue.popleft()
+            if name.endswith('.*'):
+                self._queue.extend(self.submodules.get(name[:-2], []))
+                name = name[:-2]
+
+            for prefix in _prefixes(name):
+                if prefix in self.modules and prefix not in self.reached:
+                    self._reach(prefix)
+
+    def _reach(self, name):
+        self.reached.add(name)
+        top = name.split('.')[0]
+        (arcname, path, is_package) = self.modules[name]
+
+        if arcname.endswith('.py'):
+            with open(str(path), 'rb') as f:
+                names = imported_names(f.read(), name, is_package)
+        else:
+            names = set()
+
+        if (names is None or top in self.extension_packages) and top not in self.whole_packages:
+            self.whole_packages.add(top)
+            self._queue.extend(self._descendants(top))
+        self._queue.extend(names or ())
+
+    def keep(self, names):
+        """ Mark modules / packages, and everything below them, as reachable """
+        for name in names:
+            self.add(self._descendants(name) or [name])
+
+    def kept_members(self):
+        """ The members needed by the reachable modules """
+        reached_distributions = {name.split('.')[0].lower() for name in self.reached}
+        kept = []
+        for arcname, path in self.members:
+            info = module_name(arcname)
+            if info:
+                if info[0] in self.reached:
+                    kept.append((arcname, path))
+                continue
+
+            owner = self._owner(arcname)
+            if owner is not None:
+                if owner in self.reached:
+                    kept.append((arcname, path))
+                continue
+
+            distribution = DIST_INFO.match(arcname.split('/')[0])
+            if distribution and not self._distribution_reached(distribution, path, arcname, reached_distributions):
+                continue
+            kept.append((arcname, path))  # files that don't belong to a package are always kept
+        return kept
+
+    def _owner(self, arcname):
+        """ the innermost package a data file is in """
+        parts = arcname.split('/')[:-1]
+        while parts:
+            name = '.'.join(parts)
+            if name in self.modules:
+                return name
+            parts.pop()
+        return None
+
+    def _distribution_reached(self, match, path, arcname, reached_distributions):
+        top_level = os.path.join(os.path.dirname(str(path)), 'top_level.txt') if arcname.count('/') == 1 else None
+        names = set()
+        if top_level and os.path.isfile(top_level):
+            with open(top_level) as f:
+                names = {line.strip().lower() for line in f if line.strip()}
+        if not names:
+            names = {match.group(1).lower().replace('-', '_')}
+        return bool(names & reached_distributions)
+
+
+def shake(manifest, members, sources, config):
+    """ Drop the installed dependencies that the function can't import, and print what was dropped
+
+    Args:
+        manifest (LambdaManifest): the function
+        members (list((str, Path))): (archive name, path) of every installed dependency file
+        sources (dict): {archive name: path} of the function's source files
+        config (dict): from shake_config
+
+    Returns:
+        list((str, Path)): the members to package
+    """
+    if 'python' not in manifest.runtime:
+        cprint(f"Tree shaking is only supported for python functions, packaging all of {manifest.full_name}",
+               'yellow')
+        return members
+
+    graph = ImportGraph(members)
+    for arcname, path in sorted(sources.items()):
+        info = module_name(arcname)
+        if info and arcname.endswith('.py'):
+            with open(str(path), 'rb') as f:
+                names = imported_names(f.read(), info[0], info[1])
+            if names is None:
+                cprint(f"Couldn't parse {arcname}, packaging all of {manifest.full_name}'s dependencies", 'yellow')
+                return members
+            graph.add(names)
+    graph.keep(config.get('keep', []))
+
+    if config.get('import handler'):
+        try:
+            imported = handler_imports(manifest)
+        except RuntimeError as e:
+            cprint(f"Couldn't import {manifest.short_name} ({e}), using import statements only", 'yellow')
+        else:
+            graph.add(name for name in imported if name in graph.modules)
+
+    kept = graph.kept_members()
+    print_dropped_report(members, kept)
+    return kept
+
+
+def print_dropped_report(members, kept, top=15):
+    """ Print the top level packages that were dropped, completely or partially, largest first """
+    kept_names = {arcname for arcname, _ in kept}
+    dropped = collections.defaultdict(lambda: [0, 0])  # top level name -> [files, bytes]
+    totals = collections.Counter()
+    for arcname, path in members:
+        top_level = arcname.split('/')[0]
+        totals[top_level] += 1
+        if arcname not in kept_names:
+            dropped[top_level][0] += 1
+            dropped[top_level][1] += os.path.getsize(str(path))
+
+    dropped_bytes = sum(size for _, size in dropped.values())
+    cprint(f"Tree shaking dropped {len(members) - len(kept)} of {len(members)} dependency files "
+           f"({dropped_bytes / (1024 * 1024):.2f}MB)", 'blue')
+    for name, (files, size) in sorted(dropped.items(), key=lambda item: -item[1][1])[:top]:
+        how = 'all' if files == totals[name] else f'{files}/{totals[name]}'
+        print(f"  {name:<48} {how:>12} files {size / (1024 * 1024):>8.2f}MB")
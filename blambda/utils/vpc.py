@@ -1,5 +1,4 @@
-import boto3
-
+from . import aws
 from .base import is_string
 
 
@@ -9,7 +8,7 @@ class VpcInfo(object):
     def __init__(self, region, env, vpcid=None):
         self._env = env
         self._region = region
-        self._client = boto3.client('ec2', region_name=region)
+        self._client = aws.client('ec2', region)
         self._vpcid = vpcid or self._get_vpc_id()
         self._subnets = self.get_subnets()
         self._security_groups = self.get_security_groups()
@@ -6,7 +6,7 @@ import sys
 
 from termcolor import cprint
 
-from .utils.findfunc import find_manifest
+from .utils.findfunc import get_resolver
 from .utils.lambda_manifest import LambdaManifest
 
 
@@ -15,8 +15,9 @@ def setup_parser(parser):
 
 
 def run(args):
+    manifests = get_resolver().resolve(args.function_names, fail_if_missing=True)
     for func_name in args.function_names:
-        manifest = find_manifest(func_name, fail_if_missing=True)
+        manifest = manifests[func_name]
 
         if manifest.runtime.startswith('node'):
             cprint(f'skipping {manifest.full_name}, node functions not yet supported', 'yellow')
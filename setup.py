@@ -8,7 +8,7 @@ setup(name='blambda',
       license='MIT',
       url='git@github.com:balihoo/fulfillment-lambda-functions.git',
       install_requires=['boto3', 'python-dateutil', 'requests', 'termcolor', 'lxml', 'beautifulsoup4'],
-      packages=find_packages(exclude=['tests']),
+      packages=find_packages(exclude=['tests', 'benchmarks', 'benchmarks.*']),
       include_package_data=True,
       entry_points={
           'console_scripts': [
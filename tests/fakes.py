@@ -0,0 +1,115 @@
+""" Stand-ins for AWS and the function lookup, shared by the tests that run whole deploys """
+import datetime
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+
+class FakeLambda:
+    """ An in memory stand-in for the parts of the lambda api that deploy uses, with small pages """
+    PAGE_SIZE = 2
+
+    def __init__(self):
+        self.functions = {}
+        self.layers = {}  # name -> {version: zip bytes}
+        self.created = {}  # layer version arn -> CreatedDate
+        self.versions = []  # configurations of published function versions
+        self.deleted = []
+
+    def _page(self, items, key, Marker=None):
+        start = int(Marker or 0)
+        response = {key: items[start:start + self.PAGE_SIZE]}
+        if start + self.PAGE_SIZE < len(items):
+            response['NextMarker'] = str(start + self.PAGE_SIZE)
+        return response
+
+    @staticmethod
+    def _not_found(operation):
+        return ClientError({'Error': {'Code': 'ResourceNotFoundException'}}, operation)
+
+    def layer_arn(self, name, version):
+        return f'arn:aws:lambda:us-east-1:123:layer:{name}:{version}'
+
+    def publish_layer_version(self, LayerName, Content, **kwargs):
+        versions = self.layers.setdefault(LayerName, {})
+        version = max(versions, default=0) + 1
+        versions[version] = Content['ZipFile']
+        self.created[self.layer_arn(LayerName, version)] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        return {'LayerVersionArn': self.layer_arn(LayerName, version), 'Version': version}
+
+    def list_layer_versions(self, LayerName, Marker=None):
+        if LayerName not in self.layers:
+            raise self._not_found('ListLayerVersions')
+        versions = [{'LayerVersionArn': self.layer_arn(LayerName, v), 'Version': v,
+                     'CreatedDate': self.created[self.layer_arn(LayerName, v)]}
+                    for v in sorted(self.layers[LayerName], reverse=True)]
+        return self._page(versions, 'LayerVersions', Marker)
+
+    def list_layers(self, Marker=None):
+        return self._page([{'LayerName': name} for name in sorted(self.layers) if self.layers[name]], 'Layers', Marker)
+
+    def delete_layer_version(self, LayerName, VersionNumber):
+        del self.layers[LayerName][VersionNumber]
+        self.deleted.append(self.layer_arn(LayerName, VersionNumber))
+
+    def _configuration(self, name):
+        function = self.functions[name]
+        return {'FunctionName': name, 'FunctionArn': f'arn:function:{name}', 'CodeSha256': function['sha'],
+                'Layers': [{'Arn': arn} for arn in function['options'].get('Layers', [])]}
+
+    def get_function_configuration(self, FunctionName):
+        if FunctionName not in self.functions:
+            raise self._not_found('GetFunctionConfiguration')
+        return self._configuration(FunctionName)
+
+    def list_functions(self, Marker=None, FunctionVersion=None):
+        functions = [self._configuration(name) for name in sorted(self.functions)]
+        if FunctionVersion == 'ALL':
+            functions += self.versions
+        return self._page(functions, 'Functions', Marker)
+
+    def create_function(self, FunctionName, Code, **options):
+        self.functions[FunctionName] = {'code': Code['ZipFile'], 'sha': None, 'options': options}
+        return self._configuration(FunctionName)
+
+    def update_function_code(self, FunctionName, ZipFile):
+        self.functions[FunctionName]['code'] = ZipFile
+
+    def update_function_configuration(self, FunctionName, **options):
+        self.functions[FunctionName]['options'].update(options)
+        return self._configuration(FunctionName)
+
+
+class DeployTestMixin:
+    """ For unittest.TestCase: run each test in a temporary dir, with a FakeLambda as every aws client, git stubbed
+    out, the package caches inside the temporary dir, and function names resolved through self.manifests
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, str(self.root))
+        cwd = os.getcwd()
+        os.chdir(str(self.root))
+        self.addCleanup(os.chdir, cwd)
+
+        self.client = FakeLambda()
+        self.manifests = {}
+        for target, kwargs in (
+                ('blambda.utils.aws.client', {'return_value': self.client}),
+                ('blambda.deploy.git_sha', {'return_value': 'abc1234'}),
+                ('blambda.deploy.git_local_mods', {'return_value': 0}),
+                ('blambda.deploy.get_resolver', {}),
+                ('blambda.utils.package_cache.CACHE_DIR', {'new': self.root / 'cache' / 'packages'}),
+                ('blambda.utils.package_cache.DEPENDENCY_CACHE_DIR', {'new': self.root / 'cache' / 'dependencies'}),
+                ('blambda.utils.package_cache.CACHE_ROOT', {'new': self.root / 'cache'})):
+            patcher = mock.patch(target, **kwargs)
+            patched = patcher.start()
+            self.addCleanup(patcher.stop)
+            if target.endswith('get_resolver'):
+                patched.return_value.resolve.side_effect = lambda names: {name: self.manifests.get(name)
+                                                                          for name in names}
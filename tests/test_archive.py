@@ -0,0 +1,148 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from blambda import deploy
+from blambda.utils import archive
+from blambda.utils.lambda_manifest import LambdaManifest
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.fn_dir = self.root / 'fn'
+        (self.fn_dir / 'lib_fn' / 'pkg').mkdir(parents=True)
+        (self.fn_dir / 'lib_fn' / 'pkg' / '__init__.py').write_text('x = 1\n')
+        (self.fn_dir / 'lib_fn' / '.hidden').write_text('')
+        (self.fn_dir / 'fn.py').write_text('def lambda_handler(event, context):\n    pass\n')
+        (self.root / 'shared').mkdir()
+        (self.root / 'shared' / 'util.py').write_text('')
+
+        cwd = os.getcwd()
+        os.chdir(str(self.root))
+        self.addCleanup(os.chdir, cwd)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def package(self, **data):
+        data.update({'blambda': 'manifest', 'source files': ['fn.py', ['../shared/util.py', 'shared/util.py']],
+                     'options': {'Runtime': 'python3.8'}})
+        with (self.fn_dir / 'fn.json').open('w') as f:
+            json.dump(data, f)
+        zip_bytes = deploy.package(LambdaManifest(self.fn_dir / 'fn.json'), use_cache=False)
+        return zipfile.ZipFile(io.BytesIO(zip_bytes))
+
+    def test_walk(self):
+        self.assertListEqual(sorted(archive.walk(self.fn_dir / 'lib_fn', 'node_modules')),
+                             [('node_modules/.hidden', self.fn_dir / 'lib_fn' / '.hidden'),
+                              ('node_modules/pkg/__init__.py', self.fn_dir / 'lib_fn' / 'pkg' / '__init__.py')])
+        self.assertListEqual(list(archive.walk(self.root / 'missing')), [])
+
+    def test_walk_symlinks(self):
+        # an npm linked package, with a link back to itself
+        linked = self.root / 'linked'
+        linked.mkdir()
+        (linked / 'index.js').write_text('')
+        (linked / 'self').symlink_to(linked)
+        node_modules = self.fn_dir / 'node_modules_fn'
+        node_modules.mkdir()
+        (node_modules / 'linked').symlink_to(linked)
+        (node_modules / 'also_linked').symlink_to(linked)
+
+        with (self.fn_dir / 'fn.json').open('w') as f:
+            json.dump({'blambda': 'manifest', 'options': {'Runtime': 'nodejs12.x'}, 'dependencies': {'linked': '1'}}, f)
+        members = deploy.dependency_members(LambdaManifest(self.fn_dir / 'fn.json'))
+        self.assertListEqual(sorted(arcname for arcname, _ in members),
+                             ['node_modules/also_linked/index.js', 'node_modules/linked/index.js'])
+        self.assertListEqual(list(archive.walk(node_modules)), [])
+
+    def test_build(self):
+        files = self.root / 'files'
+        files.mkdir()
+        (files / 'text.txt').write_text('hello ' * 1000)
+        (files / 'wheel.whl').write_bytes(b'PK' + b'0' * 1000)
+        (files / 'empty').write_text('')
+        (files / 'r\u00e9sum\u00e9.txt').write_text('\u00e9')
+        (files / 'run.sh').write_text('#!/bin/sh\n')
+        (files / 'run.sh').chmod(0o755)
+
+        zip_bytes = archive.build(sorted(archive.walk(files)), jobs=4)
+        with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+            self.assertIsNone(zf.testzip())
+            infos = {i.filename: i for i in zf.infolist()}
+            self.assertListEqual(sorted(infos), ['empty', 'run.sh', 'r\u00e9sum\u00e9.txt', 'text.txt', 'wheel.whl'])
+            self.assertEqual(infos['text.txt'].compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(infos['wheel.whl'].compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(infos['run.sh'].external_attr >> 16, 0o100755)
+            self.assertEqual(infos['text.txt'].external_attr >> 16, 0o100644)
+            self.assertEqual(infos['text.txt'].date_time, (1980, 1, 1, 0, 0, 0))
+            self.assertEqual(zf.read('text.txt'), b'hello ' * 1000)
+            self.assertEqual(zf.read('r\u00e9sum\u00e9.txt'), '\u00e9'.encode('utf-8'))
+
+    def test_reproducible(self):
+        files = self.root / 'files'
+        (files / 'b').mkdir(parents=True)
+        (files / 'b' / 'one.txt').write_text('one')
+        (files / 'a.txt').write_text('a')
+        first = archive.build(archive.walk(files))
+
+        os.utime(str(files / 'a.txt'), (0, 0))
+        (files / 'b' / 'one.txt').chmod(0o600)
+        second = archive.build(reversed(list(archive.walk(files))), jobs=1)
+        self.assertEqual(first, second)
+        self.assertEqual(archive.code_sha256(first), archive.code_sha256(second))
+        with zipfile.ZipFile(io.BytesIO(first)) as zf:
+            self.assertListEqual(zf.namelist(), ['a.txt', 'b/one.txt'])
+
+    def test_build_on_base(self):
+        members = sorted(archive.walk(self.fn_dir))
+        deps = [m for m in members if m[0].startswith('lib_fn/')]
+        others = [m for m in members if not m[0].startswith('lib_fn/')]
+        base = archive.build(deps + [('fn.py', self.root / 'shared' / 'util.py')])
+        with mock.patch.object(archive, 'compress', wraps=archive.compress) as compress:
+            combined = archive.build(others, base=base)
+            self.assertListEqual(sorted(c[0][0] for c in compress.call_args_list), [m[0] for m in others])
+        self.assertEqual(combined, archive.build(members))
+
+    def test_extract_hardlinks(self):
+        stage = self.root / 'stage'
+        with mock.patch.object(archive, 'reflink', side_effect=OSError('not supported')):
+            archive.extract(archive.walk(self.fn_dir / 'lib_fn'), stage, hardlink=True)
+        original = self.fn_dir / 'lib_fn' / 'pkg' / '__init__.py'
+        self.assertTrue(os.path.samefile(str(stage / 'pkg' / '__init__.py'), str(original)))
+
+    def test_extract_never_shares_writable_files(self):
+        stage = self.root / 'stage'
+        archive.extract(archive.walk(self.fn_dir / 'lib_fn'), stage)
+        with (stage / 'pkg' / '__init__.py').open('a') as f:
+            f.write('y = 2\n')
+        self.assertEqual((self.fn_dir / 'lib_fn' / 'pkg' / '__init__.py').read_text(), 'x = 1\n')
+
+    def test_zip64_entry_count(self):
+        buffer = io.BytesIO()
+        writer = archive.ZipWriter(buffer)
+        for i in range(0x10001):
+            writer.add(archive.Entry(f'{i}.txt', archive.ZIP_STORED, 0, 0, b'', archive.FILE_MODE))
+        writer.close()
+        with zipfile.ZipFile(buffer) as zf:
+            self.assertEqual(len(zf.infolist()), 0x10001)
+
+    def test_package_without_staging(self):
+        with self.package() as zf:
+            self.assertListEqual(sorted(zf.namelist()), ['fn.py', 'pkg/__init__.py', 'shared/util.py'])
+            self.assertEqual(zf.read('pkg/__init__.py'), b'x = 1\n')
+
+    def test_package_with_hooks(self):
+        (self.fn_dir / 'extra.txt').write_text('')
+        (self.fn_dir / 'hook.sh').write_text('cp extra.txt $1 && echo changed >> $1/pkg/__init__.py\n')
+        with self.package(**{'after deploy': ['sh hook.sh']}) as zf:
+            self.assertListEqual(sorted(zf.namelist()), ['extra.txt', 'fn.py', 'pkg/__init__.py', 'shared/util.py'])
+            self.assertEqual(zf.read('pkg/__init__.py'), b'x = 1\nchanged\n')
+        self.assertEqual((self.fn_dir / 'lib_fn' / 'pkg' / '__init__.py').read_text(), 'x = 1\n')
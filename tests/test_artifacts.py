@@ -0,0 +1,118 @@
+import hashlib
+import itertools
+import os
+import threading
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from blambda import deploy
+from blambda.utils import artifacts
+
+
+class FakeS3:
+    """ An in memory stand-in for the parts of the s3 api that artifact uploads use """
+
+    def __init__(self, fail_parts=()):
+        self.objects = {}
+        self.uploads = {}  # upload id -> (key, {part number: data})
+        self.fail_parts = set(fail_parts)
+        self.sent_parts = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        return {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f'upload-{next(self._ids)}'
+        self.uploads[upload_id] = (Key, {})
+        return {'UploadId': upload_id}
+
+    def list_multipart_uploads(self, Bucket, Prefix):
+        return {'Uploads': [{'Key': key, 'UploadId': upload_id, 'Initiated': upload_id}
+                            for upload_id, (key, _) in self.uploads.items() if key.startswith(Prefix)]}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.sent_parts.append(PartNumber)
+        if PartNumber in self.fail_parts:
+            raise ConnectionError('connection reset')
+        self.uploads[UploadId][1][PartNumber] = Body
+        return {'ETag': '"{}"'.format(hashlib.md5(Body).hexdigest())}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0):
+        parts = sorted(self.uploads[UploadId][1].items())
+        page = [(number, data) for number, data in parts if number > PartNumberMarker][:2]
+        response = {'Parts': [{'PartNumber': number, 'ETag': '"{}"'.format(hashlib.md5(data).hexdigest())}
+                              for number, data in page]}
+        if page and page[-1][0] < parts[-1][0]:
+            response.update(IsTruncated=True, NextPartNumberMarker=page[-1][0])
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        (key, uploaded) = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b''.join(uploaded[part['PartNumber']] for part in MultipartUpload['Parts'])
+
+
+class TestArtifacts(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.config = {'artifact_bucket': 'artifacts', 'artifact_threshold': '0.001'}
+        for target, kwargs in (('blambda.utils.aws.client', {'side_effect': lambda service: self.s3}),
+                               ('blambda.config.load_cached', {'side_effect': lambda: self.config}),
+                               ('blambda.utils.artifacts.PART_SIZE', {'new': 1000})):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.archive = os.urandom(4500)
+
+    def test_code_location(self):
+        self.assertDictEqual(artifacts.code_location(b'small'), {'ZipFile': b'small'})
+        location = artifacts.code_location(self.archive)
+        self.assertEqual(location['S3Bucket'], 'artifacts')
+        self.assertEqual(self.s3.objects[('artifacts', location['S3Key'])], self.archive)
+
+        self.config = {}
+        self.assertDictEqual(artifacts.code_location(self.archive), {'ZipFile': self.archive})
+
+    def test_invalid_threshold(self):
+        self.config['artifact_threshold'] = '10MB'
+        with self.assertRaises(SystemExit):
+            artifacts.code_location(self.archive)
+
+    def test_uploaded_once(self):
+        key = artifacts.upload('artifacts', self.archive)
+        self.assertEqual(key, artifacts.artifact_key(self.archive))
+        self.assertEqual(sorted(self.s3.sent_parts), [1, 2, 3, 4, 5])
+        artifacts.upload('artifacts', self.archive)
+        self.assertEqual(len(self.s3.sent_parts), 5)
+
+    def test_resume(self):
+        self.s3.fail_parts = {3}
+        with self.assertRaises(ConnectionError):
+            artifacts.upload('artifacts', self.archive)
+        self.assertNotIn(('artifacts', artifacts.artifact_key(self.archive)), self.s3.objects)
+
+        self.s3.fail_parts = set()
+        self.s3.sent_parts = []
+        key = artifacts.upload('artifacts', self.archive)
+        self.assertEqual(self.s3.sent_parts, [3])
+        self.assertEqual(self.s3.objects[('artifacts', key)], self.archive)
+
+    def test_publish(self):
+        client = mock.Mock()
+        client.get_function_configuration.return_value = {'CodeSha256': 'old'}
+        client.update_function_configuration.return_value = {'FunctionName': 'fn', 'FunctionArn': 'arn:fn'}
+        with mock.patch('blambda.utils.aws.client', side_effect=lambda service: client if service == 'lambda'
+                        else self.s3), mock.patch('blambda.deploy.git_sha', return_value='abc1234'), \
+                mock.patch('blambda.deploy.git_local_mods', return_value=0):
+            deploy.publish('fn', 'arn:role', self.archive, {'Runtime': 'python3.8'}, dryrun=False)
+        client.update_function_code.assert_called_once_with(
+            FunctionName='fn', S3Bucket='artifacts', S3Key=artifacts.artifact_key(self.archive))
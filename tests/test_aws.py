@@ -0,0 +1,51 @@
+import threading
+import unittest
+from unittest import mock
+
+from blambda.utils import aws
+
+
+class TestAwsClients(unittest.TestCase):
+    def setUp(self):
+        aws.reset()
+
+    def tearDown(self):
+        aws.reset()
+
+    def test_clients_are_shared(self):
+        with mock.patch('blambda.config.load_cached', return_value={'region': 'us-west-2'}):
+            client = aws.client('lambda')
+            self.assertIs(aws.client('lambda'), client)
+            self.assertIs(aws.client('lambda', 'us-west-2'), client)
+            self.assertEqual(client.meta.region_name, 'us-west-2')
+            self.assertEqual(client.meta.config.max_pool_connections, aws.MAX_POOL_CONNECTIONS)
+
+            self.assertIsNot(aws.client('lambda', 'us-east-1'), client)
+            logs = aws.client('logs', read_timeout=300)
+            self.assertIsNot(aws.client('logs'), logs)
+            self.assertEqual(logs.meta.config.read_timeout, 300)
+
+    def test_endpoint(self):
+        with mock.patch('blambda.config.load_cached', return_value={'lambda_endpoint': 'http://localhost:4566'}):
+            self.assertEqual(aws.client('lambda', 'us-east-1').meta.endpoint_url, 'http://localhost:4566')
+            self.assertNotEqual(aws.client('events', 'us-east-1').meta.endpoint_url, 'http://localhost:4566')
+
+    def test_clients_are_shared_across_threads(self):
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(aws.client('events', 'us-east-1')))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(c) for c in clients}), 1)
+
+    def test_resources_are_per_thread(self):
+        resource = aws.resource('iam', 'us-east-1')
+        self.assertIs(aws.resource('iam', 'us-east-1'), resource)
+
+        other = []
+        t = threading.Thread(target=lambda: other.append(aws.resource('iam', 'us-east-1')))
+        t.start()
+        t.join()
+        self.assertIsNot(other[0], resource)
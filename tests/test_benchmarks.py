@@ -0,0 +1,36 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.synthetic import generate_repo
+from blambda.utils import findfunc
+
+
+class TestSyntheticRepo(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def test_generated_functions_are_discoverable(self):
+        names = generate_repo(self.root, functions=12, per_group=5, depth=3, vendored_files=8, shared_files=4)
+        manifests = findfunc.find_all_manifests(self.root, use_git=False)
+
+        self.assertEqual(sorted(m.full_name for m in manifests), sorted(names))
+        resolved = findfunc.ManifestResolver(manifests).resolve(names)
+        self.assertTrue(all(resolved.values()))
+
+        globbed = manifests[0]
+        self.assertEqual(len([src for src, _ in globbed.source_files(dest_dir='.') if 'shared' in str(src)]), 2)
+
+
+class TestStartup(unittest.TestCase):
+    def test_parse_importtime(self):
+        from benchmarks.startup import parse_importtime
+
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       100 |        100 |   blambda.config\n"
+                  "import time:      5052 |      53474 | blambda.deploy\n")
+        self.assertDictEqual(parse_importtime(stderr), {'blambda.config': (100, 100), 'blambda.deploy': (5052, 53474)})
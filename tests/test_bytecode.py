@@ -0,0 +1,88 @@
+import io
+import json
+import os
+import shutil
+import subprocess as sp
+import sys
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from blambda import deploy
+from blambda.utils import bytecode, package_cache
+from blambda.utils.lambda_manifest import LambdaManifest
+
+RUNTIME = 'python{}.{}'.format(*sys.version_info[:2])
+
+
+class TestBytecode(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        patcher = mock.patch.object(package_cache, 'CACHE_ROOT', self.root / 'cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.fn_dir = self.root / 'fn'
+        (self.fn_dir / 'lib_fn' / 'dep' / '__pycache__').mkdir(parents=True)
+        (self.fn_dir / 'lib_fn' / 'dep' / '__init__.py').write_text('VALUE = 42\n')
+        (self.fn_dir / 'lib_fn' / 'dep' / '__pycache__' / '__init__.cpython-38.pyc').write_bytes(b'stale')
+        (self.fn_dir / 'lib_fn' / 'py2only.py').write_text('print "hello"\n')
+        (self.fn_dir / 'fn.py').write_text('import dep\n\ndef lambda_handler(event, context):\n    return dep.VALUE\n')
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def package(self, config):
+        with (self.fn_dir / 'fn.json').open('w') as f:
+            json.dump({'blambda': 'manifest', 'source files': ['fn.py'], 'bytecode': config,
+                       'options': {'Runtime': RUNTIME}}, f)
+        zip_bytes = deploy.package(LambdaManifest(self.fn_dir / 'fn.json'), use_cache=False)
+        target = self.root / 'extracted'
+        shutil.rmtree(str(target), ignore_errors=True)
+        with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+            zf.extractall(str(target))
+            return sorted(zf.namelist()), target
+
+    def run_handler(self, target):
+        script = 'import sys; sys.path.insert(0, sys.argv[1]); import fn; print(fn.lambda_handler(None, None))'
+        out = sp.check_output([sys.executable, '-B', '-c', script, str(target)], env=dict(os.environ))
+        return out.decode().strip()
+
+    def test_unchecked_hash_pycs(self):
+        tag = sys.implementation.cache_tag
+        names, target = self.package(True)
+        self.assertListEqual(names, [f'__pycache__/fn.{tag}.pyc', f'dep/__init__.py', f'dep/__pycache__/__init__.{tag}.pyc',
+                                     'fn.py', 'py2only.py'])
+        with (target / 'dep' / '__pycache__' / f'__init__.{tag}.pyc').open('rb') as f:
+            header = f.read(8)
+        self.assertEqual(int.from_bytes(header[4:8], 'little'), 0b01)  # hash based, source not checked
+        self.assertEqual(self.run_handler(target), '42')
+
+    def test_strip_sources(self):
+        names, target = self.package({'strip sources': True})
+        self.assertListEqual(names, ['dep/__init__.pyc', 'fn.pyc', 'py2only.py'])
+        self.assertEqual(self.run_handler(target), '42')
+
+    def test_compiled_modules_are_cached(self):
+        self.package(True)
+        with mock.patch.object(bytecode.sp, 'run') as run:
+            self.package(True)
+            run.assert_not_called()
+
+    def test_no_interpreter(self):
+        with mock.patch.object(bytecode, 'runtime_python', return_value=None):
+            names, _ = self.package(True)
+        self.assertNotIn('fn.pyc', names)
+        self.assertIn('dep/__pycache__/__init__.cpython-38.pyc', names)
+
+    def test_interpreter_in_cache_key(self):
+        with (self.fn_dir / 'fn.json').open('w') as f:
+            json.dump({'blambda': 'manifest', 'source files': ['fn.py'], 'bytecode': True,
+                       'options': {'Runtime': RUNTIME}}, f)
+        manifest = LambdaManifest(self.fn_dir / 'fn.json')
+        key = package_cache.cache_key(manifest)
+        rebuilt = {'version': [3, 99], 'tag': 'cpython-399'}
+        with mock.patch.object(bytecode, 'interpreter_info', return_value=rebuilt):
+            self.assertNotEqual(package_cache.cache_key(manifest), key)
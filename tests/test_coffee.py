@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from blambda.utils import coffee, package_cache
+
+# stands in for the coffee compiler: 'coffee -o <dir> -bc <files...>'
+FAKE_COFFEE = '''#!/bin/sh
+echo "$@" >> "$(dirname "$0")/invocations"
+out="$2"; shift 3
+mkdir -p "$out"
+for f in "$@"; do
+    if grep -q ERROR "$f"; then echo "$f: syntax error" >&2; exit 1; fi
+    name=$(basename "$f" .coffee)
+    { echo "// compiled"; cat "$f"; } > "$out/$name.js"
+done
+'''
+
+
+class TestCoffee(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        patcher = mock.patch.object(package_cache, 'CACHE_ROOT', self.root / 'cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.bin_dir = self.root / 'node_modules_fn' / '.bin'
+        self.bin_dir.mkdir(parents=True)
+        (self.bin_dir / 'coffee').write_text(FAKE_COFFEE)
+        (self.bin_dir / 'coffee').chmod(0o755)
+
+        self.files = []
+        for name in ('a/handler.coffee', 'b/handler.coffee', 'shared.coffee'):
+            path = self.root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f'# {name}\n')
+            self.files.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def invocations(self):
+        path = self.bin_dir / 'invocations'
+        return path.read_text().splitlines() if path.exists() else []
+
+    def test_batched_and_cached(self):
+        compiled = coffee.compile_all((f, self.bin_dir) for f in self.files)
+        self.assertEqual(len(self.invocations()), 1)
+        for f in self.files:
+            self.assertEqual(compiled[f].read_text(), '// compiled\n' + f.read_text())
+
+        self.assertEqual(coffee.compile_all((f, self.bin_dir) for f in self.files), compiled)
+        self.assertEqual(len(self.invocations()), 1)
+
+        self.files[0].write_text('# changed\n')
+        coffee.compile_all((f, self.bin_dir) for f in self.files)
+        self.assertEqual(len(self.invocations()), 2)
+        self.assertEqual(len(self.invocations()[1].split()), 4)  # -o <dir> -bc <one file>
+
+    def test_errors_name_the_file(self):
+        self.files[1].write_text('ERROR\n')
+        with self.assertRaises(Exception) as context:
+            coffee.compile_all((f, self.bin_dir) for f in self.files)
+        self.assertIn('b/handler.coffee', str(context.exception))
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from blambda import daemon as daemon_command
+from blambda.utils import daemon, findfunc
+
+root = Path(__file__).parent / 'data' / 'manifests' / 'findfunc'
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, 'daemon.sock')
+        self.patcher = mock.patch.object(daemon, 'SOCKET_PATH', self.socket_path)
+        self.patcher.start()
+        self.env = mock.patch.dict(os.environ)
+        self.env.start()
+        os.environ.pop(daemon.DISABLE_ENV_VAR, None)
+
+    def tearDown(self):
+        self.env.stop()
+        self.patcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_unavailable(self):
+        self.assertFalse(daemon.is_running())
+        with self.assertRaises(daemon.DaemonUnavailable):
+            daemon.request('ping')
+
+    def test_manifests_through_daemon(self):
+        server = daemon.BlambdaDaemon(self.socket_path, poll_interval=60)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            self.assertTrue(daemon.is_running())
+
+            with mock.patch.object(findfunc, 'load_index', side_effect=AssertionError("didn't use the daemon")):
+                manifests = findfunc.find_all_manifests(root, use_git=False)
+            self.assertListEqual(
+                [m.full_name for m in manifests],
+                ['group1Manifest', 'group1/manifest', 'group1/manifest2', 'group2/manifest', 'group2/manifest3']
+            )
+            self.assertEqual(daemon.request('ping')['roots'], [str(root.absolute())])
+
+            with self.assertRaises(daemon.DaemonUnavailable):
+                daemon.request('bogus')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestDaemonCommand(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.home)
+        config_dir = os.path.join(self.home, '.config', 'blambda')
+        for target, kwargs in ((daemon, {'attribute': 'SOCKET_PATH', 'new': os.path.join(config_dir, 'daemon.sock')}),
+                               (daemon, {'attribute': 'LOG_PATH', 'new': os.path.join(config_dir, 'daemon.log')})):
+            patcher = mock.patch.object(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        env = mock.patch.dict(os.environ, {'HOME': self.home})
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop(daemon.DISABLE_ENV_VAR, None)
+
+    def test_start_in_fresh_home(self):
+        daemon_command.start(poll=60)
+        try:
+            self.assertTrue(daemon.is_running())
+            self.assertTrue(os.path.exists(daemon.LOG_PATH))
+        finally:
+            daemon.request('stop')
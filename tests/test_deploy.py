@@ -0,0 +1,127 @@
+import io
+import json
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from blambda import deploy
+from blambda.utils import archive, base
+from blambda.utils.lambda_manifest import LambdaManifest
+from tests.fakes import DeployTestMixin
+
+
+class TestPublish(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.update_function_configuration.return_value = {'FunctionName': 'fn', 'FunctionArn': 'arn:fn'}
+        self.client.create_function.return_value = {'FunctionName': 'fn', 'FunctionArn': 'arn:fn'}
+        for target, value in (('aws.client', self.client), ('git_sha', 'abc1234'), ('git_local_mods', 0)):
+            patcher = mock.patch(f'blambda.deploy.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def publish(self, zip_bytes=b'code'):
+        return deploy.publish('fn', 'arn:role', zip_bytes, {'Runtime': 'python3.8'}, dryrun=False)
+
+    def test_unchanged_code_is_not_uploaded(self):
+        self.client.get_function_configuration.return_value = {'CodeSha256': archive.code_sha256(b'code')}
+        self.assertEqual(self.publish(), ('fn', 'arn:fn'))
+        self.client.update_function_code.assert_not_called()
+        self.client.update_function_configuration.assert_called_once()
+
+    def test_changed_code_is_uploaded(self):
+        self.client.get_function_configuration.return_value = {'CodeSha256': archive.code_sha256(b'old code')}
+        self.publish()
+        self.client.update_function_code.assert_called_once_with(FunctionName='fn', ZipFile=b'code')
+
+    def test_new_function_is_created(self):
+        self.client.get_function_configuration.side_effect = ClientError(
+            {'Error': {'Code': 'ResourceNotFoundException'}}, 'GetFunctionConfiguration')
+        self.publish()
+        self.client.create_function.assert_called_once()
+        self.assertEqual(self.client.create_function.call_args[1]['Code'], {'ZipFile': b'code'})
+        self.client.update_function_code.assert_not_called()
+
+
+class TestConcurrentDeploy(DeployTestMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ('one', 'two', 'three', 'broken'):
+            basedir = self.root / name
+            basedir.mkdir()
+            (basedir / f'{name}.py').write_text('def lambda_handler(event, context):\n    pass\n')
+            with (basedir / f'{name}.json').open('w') as f:
+                # 'broken' declares dependencies that were never installed
+                json.dump({'blambda': 'manifest', 'options': {'Runtime': 'python3.8'}, 'source files': [f'{name}.py'],
+                           'dependencies': {'six': '1.0'} if name == 'broken' else {}}, f)
+            self.manifests[name] = LambdaManifest(basedir / f'{name}.json')
+
+    def test_jobs(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            deployed = deploy.deploy(['one', 'two', 'three', 'broken', 'missing'], 'dev', 'app', 'arn:role', None,
+                                     jobs=3)
+        self.assertSetEqual(deployed, {'one', 'two', 'three'})
+        self.assertSetEqual(set(self.client.functions), {'app_one_dev', 'app_two_dev', 'app_three_dev'})
+
+        lines = out.getvalue().splitlines()
+        self.assertIn("[two] Deploying function 'two'...", lines)
+        self.assertTrue(any(line.startswith('[broken] ') and 'no dependency directory' in line for line in lines))
+
+        summary = lines[lines.index(next(line for line in lines if line.startswith('function'))):]
+        self.assertIn('package', summary[0])
+        self.assertIn('publish', summary[0])
+        self.assertRegex('\n'.join(summary), r'broken\s+FAILED')
+        self.assertRegex('\n'.join(summary), r'missing\s+not found')
+        self.assertRegex('\n'.join(summary), r'one\s+deployed')
+
+
+    def test_aliases_are_deployed_once(self):
+        self.manifests['group/one'] = self.manifests['one']
+        out = io.StringIO()
+        with redirect_stdout(out), mock.patch.object(self.client, 'create_function',
+                                                     wraps=self.client.create_function) as create_function:
+            deployed = deploy.deploy(['one', 'group/one', 'two'], 'dev', 'app', 'arn:role', None, jobs=3)
+        self.assertSetEqual(deployed, {'one', 'group/one', 'two'})
+        self.assertEqual(create_function.call_count, 2)
+        self.assertEqual(out.getvalue().count("Deploying function"), 2)
+        self.assertRegex(out.getvalue(), r'group/one\s+deployed')
+
+
+    def test_manifest_is_not_modified(self):
+        self.manifests['one'].json['options']['Description'] = 'the first'
+        before = json.dumps(self.manifests['one'].json, sort_keys=True)
+        with redirect_stdout(io.StringIO()):
+            for _ in range(2):
+                self.assertSetEqual(deploy.deploy(['one'], 'dev', 'app', 'arn:role', None), {'one'})
+        self.assertEqual(self.client.functions['app_one_dev']['options']['Description'], 'the first [SHA abc1234]')
+        self.assertEqual(json.dumps(self.manifests['one'].json, sort_keys=True), before)
+
+
+class TestPrefixedOutput(unittest.TestCase):
+    def test_lines_are_prefixed_whole(self):
+        out = io.StringIO()
+
+        def write(name):
+            with base.output_prefix(f'[{name}] '):
+                for i in range(50):
+                    print(f'{name} line', end='')
+                    print(f' {i}')
+                print('unfinished', end='')
+
+        with redirect_stdout(out), base.prefixed_output():
+            threads = [threading.Thread(target=write, args=(name,)) for name in ('a', 'b', 'c')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            print('not in a job')
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 154)
+        for line in lines[:-1]:
+            self.assertRegex(line, r'^\[(\w)\] (\1 line \d+|unfinished)$')
+        self.assertEqual(lines[-1], 'not in a job')
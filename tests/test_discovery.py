@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import subprocess as sp
+import tempfile
+import unittest
+from pathlib import Path
+
+from blambda.utils import discovery
+from blambda.utils.manifest_index import load_index
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w') as f:
+        json.dump(data, f)
+
+
+class TestDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        manifest = {'blambda': 'manifest', 'options': {'Runtime': 'python3.8'}}
+        write_json(self.root / 'group' / 'func.json', manifest)
+        write_json(self.root / 'group' / 'lib_func' / 'vendored' / 'data.json', manifest)
+        write_json(self.root / 'group' / 'node_modules_func' / 'pkg' / 'package.json', {'name': 'pkg'})
+        write_json(self.root / 'group' / 'settings.json', {'not': 'a manifest'})
+        write_json(self.root / 'lib_other' / 'other.json', manifest)
+        write_json(self.root / '.git_like' / 'node_modules' / 'x.json', manifest)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def relpaths(self, paths):
+        return sorted(os.path.relpath(p, str(self.root)) for p in paths)
+
+    def test_walk_skips_dependency_dirs(self):
+        self.assertListEqual(
+            self.relpaths(discovery.walk(str(self.root))),
+            ['group/func.json', 'group/settings.json', 'lib_other/other.json']
+        )
+
+    def test_looks_like_manifest(self):
+        self.assertTrue(discovery.looks_like_manifest(str(self.root / 'group' / 'func.json')))
+        self.assertFalse(discovery.looks_like_manifest(str(self.root / 'group' / 'settings.json')))
+
+    def test_index_uses_pruned_walk(self):
+        index = load_index(self.root)
+        self.assertListEqual([m.full_name for m in index.manifests()], ['group/func', 'lib_other/other'])
+        self.assertIn('Manifest not valid', index.files['group/settings.json']['error'])
+
+    def test_git_mode(self):
+        if shutil.which('git') is None:
+            self.skipTest('git is not installed')
+        sp.check_call(['git', 'init', '-q', str(self.root)])
+        (self.root / '.gitignore').write_text('lib_other/\n')
+        write_json(self.root / 'gr\u00fcppe' / 'my func.json', {'blambda': 'manifest'})
+
+        self.assertListEqual(discovery.git_json_files(self.root),
+                             ['group/func.json', 'group/settings.json', 'gr\u00fcppe/my func.json'])
+
+        index = load_index(self.root, use_git=True)
+        self.assertTrue(index.git)
+        self.assertListEqual([m.full_name for m in index.manifests()], ['group/func', 'gr\u00fcppe/my func'])
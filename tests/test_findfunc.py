@@ -1,4 +1,5 @@
 from blambda.utils import findfunc
+import os
 import unittest
 from unittest import mock
 from pathlib import Path
@@ -12,7 +13,7 @@ class TestFindFunc(unittest.TestCase):
 
         self.assertListEqual(
             [m.full_name for m in manifests],
-            ['group1/manifest', 'group1Manifest', 'group1/manifest2', 'group2/manifest', 'group2/manifest3']
+            ['group1Manifest', 'group1/manifest', 'group1/manifest2', 'group2/manifest', 'group2/manifest3']
         )
 
     def test_find_manifest(self):
@@ -50,3 +51,30 @@ class TestFindFunc(unittest.TestCase):
             self.assertIsNone(findfunc.find_manifest('group1/group1Manifest'))
 
             self.assertEqual('group2/manifest', findfunc.find_manifest('manifest').full_name)
+
+    def test_resolver(self):
+        resolver = findfunc.ManifestResolver(findfunc.find_all_manifests(root))
+
+        resolved = resolver.resolve(['group1Manifest', 'group1/manifest2', 'group2_manifest3', 'manifest', 'nope'])
+        self.assertEqual(resolved['group1Manifest'].full_name, 'group1Manifest')
+        self.assertEqual(resolved['group1/manifest2'].full_name, 'group1/manifest2')
+        self.assertEqual(resolved['group2_manifest3'].full_name, 'group2/manifest3')
+        self.assertEqual(resolved['manifest'].full_name, 'group1/manifest')
+        self.assertIsNone(resolved['nope'])
+
+        with self.assertRaises(SystemExit):
+            resolver.resolve(['nope'], fail_if_missing=True)
+
+        self.assertListEqual(
+            [m.full_name for m in resolver.matching(['manifest', 'manifest3'])],
+            ['group1/manifest', 'group2/manifest', 'group2/manifest3']
+        )
+
+    def test_resolver_prefers_pwd(self):
+        resolver = findfunc.ManifestResolver(findfunc.find_all_manifests(root))
+        cwd = os.getcwd()
+        try:
+            os.chdir(str(root / 'group2'))
+            self.assertEqual(resolver.find('manifest').full_name, 'group2/manifest')
+        finally:
+            os.chdir(cwd)
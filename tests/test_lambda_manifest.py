@@ -58,3 +58,18 @@ class TestFindFunc(unittest.TestCase):
             src_expect, dest_expect = expect.pop(0)
             self.assertEqual(src.resolve(), src_expect.resolve())
             self.assertEqual(dest, dest_expect)
+
+    def test_compact_manifest(self):
+        root = Path(__file__).parent / 'data' / 'manifests'
+        a = LambdaManifest(root / 'source_files.json')
+        c = LambdaManifest(root / 'findfunc' / 'group1' / 'manifest.json')
+
+        self.assertFalse(hasattr(a, '__dict__'))
+        self.assertIsInstance(hash(a), int)
+        self.assertEqual(len({a, c, LambdaManifest(root / 'source_files.json')}), 2)
+        self.assertIs(c.group, LambdaManifest(root / 'findfunc' / 'group1' / 'manifest2.json').group)
+
+        self.assertEqual(a.runtime, 'python3.6')
+        a.drop_json()
+        self.assertEqual(a.json['options']['Runtime'], 'python3.6')
+        self.assertEqual(LambdaManifest(root / 'source_files.json').prime(runtime='nodejs12.x').runtime, 'nodejs12.x')
@@ -0,0 +1,97 @@
+import datetime
+import io
+import json
+import unittest
+import zipfile
+from contextlib import redirect_stdout
+
+from blambda import deploy
+from blambda.utils import layers, package_cache
+from blambda.utils.lambda_manifest import LambdaManifest
+from tests.fakes import DeployTestMixin
+
+
+class TestLayers(DeployTestMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        for name, dependency in (('one', 'six'), ('two', 'six'), ('three', 'requests')):
+            basedir = self.root / name
+            (basedir / f'lib_{name}' / dependency).mkdir(parents=True)
+            (basedir / f'lib_{name}' / dependency / '__init__.py').write_text(f'# {dependency}\n')
+            (basedir / f'{name}.py').write_text('def lambda_handler(event, context):\n    pass\n')
+            with (basedir / f'{name}.json').open('w') as f:
+                json.dump({'blambda': 'manifest', 'options': {'Runtime': 'python3.8'},
+                           'dependencies': {dependency: '1.0'}, 'source files': [f'{name}.py']}, f)
+            self.manifests[name] = LambdaManifest(basedir / f'{name}.json')
+
+    def deploy(self, names, use_layers=True, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return deploy.deploy(names, 'dev', 'app', 'arn:role', None, use_layers=use_layers, **kwargs)
+
+    def age(self, layer, version=1, days=2):
+        arn = self.client.layer_arn(layer, version)
+        created = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+        self.client.created[arn] = created.isoformat()
+        return arn
+
+    def layer_names(self, function):
+        return [arn.split(':')[-2] for arn in self.client.functions[function]['options'].get('Layers', [])]
+
+    def test_shared_layers(self):
+        self.assertEqual(self.deploy(['one', 'two', 'three']), {'one', 'two', 'three'})
+        self.assertEqual(len(self.client.layers), 2)
+        self.assertEqual(self.layer_names('app_one_dev'), self.layer_names('app_two_dev'))
+        self.assertNotEqual(self.layer_names('app_one_dev'), self.layer_names('app_three_dev'))
+
+        with zipfile.ZipFile(io.BytesIO(self.client.functions['app_one_dev']['code'])) as zf:
+            self.assertListEqual(zf.namelist(), ['one.py'])
+        (layer_zip,) = self.client.layers[self.layer_names('app_one_dev')[0]].values()
+        with zipfile.ZipFile(io.BytesIO(layer_zip)) as zf:
+            self.assertListEqual(zf.namelist(), ['python/six/__init__.py'])
+
+        # an existing layer is reused, not published again
+        self.deploy(['two'])
+        self.assertEqual(sum(len(versions) for versions in self.client.layers.values()), 2)
+        self.assertListEqual(self.client.deleted, [])
+
+    def test_unused_layers_are_deleted(self):
+        self.deploy(['one', 'three'])
+        (old_layer,) = self.layer_names('app_three_dev')
+        old_arn = self.age(old_layer)
+
+        (self.root / 'three' / 'lib_three' / 'requests' / '__init__.py').write_text('# requests 2.0\n')
+        self.deploy(['three'])
+        self.assertNotEqual(self.layer_names('app_three_dev'), [old_layer])
+        # only when asked to
+        self.assertListEqual(self.client.deleted, [])
+
+        self.deploy(['three'], cleanup_layers=True, dryrun=True)
+        self.assertListEqual(self.client.deleted, [])
+
+        self.deploy(['three'], cleanup_layers=True)
+        self.assertListEqual(self.client.deleted, [old_arn])
+        self.assertEqual(len(self.client.layers[self.layer_names('app_one_dev')[0]]), 1)
+
+        # and a function deployed without layers again drops its layer
+        self.deploy(['one'], use_layers=False)
+        self.assertListEqual(self.layer_names('app_one_dev'), [])
+
+    def test_cleanup_keeps_recent_and_versioned_layers(self):
+        self.deploy(['one', 'three'])
+        (versioned_layer,) = self.layer_names('app_one_dev')
+        versioned_arn = self.age(versioned_layer)
+        self.client.versions.append({'FunctionName': 'app_one_dev', 'Version': '1', 'Layers': [{'Arn': versioned_arn}]})
+        (recent_layer,) = self.layer_names('app_three_dev')
+
+        # neither function uses a layer any more, but one's previous version does and three's is only minutes old
+        self.deploy(['one', 'three'], use_layers=False)
+        self.assertListEqual(layers.LayerSet().cleanup(), [])
+
+        self.age(recent_layer)
+        self.assertListEqual(layers.LayerSet().cleanup(), [self.client.layer_arn(recent_layer, 1)])
+
+    def test_layer_name(self):
+        name = layers.layer_name(package_cache.file_digest(__file__), 'nodejs12.x')
+        self.assertRegex(name, r'^blambda_deps_nodejs12_x_[0-9a-f]{32}$')
+        self.assertListEqual(layers.layer_members([('node_modules/a/index.js', None)], 'nodejs12.x'),
+                             [('nodejs/node_modules/a/index.js', None)])
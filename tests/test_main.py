@@ -0,0 +1,19 @@
+import unittest
+
+from blambda import __main__ as cli
+
+
+class TestMain(unittest.TestCase):
+    def test_selected_subcommand(self):
+        self.assertEqual(cli.selected_subcommand(['-vv', 'deploy', 'foo', '--dryrun']), 'deploy')
+        self.assertEqual(cli.selected_subcommand(['--verbose', 'show']), 'show')
+        self.assertIsNone(cli.selected_subcommand(['--version']))
+        self.assertIsNone(cli.selected_subcommand(['bogus', 'show']))
+
+    def test_help_matches_module_docstrings(self):
+        for name, (_, help_text) in cli.available_subparsers.items():
+            with self.subTest(subcommand=name):
+                submodule = cli.load_subcommand(name)
+                self.assertEqual(' '.join(help_text.split()), ' '.join(submodule.__doc__.split()))
+                self.assertTrue(callable(submodule.setup_parser))
+                self.assertTrue(callable(submodule.run))
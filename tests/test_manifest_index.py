@@ -0,0 +1,97 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from blambda.utils import manifest_index
+from blambda.utils.manifest_index import ManifestIndex, load_index
+
+data = Path(__file__).parent / 'data' / 'manifests' / 'findfunc'
+
+
+class TestManifestIndex(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp()) / 'findfunc'
+        shutil.copytree(data, self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root.parent)
+
+    def full_names(self, index):
+        return [m.full_name for m in index.manifests()]
+
+    def test_index_is_persisted(self):
+        index = load_index(self.root)
+        self.assertTrue(index.path.is_file())
+
+        reloaded = ManifestIndex(self.root).load()
+        self.assertEqual(reloaded.files, index.files)
+        self.assertEqual(self.full_names(reloaded), self.full_names(index))
+
+    def test_unchanged_files_are_not_reparsed(self):
+        load_index(self.root)
+        with mock.patch.object(manifest_index, 'LambdaManifest', wraps=manifest_index.LambdaManifest) as lm:
+            index = load_index(self.root)
+            self.assertEqual(self.full_names(index),
+                             ['group1Manifest', 'group1/manifest', 'group1/manifest2', 'group2/manifest',
+                              'group2/manifest3'])
+            parsed = [c for c in lm.call_args_list if c[1].get('parse_json')]
+            self.assertEqual(parsed, [])
+
+    def test_incremental_update(self):
+        load_index(self.root)
+        (self.root / 'group2' / 'manifest3.json').unlink()
+        (self.root / 'group3').mkdir()
+        with (self.root / 'group3' / 'new.json').open('w') as f:
+            json.dump({'blambda': 'manifest', 'options': {'Runtime': 'nodejs12.x'}}, f)
+
+        index = load_index(self.root)
+        self.assertEqual(self.full_names(index),
+                         ['group1Manifest', 'group1/manifest', 'group1/manifest2', 'group2/manifest', 'group3/new'])
+        self.assertEqual(index.manifests()[-1].runtime, 'nodejs12.x')
+
+    def test_rebuild(self):
+        index = load_index(self.root)
+        index.files['group1/manifest.json']['manifest']['full_name'] = 'bogus'
+        index.dirty = True
+        index.save()
+
+        self.assertEqual(ManifestIndex(self.root).load().files['group1/manifest.json']['manifest']['full_name'],
+                         'bogus')
+        rebuilt = load_index(self.root, rebuild=True)
+        self.assertEqual(rebuilt.files['group1/manifest.json']['manifest']['full_name'], 'group1/manifest')
+
+
+class TestSourceIndex(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        shared = self.root / 'shared'
+        shared.mkdir()
+        (shared / 'chain.py').write_text('')
+        (shared / 'a.coffee').write_text('')
+        for name, sources in (('one', [['../shared/chain.py', 'chain.py'], 'one.py']),
+                              ('two', [['../shared/*.coffee', './*.coffee']]),
+                              ('three', ['three.py'])):
+            (self.root / name).mkdir()
+            with (self.root / name / (name + '.json')).open('w') as f:
+                json.dump({'blambda': 'manifest', 'source files': sources}, f)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def users(self, filename):
+        sources = manifest_index.SourceIndex(self.root, load_index(self.root).files)
+        return [Path(p).stem for p in sources.users(self.root / filename)]
+
+    def test_users(self):
+        self.assertListEqual(self.users('shared/chain.py'), ['one'])
+        self.assertListEqual(self.users('shared/a.coffee'), ['two'])
+        self.assertListEqual(self.users('three/three.py'), ['three'])
+        self.assertListEqual(self.users('shared/nope.py'), [])
+
+    def test_new_files_match_globs(self):
+        load_index(self.root)
+        (self.root / 'shared' / 'b.coffee').write_text('')
+        self.assertListEqual(self.users('shared/b.coffee'), ['two'])
@@ -0,0 +1,96 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from blambda.utils import archive, node_prune
+from blambda.utils.lambda_manifest import LambdaManifest
+
+# location -> (version, dependencies)
+PACKAGES = {
+    'a': ('1.0.0', ['b', 'c']),
+    'a/node_modules/b': ('1.0.0', []),      # the same as the top level b
+    'b': ('1.0.0', []),
+    'c': ('1.0.0', ['d']),
+    'c/node_modules/d': ('2.0.0', []),      # only installed nested, twice
+    'e': ('1.0.0', ['d']),
+    'e/node_modules/d': ('2.0.0', []),
+    'x': ('1.0.0', ['b', 'missing']),
+    'x/node_modules/b': ('2.0.0', []),      # a different version
+    'f': ('1.0.0', ['g', 'h']),
+    'f/node_modules/g': ('1.0.0', ['h']),   # needs f's h, so it can't be hoisted
+    'f/node_modules/h': ('1.0.0', []),
+    'h': ('2.0.0', []),                     # f uses its own h, so nothing needs this one
+    '@scope/s': ('1.0.0', ['b']),
+    'devtool': ('1.0.0', ['b']),            # not a dependency of the function
+}
+
+
+class TestNodePrune(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        node_dir = self.root / 'node_modules_fn'
+        for location, (version, dependencies) in PACKAGES.items():
+            package_dir = node_dir / location
+            package_dir.mkdir(parents=True, exist_ok=True)
+            (package_dir / 'package.json').write_text(json.dumps({
+                'name': location.rpartition('node_modules/')[2],
+                'version': version,
+                'dependencies': {name: '*' for name in dependencies},
+            }))
+            (package_dir / 'index.js').write_text(f'// {location}\n')
+            (package_dir / 'README.md').write_text('docs\n')
+        (node_dir / '.bin').mkdir()
+        (node_dir / '.bin' / 'devtool').write_text('#!/bin/sh\n')
+        self.members = sorted(archive.walk(node_dir, 'node_modules'))
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def prune(self, config):
+        with (self.root / 'fn.json').open('w') as f:
+            json.dump({'blambda': 'manifest', 'options': {'Runtime': 'nodejs12.x'}, 'node prune': config,
+                       'dependencies': {name: '1.0.0' for name in ('a', 'c', 'e', 'x', 'f', '@scope/s')}}, f)
+        manifest = LambdaManifest(self.root / 'fn.json')
+        with redirect_stdout(io.StringIO()):
+            kept = node_prune.prune(manifest, self.members, node_prune.prune_config(manifest))
+        return {arcname[:-len('/index.js')] for arcname, _ in kept if arcname.endswith('/index.js')}, kept
+
+    def test_package_locations(self):
+        self.assertListEqual(node_prune.package_locations('node_modules/a/node_modules/@s/b/lib/index.js'),
+                             ['node_modules/a', 'node_modules/a/node_modules/@s/b'])
+        self.assertListEqual(node_prune.package_locations('node_modules/.bin/tool'), [])
+        self.assertListEqual(node_prune.package_locations('node_modules/a/package.json'), ['node_modules/a'])
+
+    def test_resolve(self):
+        tree = node_prune.NodeModules(self.members)
+        self.assertEqual(tree.resolve('node_modules/f/node_modules/g', 'h'), 'node_modules/f/node_modules/h')
+        self.assertEqual(tree.resolve('node_modules/a', 'b'), 'node_modules/a/node_modules/b')
+        self.assertEqual(tree.resolve('node_modules/a', 'b', skip='node_modules/a/node_modules/b'),
+                         'node_modules/b')
+        self.assertEqual(tree.resolve('node_modules/@scope/s', 'b'), 'node_modules/b')
+        self.assertIsNone(tree.resolve('node_modules/x', 'missing'))
+
+    def test_prune(self):
+        (packages, kept) = self.prune(True)
+        self.assertSetEqual(packages, {'node_modules/' + location for location in (
+            'a', 'b', 'c', 'd', 'e', 'x', 'x/node_modules/b', 'f', 'f/node_modules/g', 'f/node_modules/h',
+            '@scope/s',
+        )})
+        arcnames = {arcname for arcname, _ in kept}
+        self.assertIn('node_modules/d/package.json', arcnames)
+        self.assertFalse(any(arcname.endswith('README.md') for arcname in arcnames))
+        self.assertNotIn('node_modules/.bin/devtool', arcnames)
+
+    def test_config(self):
+        (packages, _) = self.prune({'dedupe': False, 'keep': ['devtool']})
+        self.assertIn('node_modules/a/node_modules/b', packages)
+        self.assertIn('node_modules/devtool', packages)
+        self.assertNotIn('node_modules/d', packages)
+
+        (packages, _) = self.prune({'drop unused': False, 'default excludes': False})
+        self.assertIn('node_modules/devtool', packages)
+        self.assertNotIn('node_modules/c/node_modules/d', packages)
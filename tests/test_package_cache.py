@@ -0,0 +1,138 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from blambda import deploy
+from blambda.utils import package_cache
+from blambda.utils.lambda_manifest import LambdaManifest
+
+
+def names(zip_bytes):
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as z:
+        return sorted(z.namelist())
+
+
+class TestPackageCache(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.cache_dir = self.root / 'cache'
+        for name, path in (('CACHE_DIR', self.cache_dir), ('DEPENDENCY_CACHE_DIR', self.root / 'dependencies')):
+            patcher = mock.patch.object(package_cache, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.fn_dir = self.root / 'fn'
+        (self.fn_dir / 'lib_fn').mkdir(parents=True)
+        (self.fn_dir / 'lib_fn' / 'dep.py').write_text('x = 1\n')
+        (self.fn_dir / 'fn.py').write_text('def lambda_handler(event, context):\n    pass\n')
+        (self.fn_dir / 'hook.sh').write_text('#!/bin/sh\n')
+        self.write_manifest({'blambda': 'manifest', 'dependencies': {'dep': '1.0'},
+                             'source files': ['fn.py'], 'after deploy': ['sh hook.sh'],
+                             'options': {'Runtime': 'python3.8'}})
+
+        cwd = os.getcwd()
+        os.chdir(str(self.root))
+        self.addCleanup(os.chdir, cwd)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def write_manifest(self, data):
+        with (self.fn_dir / 'fn.json').open('w') as f:
+            json.dump(data, f)
+
+    def key(self):
+        return package_cache.cache_key(LambdaManifest(self.fn_dir / 'fn.json'))
+
+    def test_key_is_stable(self):
+        self.assertEqual(self.key(), self.key())
+
+    def test_key_changes(self):
+        changes = {
+            'source': lambda: (self.fn_dir / 'fn.py').write_text('# changed\n'),
+            'dependency': lambda: (self.fn_dir / 'lib_fn' / 'new.py').write_text(''),
+            'hook script': lambda: (self.fn_dir / 'hook.sh').write_text('#!/bin/sh\necho hi\n'),
+            'manifest': lambda: self.write_manifest({'blambda': 'manifest', 'source files': ['fn.py']}),
+        }
+        for name, change in changes.items():
+            with self.subTest(change=name):
+                before = self.key()
+                change()
+                self.assertNotEqual(before, self.key())
+
+    def test_package_uses_cache(self):
+        self.write_manifest({'blambda': 'manifest', 'source files': ['fn.py'], 'options': {'Runtime': 'python3.8'}})
+        zip_bytes = deploy.package(LambdaManifest(self.fn_dir / 'fn.json'))
+        self.assertEqual(names(zip_bytes), ['dep.py', 'fn.py'])
+        self.assertEqual(len(list(self.cache_dir.glob('*.zip'))), 1)
+
+        manifest = LambdaManifest(self.fn_dir / 'fn.json')
+        with mock.patch.object(deploy, 'dependency_members') as dependency_members:
+            (cached, options) = deploy.build_package(manifest)
+            dependency_members.assert_not_called()
+        self.assertEqual(cached, zip_bytes)
+        self.assertEqual(options['Runtime'], 'python3.8')
+        self.assertEqual(options['Handler'], 'fn.lambda_handler')
+        self.assertDictEqual(manifest.json['options'], {'Runtime': 'python3.8'})
+
+    def test_dependency_archive_is_shared(self):
+        self.write_manifest({'blambda': 'manifest', 'dependencies': {'dep': '1.0'}, 'source files': ['fn.py']})
+        other = self.root / 'other'
+        shutil.copytree(str(self.fn_dir), str(other))
+        (other / 'fn.json').rename(other / 'other.json')
+        (other / 'lib_fn').rename(other / 'lib_other')
+        (other / 'fn.py').write_text('# a different function\n')
+        manifests = [LambdaManifest(self.fn_dir / 'fn.json'), LambdaManifest(other / 'other.json')]
+
+        keys = [package_cache.dependency_key(deploy.dependency_members(m), m.json['dependencies']) for m in manifests]
+        self.assertEqual(keys[0], keys[1])
+
+        with mock.patch.object(deploy.archive, 'compress', wraps=deploy.archive.compress) as compress:
+            for m in manifests:
+                self.assertEqual(names(deploy.package(m)), ['dep.py', 'fn.py'])
+            compressed = sorted(c[0][0] for c in compress.call_args_list)
+        self.assertListEqual(compressed, ['dep.py', 'fn.py', 'fn.py'])
+
+        (other / 'lib_other' / 'dep.py').write_text('x = 2\n')
+        m = manifests[1]
+        self.assertNotEqual(package_cache.dependency_key(deploy.dependency_members(m), m.json['dependencies']), keys[0])
+
+    def test_prune(self):
+        self.cache_dir.mkdir()
+        for i in range(5):
+            path = self.cache_dir / f'{i}.zip'
+            path.write_text('')
+            os.utime(str(path), (i, i))
+        package_cache.prune(max_entries=2)
+        self.assertEqual(sorted(p.name for p in self.cache_dir.glob('*.zip')), ['3.zip', '4.zip'])
+
+    def test_prune_by_size(self):
+        self.cache_dir.mkdir()
+        for i in range(4):
+            path = self.cache_dir / f'{i}.zip'
+            path.write_bytes(b'0' * 100 * (i + 1))
+            os.utime(str(path), (i, i))
+        package_cache.prune(max_bytes=750)
+        self.assertEqual(sorted(p.name for p in self.cache_dir.glob('*.zip')), ['2.zip', '3.zip'])
+        package_cache.prune(max_bytes=1)
+        self.assertEqual(sorted(p.name for p in self.cache_dir.glob('*.zip')), ['3.zip'])
+
+    def test_prune_ignores_vanished_entries(self):
+        self.cache_dir.mkdir()
+        (self.cache_dir / 'kept.zip').write_text('')
+        # another deploy pruned this one between listing the cache and looking at it
+        vanished = self.cache_dir / 'vanished.zip'
+        with mock.patch.object(Path, 'glob', return_value=[vanished, self.cache_dir / 'kept.zip']):
+            package_cache.prune(max_entries=0)
+        self.assertTrue((self.cache_dir / 'kept.zip').exists())
+
+    def test_invalid_max_size(self):
+        with mock.patch('blambda.config.load_cached', return_value={'package_cache_mb': 'lots'}):
+            with self.assertRaises(SystemExit):
+                package_cache.max_size()
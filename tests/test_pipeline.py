@@ -0,0 +1,63 @@
+import threading
+import unittest
+
+from blambda.utils.pipeline import Pipeline, Stage
+
+
+class TestPipeline(unittest.TestCase):
+    def test_results(self):
+        def first(n):
+            if n == 3:
+                raise ValueError('three')
+            return None if n == 4 else n * 10
+
+        pipeline = Pipeline([Stage('first', first, 2), Stage('second', lambda n: n + 1, 3)])
+        self.assertDictEqual(pipeline.run(range(6)), {0: 1, 1: 11, 2: 21, 5: 51})
+        self.assertListEqual(list(pipeline.errors), [3])
+
+    def test_back_pressure(self):
+        release = threading.Event()
+        changed = threading.Condition()
+        (packaged, publishing, too_early) = ([], [], [])
+
+        def package(n):
+            with changed:
+                # 2 being published, 3 waiting in the queue and 1 waiting to get into it, then packaging waits
+                if len(packaged) == 6 and not release.is_set():
+                    too_early.append(n)
+                packaged.append(n)
+                changed.notify_all()
+            return n
+
+        def publish(n):
+            with changed:
+                publishing.append(n)
+                changed.notify_all()
+            release.wait()
+            return n
+
+        pipeline = Pipeline([Stage('package', package, 1), Stage('publish', publish, 2)], queue_size=3)
+        thread = threading.Thread(target=pipeline.run, args=(range(20),))
+        thread.start()
+        with changed:
+            self.assertTrue(changed.wait_for(lambda: len(packaged) >= 6 and len(publishing) == 2, timeout=10))
+        release.set()
+        thread.join()
+        self.assertListEqual(too_early, [])
+        self.assertEqual(len(packaged), 20)
+
+    def test_stages_overlap(self):
+        publishing = threading.Event()
+        overlapped = []
+
+        def package(n):
+            if n > 0:
+                overlapped.append(publishing.wait(1))
+            return n
+
+        def publish(n):
+            publishing.set()
+            return n
+
+        Pipeline([Stage('package', package, 1), Stage('publish', publish, 1)]).run(range(3))
+        self.assertListEqual(overlapped, [True, True])
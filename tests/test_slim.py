@@ -0,0 +1,84 @@
+import glob
+import io
+import os
+import shutil
+import sysconfig
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+from blambda.utils import package_cache, slim
+
+
+class TestSlim(unittest.TestCase):
+    def slim(self, arcnames, config, runtime='python3.8'):
+        members = [(arcname, Path('/nowhere') / arcname) for arcname in arcnames]
+        return [arcname for arcname, _ in slim.slim(members, config, runtime)]
+
+    def test_matches(self):
+        self.assertTrue(slim.matches('numpy/core/tests/test_api.py', ['tests']))
+        self.assertTrue(slim.matches('requests-2.25.1.dist-info/METADATA', ['*.dist-info']))
+        self.assertTrue(slim.matches('numpy/doc/basics.py', ['numpy/doc/*']))
+        self.assertFalse(slim.matches('numpy/core/testing.py', ['tests', 'test']))
+        self.assertFalse(slim.matches('other/doc/basics.py', ['numpy/doc/*']))
+
+    def test_python_defaults(self):
+        kept = self.slim(['six.py', '__pycache__/six.cpython-38.pyc', 'six-1.15.0.dist-info/RECORD',
+                          'numpy/__init__.py', 'numpy/core/tests/test_api.py', 'numpy/__init__.pyi',
+                          'botocore/data/s3/2006-03-01/service-2.json'], {})
+        self.assertListEqual(kept, ['six.py', 'numpy/__init__.py', 'botocore/data/s3/2006-03-01/service-2.json'])
+
+    def test_nodejs_defaults(self):
+        kept = self.slim(['node_modules/lodash/lodash.js', 'node_modules/lodash/README.md',
+                          'node_modules/@aws/sdk/test/a.js', 'node_modules/a/node_modules/b/index.d.ts'],
+                         {}, runtime='nodejs12.x')
+        self.assertListEqual(kept, ['node_modules/lodash/lodash.js'])
+
+    def test_config(self):
+        arcnames = ['six.py', 'six-1.15.0.dist-info/entry_points.txt', 'botocore/data/s3/service-2.json']
+        self.assertListEqual(self.slim(arcnames, {'include': ['*.dist-info'], 'exclude': ['botocore/data/*']}),
+                             ['six.py', 'six-1.15.0.dist-info/entry_points.txt'])
+        self.assertListEqual(self.slim(arcnames, {'default excludes': False}), arcnames)
+
+    def test_package_name(self):
+        self.assertEqual(slim.package_name('numpy/core/multiarray.py'), 'numpy')
+        self.assertEqual(slim.package_name('six.py'), 'six.py')
+        self.assertEqual(slim.package_name('node_modules/@aws-sdk/client-s3/index.js'), '@aws-sdk/client-s3')
+        self.assertEqual(slim.package_name('node_modules/lodash/lodash.js'), 'lodash')
+
+    def test_size_report(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            slim.print_size_report({'numpy/a.py': 3 * 1024 * 1024, 'numpy/tests/t.py': 1024 * 1024},
+                                   {'numpy/a.py': 3 * 1024 * 1024})
+        report = out.getvalue()
+        self.assertIn('4.00MB', report)
+        self.assertIn('dropped', report)
+
+
+class TestStrip(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        patcher = mock.patch.object(package_cache, 'CACHE_ROOT', self.root / 'cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def test_strip(self):
+        shared_objects = glob.glob(os.path.join(sysconfig.get_config_var('DESTSHARED') or '', '*.so'))
+        if not shared_objects or not shutil.which(slim.STRIP_COMMAND):
+            self.skipTest('no shared objects / strip command')
+        so = self.root / 'module.so'
+        shutil.copyfile(shared_objects[0], str(so))
+        text = self.root / 'module.py'
+        text.write_text('')
+
+        members = slim.strip_shared_objects([('module.so', so), ('module.py', text)])
+        self.assertEqual(members[1], ('module.py', text))
+        stripped = members[0][1]
+        self.assertLessEqual(stripped.stat().st_size, so.stat().st_size)
+        self.assertEqual(slim.strip_shared_objects([('module.so', so)]), [('module.so', stripped)])
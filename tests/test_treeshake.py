@@ -0,0 +1,117 @@
+import io
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from blambda import deploy
+from blambda.utils import archive, treeshake
+from blambda.utils.lambda_manifest import LambdaManifest
+
+HANDLER = '''
+import importlib
+import requests
+from numpylike import core
+from py2lib import thing
+
+def lambda_handler(event, context):
+    return importlib.import_module('dynamic')
+'''
+
+LIB = {
+    'requests/__init__.py': 'from . import api\nfrom .compat import urlparse\n',
+    'requests/api.py': 'import idna\n',
+    'requests/compat.py': 'from urllib.parse import urlparse\n',
+    'requests/unused.py': 'import certifi\n',
+    'requests/cacert.pem': '',
+    'requests-2.0.dist-info/top_level.txt': 'requests\n',
+    'requests-2.0.dist-info/RECORD': '',
+    'idna/__init__.py': 'from .core import *\n',
+    'idna/core.py': '',
+    'certifi/__init__.py': '',
+    'certifi/cacert.pem': '',
+    'certifi-1.0.dist-info/RECORD': '',
+    'numpylike/__init__.py': '',
+    'numpylike/_core.cpython-38-x86_64-linux-gnu.so': '',
+    'numpylike/unused.py': '',
+    'py2lib/__init__.py': 'print "hello"\n',
+    'py2lib/other.py': '',
+    'dynamic.py': '',
+    'plugin/__init__.py': '',
+    'plugin/extra.py': '',
+    'unreached/__init__.py': '',
+    'something.pth': '',
+}
+
+
+class TestTreeShake(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        lib_dir = self.root / 'lib_fn'
+        for arcname, text in LIB.items():
+            (lib_dir / arcname).parent.mkdir(parents=True, exist_ok=True)
+            (lib_dir / arcname).write_text(text)
+        (self.root / 'fn.py').write_text(HANDLER)
+        self.members = sorted(archive.walk(lib_dir))
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def shake(self, config, runtime='python3.8'):
+        with (self.root / 'fn.json').open('w') as f:
+            json.dump({'blambda': 'manifest', 'source files': ['fn.py'], 'tree shake': config,
+                       'options': {'Runtime': runtime}}, f)
+        manifest = LambdaManifest(self.root / 'fn.json')
+        kept = treeshake.shake(manifest, self.members, {'fn.py': self.root / 'fn.py'},
+                               treeshake.shake_config(manifest))
+        return {arcname for arcname, _ in kept}
+
+    def test_module_name(self):
+        self.assertEqual(treeshake.module_name('a/b/__init__.py'), ('a.b', True, False))
+        self.assertEqual(treeshake.module_name('a/b.py'), ('a.b', False, False))
+        self.assertEqual(treeshake.module_name('a/_b.cpython-38-x86_64-linux-gnu.so'), ('a._b', False, True))
+        self.assertIsNone(treeshake.module_name('a-1.0.dist-info/RECORD'))
+        self.assertIsNone(treeshake.module_name('a/data.json'))
+
+    def test_imported_names(self):
+        names = treeshake.imported_names(b'from . import a\nfrom ..b import c\nimport d.e\n', 'pkg.sub.mod', False)
+        self.assertSetEqual(names, {'pkg.sub', 'pkg.sub.a', 'pkg.b', 'pkg.b.c', 'd.e'})
+        self.assertIsNone(treeshake.imported_names(b'print "py2"', 'mod', False))
+
+    def test_shake(self):
+        kept = self.shake(True)
+        dropped = set(LIB) - kept
+        self.assertSetEqual(dropped, {
+            'requests/unused.py', 'certifi/__init__.py', 'certifi/cacert.pem', 'certifi-1.0.dist-info/RECORD',
+            'plugin/__init__.py', 'plugin/extra.py', 'unreached/__init__.py',
+        })
+
+    def test_keep(self):
+        kept = self.shake({'keep': ['plugin', 'requests.unused']})
+        self.assertTrue({'plugin/__init__.py', 'plugin/extra.py', 'requests/unused.py', 'certifi/cacert.pem'} <= kept)
+        self.assertNotIn('unreached/__init__.py', kept)
+
+    def test_import_handler(self):
+        (self.root / 'fn.py').write_text(
+            "import importlib\nimport requests\nimportlib.import_module('plug' + 'in.extra')\n")
+        # a module blambda itself has loaded, that the handler doesn't use
+        (self.root / 'lib_fn' / 'termcolor.py').write_text('')
+        self.members = sorted(archive.walk(self.root / 'lib_fn'))
+
+        kept = self.shake({'import handler': True}, runtime=f'python{sys.version_info[0]}.{sys.version_info[1]}')
+        self.assertTrue({'plugin/__init__.py', 'plugin/extra.py', 'requests/api.py', 'idna/core.py'} <= kept)
+        self.assertFalse({'termcolor.py', 'certifi/__init__.py', 'unreached/__init__.py'} & kept)
+
+    def test_package(self):
+        with (self.root / 'fn.json').open('w') as f:
+            json.dump({'blambda': 'manifest', 'source files': ['fn.py'], 'tree shake': True,
+                       'options': {'Runtime': 'python3.8'}}, f)
+        zip_bytes = deploy.package(LambdaManifest(self.root / 'fn.json'), use_cache=False)
+        with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+            names = set(zf.namelist())
+        self.assertIn('fn.py', names)
+        self.assertIn('requests/api.py', names)
+        self.assertNotIn('certifi/cacert.pem', names)